@@ -0,0 +1,4 @@
+"""
+Benchmark suites for the query algorithms of ``project``. Every suite is a CLI
+run from the repository root, e.g. ``python -m benchmarks.rpq --help``.
+"""
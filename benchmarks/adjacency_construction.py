@@ -0,0 +1,56 @@
+"""
+Compares building the graph AdjacencyMatrixFA through the pyformlang NFA
+(``AdjacencyMatrixFA(graph_to_nfa(...))``) with the direct CSR constructor
+``AdjacencyMatrixFA.from_graph``.
+
+Usage: python -m benchmarks.adjacency_construction [--nodes N] [--edges M]
+       python -m benchmarks.adjacency_construction --graph wine
+"""
+
+import argparse
+import time
+
+from benchmarks.common import synthetic_graph
+from project.task1_graph_utilities import get_graph_by_name
+from project.task2_automata_conversions import graph_to_nfa
+from project.task3_adjacency_matrix import AdjacencyMatrixFA
+
+
+def measure(build, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        build()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--graph", help="CFPQ_Data graph name")
+    parser.add_argument("--nodes", type=int, default=10_000)
+    parser.add_argument("--edges", type=int, default=100_000)
+    parser.add_argument("--labels", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.graph:
+        graph = get_graph_by_name(args.graph)
+    else:
+        graph = synthetic_graph(args.nodes, args.edges, args.labels, args.seed)
+    print(f"graph: {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
+
+    via_nfa = measure(
+        lambda: AdjacencyMatrixFA(graph_to_nfa(graph, set(), set())), args.repeats
+    )
+    direct = measure(
+        lambda: AdjacencyMatrixFA.from_graph(graph, set(), set()), args.repeats
+    )
+    print(f"graph_to_nfa + AdjacencyMatrixFA: {via_nfa:.3f} s")
+    print(f"AdjacencyMatrixFA.from_graph:     {direct:.3f} s")
+    print(f"speedup: {via_nfa / direct:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
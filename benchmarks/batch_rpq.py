@@ -0,0 +1,74 @@
+"""
+Throughput of a query workload evaluated one ``ms_bfs_based_rpq`` call at a
+time versus ``batch_rpq`` over a single ``GraphIndex``.
+
+Usage: python -m benchmarks.batch_rpq [--queries 100] [--graph NAME]
+"""
+
+import argparse
+import random
+import time
+
+import cfpq_data
+
+from benchmarks.common import synthetic_graph
+from project.task1_graph_utilities import get_graph_by_name
+from project.task3_adjacency_matrix import REGEX_CACHE
+from project.task4_rpq import GraphIndex, batch_rpq, ms_bfs_based_rpq
+
+TEMPLATES = [
+    "({0} | {1})* {2}",
+    "{0} {1}* {2}",
+    "({0} {1})* | {2}",
+    "{0}* ({1} | {2})",
+]
+
+
+def make_queries(graph, count: int, start_size: int, seed: int):
+    rnd = random.Random(seed)
+    labels = cfpq_data.get_sorted_labels(graph)[:6]
+    nodes = list(graph.nodes)
+    queries = []
+    for _ in range(count):
+        template = rnd.choice(TEMPLATES)
+        regex = template.format(*(rnd.choice(labels) for _ in range(3)))
+        start_nodes = set(rnd.sample(nodes, min(start_size, len(nodes))))
+        queries.append((regex, start_nodes, set()))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--graph", help="CFPQ_Data graph name")
+    parser.add_argument("--nodes", type=int, default=20_000)
+    parser.add_argument("--edges", type=int, default=60_000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--start-size", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.graph:
+        graph = get_graph_by_name(args.graph)
+    else:
+        graph = synthetic_graph(args.nodes, args.edges, 6, args.seed)
+    queries = make_queries(graph, args.queries, args.start_size, args.seed)
+
+    REGEX_CACHE.clear()
+    start = time.perf_counter()
+    single = [ms_bfs_based_rpq(r, graph, s, f) for r, s, f in queries]
+    single_time = time.perf_counter() - start
+
+    REGEX_CACHE.clear()
+    start = time.perf_counter()
+    index = GraphIndex(graph)
+    batch = batch_rpq(index, queries)
+    batch_time = time.perf_counter() - start
+    assert single == batch
+
+    print(f"graph: {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
+    for name, elapsed in (("one call per query", single_time), ("batch", batch_time)):
+        print(f"{name:>18}: {elapsed:7.3f} s, {len(queries) / elapsed:8.1f} queries/s")
+
+
+if __name__ == "__main__":
+    main()
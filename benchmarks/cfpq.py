@@ -0,0 +1,231 @@
+"""
+Compares the CFPQ engines (task 10) on CFPQ_Data graphs or a synthetic one.
+Every grammar family lists equivalent grammars of different size and
+ambiguity over the two most frequent labels of a graph. Every engine runs
+each grammar in a fresh process, cold first (grammar caches cleared) and
+then warm, recording wall time, peak RSS and result size.
+
+With ``--baseline`` the median warm times are compared with a CSV written by
+an earlier run, and the command fails if any of them got slower by more than
+``--tolerance``.
+
+Usage: python -m benchmarks.cfpq --graph wine --engines hellings matrix --csv cfpq.csv
+       python -m benchmarks.cfpq --synthetic 300 1000 2 --baseline cfpq.csv
+"""
+
+import argparse
+import csv
+import statistics
+from dataclasses import asdict, dataclass
+from typing import Callable
+
+import cfpq_data
+import networkx as nx
+import pyformlang.cfg as pcfg
+
+from benchmarks.common import load_graphs, measure_series, write_records
+from project.task6_cfpq import GRAMMAR_CACHE, hellings_based_cfpq
+from project.task7_matrix_cfpq import matrix_based_cfpq
+from project.task8_tensor_cfpq import cfg_to_rsm, tensor_based_cfpq
+from project.task9_gll_cfpq import gll_based_cfpq
+
+# engine(cfg, graph, start_nodes, final_nodes) -> set of pairs
+CFPQEngine = Callable[[pcfg.CFG, nx.DiGraph, set[int], set[int]], set]
+
+ENGINES: dict[str, CFPQEngine] = {}
+
+
+def register_engine(name: str, engine: CFPQEngine):
+    ENGINES[name] = engine
+
+
+def _over_rsm(engine) -> CFPQEngine:
+    def run(cfg, graph, start_nodes, final_nodes):
+        return engine(cfg_to_rsm(cfg), graph, start_nodes, final_nodes)
+
+    return run
+
+
+register_engine("hellings", hellings_based_cfpq)
+register_engine("matrix", matrix_based_cfpq)
+register_engine("tensor", _over_rsm(tensor_based_cfpq))
+register_engine("gll", _over_rsm(gll_based_cfpq))
+
+# equivalent grammars over the labels {a} and {b}, smallest/unambiguous first
+GRAMMAR_FAMILIES = {
+    "dyck": [
+        "S -> {a} S {b} S | $",
+        "S -> S S | {a} S {b} | $",
+        "S -> {a} B S | $\nB -> S {b}",
+    ],
+    "same_generation": [
+        "S -> {a} S {b} | {a} {b}",
+        "S -> A B\nA -> {a}\nB -> S C | {b}\nC -> {b}",
+    ],
+    "regular": [
+        "S -> {a} S | {b} S | $",
+        "S -> S {a} | S {b} | $",
+        "S -> S S | {a} | {b} | $",
+    ],
+}
+
+
+@dataclass
+class CFPQRecord:
+    graph: str
+    nodes: int
+    edges: int
+    engine: str
+    grammar: str
+    variant: int
+    productions: int
+    start_size: int
+    phase: str
+    repeat: int
+    seconds: float
+    result_size: int
+    peak_rss_mib: float
+    rss_growth_mib: float
+
+
+@dataclass
+class Regression:
+    key: tuple
+    baseline_seconds: float
+    seconds: float
+
+    @property
+    def slowdown(self) -> float:
+        return self.seconds / self.baseline_seconds
+
+
+def make_grammar(text: str, graph: nx.DiGraph) -> pcfg.CFG:
+    labels = cfpq_data.get_sorted_labels(graph)
+    return pcfg.CFG.from_text(text.format(a=labels[0], b=labels[1 % len(labels)]))
+
+
+def warm_medians(rows) -> dict[tuple, float]:
+    """Median warm time by (graph, engine, grammar, variant, start size)."""
+    times = {}
+    for row in rows:
+        if row["phase"] == "warm":
+            key = tuple(
+                str(row[name])
+                for name in ("graph", "engine", "grammar", "variant", "start_size")
+            )
+            times.setdefault(key, []).append(float(row["seconds"]))
+    return {key: statistics.median(values) for key, values in times.items()}
+
+
+def compare_with_baseline(
+    records: list[CFPQRecord], baseline_path: str, tolerance: float
+) -> list[Regression]:
+    with open(baseline_path, newline="") as file:
+        baseline = warm_medians(csv.DictReader(file))
+    current = warm_medians(asdict(record) for record in records)
+    return [
+        Regression(key, baseline[key], seconds)
+        for key, seconds in sorted(current.items())
+        if key in baseline and seconds > baseline[key] * (1 + tolerance)
+    ]
+
+
+def main(argv: list[str] = None) -> list[CFPQRecord]:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--graph", nargs="*", default=[], help="CFPQ_Data graph names")
+    parser.add_argument(
+        "--synthetic",
+        nargs=3,
+        type=int,
+        default=[300, 1_000, 2],
+        metavar=("NODES", "EDGES", "LABELS"),
+        help="random graph used when no --graph is given",
+    )
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES))
+    parser.add_argument(
+        "--grammars",
+        nargs="+",
+        choices=sorted(GRAMMAR_FAMILIES),
+        default=list(GRAMMAR_FAMILIES),
+    )
+    parser.add_argument(
+        "--start-sizes",
+        nargs="+",
+        type=int,
+        default=[10],
+        help="0 queries all pairs",
+    )
+    parser.add_argument("--repeats", type=int, default=3, help="warm runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--csv", help="write records to this CSV file")
+    parser.add_argument("--json", help="write records to this JSON file")
+    parser.add_argument("--baseline", help="CSV of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+    unknown = set(args.engines) - set(ENGINES)
+    if unknown:
+        parser.error(f"unknown engines {sorted(unknown)}, known {sorted(ENGINES)}")
+
+    records = []
+    for graph_name, graph in load_graphs(args.graph, args.synthetic, args.seed).items():
+        for start_size in args.start_sizes:
+            start_size = min(start_size, graph.number_of_nodes())
+            start_nodes = (
+                cfpq_data.generate_multiple_source(graph, start_size, seed=args.seed)
+                if start_size
+                else None
+            )
+            for family in args.grammars:
+                for variant, text in enumerate(GRAMMAR_FAMILIES[family]):
+                    cfg = make_grammar(text, graph)
+                    for engine in args.engines:
+                        measurements = measure_series(
+                            ENGINES[engine],
+                            cfg,
+                            graph,
+                            start_nodes,
+                            None,
+                            runs=args.repeats + 1,
+                            prepare=GRAMMAR_CACHE.clear,
+                        )
+                        for repeat, measurement in enumerate(measurements):
+                            records.append(
+                                CFPQRecord(
+                                    graph=graph_name,
+                                    nodes=graph.number_of_nodes(),
+                                    edges=graph.number_of_edges(),
+                                    engine=engine,
+                                    grammar=family,
+                                    variant=variant,
+                                    productions=len(cfg.productions),
+                                    start_size=start_size,
+                                    phase="cold" if repeat == 0 else "warm",
+                                    repeat=repeat,
+                                    **asdict(measurement),
+                                )
+                            )
+                        warm = [m.seconds for m in measurements[1:]] or [float("nan")]
+                        print(
+                            f"{graph_name} {engine:>8} {family}[{variant}] "
+                            f"start {start_size}: cold {measurements[0].seconds:8.3f} s, "
+                            f"warm median {statistics.median(warm):8.3f} s, "
+                            f"{measurements[0].result_size} pairs, "
+                            f"peak RSS {measurements[-1].peak_rss_mib:.0f} MiB"
+                        )
+
+    write_records(records, args.csv, args.json)
+    if args.baseline:
+        regressions = compare_with_baseline(records, args.baseline, args.tolerance)
+        for regression in regressions:
+            print(
+                f"regression {' '.join(regression.key)}: "
+                f"{regression.baseline_seconds:.3f} s -> {regression.seconds:.3f} s "
+                f"({regression.slowdown:.2f}x)"
+            )
+        if regressions:
+            raise SystemExit(1)
+    return records
+
+
+if __name__ == "__main__":
+    main()
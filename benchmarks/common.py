@@ -0,0 +1,129 @@
+import csv
+import json
+import multiprocessing
+import resource
+import time
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Callable
+
+import numpy as np
+from networkx import MultiDiGraph
+
+from project.task1_graph_utilities import get_graph_by_name
+
+
+@dataclass
+class Measurement:
+    seconds: float
+    result_size: int
+    # peak RSS of the process running the function, and its growth over the
+    # RSS the run started with
+    peak_rss_mib: float
+    rss_growth_mib: float
+
+
+def synthetic_graph(nodes: int, edges: int, labels: int, seed: int) -> MultiDiGraph:
+    rng = np.random.default_rng(seed)
+    graph = MultiDiGraph()
+    graph.add_nodes_from(range(nodes))
+    sources = rng.integers(0, nodes, edges).tolist()
+    targets = rng.integers(0, nodes, edges).tolist()
+    names = [f"l{k}" for k in rng.integers(0, labels, edges)]
+    graph.add_edges_from(
+        (u, v, {"label": label}) for u, v, label in zip(sources, targets, names)
+    )
+    return graph
+
+
+def timed(function: Callable, *args, **kwargs) -> tuple[float, Any]:
+    """Wall time and result of one in-process call."""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def load_graphs(
+    names: list[str], synthetic: tuple[int, int, int], seed: int
+) -> dict[str, MultiDiGraph]:
+    """CFPQ_Data graphs by name, or one synthetic graph if no names are given."""
+    if names:
+        return {name: get_graph_by_name(name) for name in names}
+    nodes, edges, labels = synthetic
+    return {f"synthetic_{nodes}_{edges}": synthetic_graph(nodes, edges, labels, seed)}
+
+
+def _max_rss_mib() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run(function: Callable, args: tuple) -> Measurement:
+    before = _max_rss_mib()
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    peak = _max_rss_mib()
+    return Measurement(seconds, len(result), peak, peak - before)
+
+
+def _run_series(
+    function: Callable, args: tuple, runs: int, prepare: Callable
+) -> list[Measurement]:
+    if prepare is not None:
+        prepare()
+    return [_run(function, args) for _ in range(runs)]
+
+
+def _run_series_and_send(function, args, runs, prepare, sender):
+    sender.send(_run_series(function, args, runs, prepare))
+
+
+def measure_series(
+    function: Callable,
+    *args,
+    runs: int,
+    prepare: Callable = None,
+    isolated: bool = True,
+) -> list[Measurement]:
+    """
+    Calls ``prepare()`` and then runs ``function(*args)`` ``runs`` times in a
+    row, so the first run is cold and the following ones are warm. An isolated
+    series runs in a forked child, so its peak RSS is not hidden by the peaks
+    of earlier series and the graph is shared with the child instead of
+    pickled. Peak RSS of a run covers the runs before it in the series.
+    """
+    if not isolated:
+        return _run_series(function, args, runs, prepare)
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_run_series_and_send, args=(function, args, runs, prepare, sender)
+    )
+    process.start()
+    sender.close()
+    try:
+        measurements = receiver.recv()
+    except EOFError:
+        measurements = None
+    process.join()
+    if measurements is None:
+        raise RuntimeError(f"Benchmark process exited with code {process.exitcode}")
+    return measurements
+
+
+def measure(function: Callable, *args, isolated: bool = True) -> Measurement:
+    """Runs ``function(*args)`` once, see ``measure_series``."""
+    return measure_series(function, *args, runs=1, isolated=isolated)[0]
+
+
+def write_records(records: list, csv_path: str = None, json_path: str = None):
+    """Writes a list of dataclass records as CSV and/or JSON."""
+    rows = [asdict(record) for record in records]
+    if csv_path and records:
+        with open(csv_path, "w", newline="") as file:
+            writer = csv.DictWriter(file, [field.name for field in fields(records[0])])
+            writer.writeheader()
+            writer.writerows(rows)
+    if json_path:
+        with open(json_path, "w") as file:
+            json.dump(rows, file, indent=2)
@@ -0,0 +1,58 @@
+"""
+Descriptor throughput and peak memory of ``gll_based_cfpq``.
+
+Usage: python -m benchmarks.gll [--nodes N] [--edges M] [--batch-size B]
+       python -m benchmarks.gll --graph wine --labels type subClassOf
+"""
+
+import argparse
+import resource
+
+from pyformlang.cfg import CFG
+
+from benchmarks.common import synthetic_graph
+from project.task1_graph_utilities import get_graph_by_name
+from project.task8_tensor_cfpq import cfg_to_rsm
+from project.task9_gll_cfpq import GLLStats, gll_based_cfpq
+
+GRAMMARS = {
+    "same_generation": "S -> {a} S {b} | {a} {b}",
+    "dyck_like": "S -> {a} S {b} S | $",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--graph", help="CFPQ_Data graph name")
+    parser.add_argument("--nodes", type=int, default=5_000)
+    parser.add_argument("--edges", type=int, default=20_000)
+    parser.add_argument("--labels", nargs=2, default=["l0", "l1"])
+    parser.add_argument("--start-size", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=1 << 16)
+    args = parser.parse_args()
+
+    if args.graph:
+        graph = get_graph_by_name(args.graph)
+    else:
+        graph = synthetic_graph(args.nodes, args.edges, 4, 0)
+    start_nodes = set(list(graph.nodes)[: args.start_size])
+    print(f"graph: {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
+
+    a, b = args.labels
+    for name, text in GRAMMARS.items():
+        stats = GLLStats()
+        rsm = cfg_to_rsm(CFG.from_text(text.format(a=a, b=b)))
+        result = gll_based_cfpq(
+            rsm, graph, start_nodes, batch_size=args.batch_size, stats=stats
+        )
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(
+            f"{name:>16}: {len(result)} pairs, {stats.descriptors} descriptors in "
+            f"{stats.batches} batches, {stats.seconds:.2f} s, "
+            f"{stats.descriptors_per_second:,.0f} descriptors/s, "
+            f"peak RSS {peak:.0f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
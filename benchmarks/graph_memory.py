@@ -0,0 +1,99 @@
+"""
+Memory retained by graph and product automata with the array-backed state
+tables, compared with the State-object dicts they replace. Measured with
+tracemalloc, which also accounts NumPy buffers.
+
+Usage: python -m benchmarks.graph_memory [--nodes N] [--edges M]
+       python -m benchmarks.graph_memory --graph wine
+"""
+
+import argparse
+import gc
+import tracemalloc
+
+from pyformlang.finite_automaton import State
+
+from benchmarks.common import synthetic_graph
+from project.task1_graph_utilities import get_graph_by_name
+from project.task3_adjacency_matrix import (
+    AdjacencyMatrixFA,
+    compile_regex,
+    intersect_automata,
+)
+
+
+def retained(build):
+    """Result of build() and the bytes it keeps alive."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def object_state_index(automaton: AdjacencyMatrixFA):
+    # the previous representation: a State per node and a dict keyed by them
+    states = [State(node) for node in automaton.state_index.nodes.tolist()]
+    return set(states), {state: i for i, state in enumerate(states)}
+
+
+def object_product_index(regex_am: AdjacencyMatrixFA, graph_am: AdjacencyMatrixFA):
+    # the previous intersect_automata: a State((q, v)) per product state
+    states, state_index = set(), {}
+    for s1, i in regex_am.state_index.items():
+        for s2, j in graph_am.state_index.items():
+            state = State((s1.value, s2.value))
+            states.add(state)
+            state_index[state] = i * graph_am.size + j
+    return states, state_index
+
+
+def mib(size: int) -> str:
+    return f"{size / 2**20:9.1f} MiB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--graph", help="CFPQ_Data graph name")
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--edges", type=int, default=1_000_000)
+    parser.add_argument("--labels", type=int, default=8)
+    parser.add_argument("--regex", default="(l0 | l1)* l2 l3*")
+    args = parser.parse_args()
+
+    if args.graph:
+        graph = get_graph_by_name(args.graph)
+    else:
+        graph = synthetic_graph(args.nodes, args.edges, args.labels, 0)
+    print(f"graph: {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
+
+    graph_am, automaton_size = retained(
+        lambda: AdjacencyMatrixFA.from_graph(graph, set(), set())
+    )
+    matrices_size = sum(
+        matr.data.nbytes + matr.indices.nbytes + matr.indptr.nbytes
+        for matr in graph_am.decomposed_adj_matrix.values()
+    )
+    _, objects_size = retained(lambda: object_state_index(graph_am))
+    print(f"graph automaton total:         {mib(automaton_size)}")
+    print(f"  label matrices (CSR):        {mib(matrices_size)}")
+    print(f"  state table (arrays):        {mib(automaton_size - matrices_size)}")
+    print(f"  State set + dict instead:    {mib(objects_size)}")
+
+    regex_am = compile_regex(args.regex)
+    product, product_size = retained(lambda: intersect_automata(regex_am, graph_am))
+    matrices_size = sum(
+        matr.data.nbytes + matr.indices.nbytes + matr.indptr.nbytes
+        for matr in product.decomposed_adj_matrix.values()
+    )
+    _, objects_size = retained(lambda: object_product_index(regex_am, graph_am))
+    print(f"product with {args.regex!r}: {product.size} states")
+    print(f"  product automaton total:     {mib(product_size)}")
+    print(f"  label matrices (CSR):        {mib(matrices_size)}")
+    print(f"  State set + dict instead:    {mib(objects_size)}")
+
+
+if __name__ == "__main__":
+    main()
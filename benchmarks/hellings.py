@@ -0,0 +1,100 @@
+"""
+Compares the worklist ``hellings_based_cfpq`` with the previous global-fixpoint
+version, which is kept below as a reference, and the all-pairs closure with the
+demand-driven one for queries from a few start nodes.
+
+Usage: python -m benchmarks.hellings [--graph NAME ...] [--nodes N]
+       [--sources K]
+"""
+
+import argparse
+
+import cfpq_data
+from pyformlang.cfg import CFG
+
+from benchmarks.common import timed
+from project.task1_graph_utilities import get_graph_by_name
+from project.task6_cfpq import (
+    cfg_to_weak_normal_form,
+    group_productions,
+    hellings_based_cfpq,
+    hellings_initialize,
+)
+
+# a linear grammar and a Dyck-style one with a nullable, doubly recursive rule
+GRAMMARS = {
+    "same_generation": "S -> {a} S {b} | {a} {b}",
+    "dyck_like": "S -> {a} S {b} S | $",
+}
+
+
+def fixpoint_hellings(cfg, graph, start_nodes=None, final_nodes=None):
+    cfg_wnf = cfg_to_weak_normal_form(cfg)
+    term_prods, epsilon_prods, binary_prods = group_productions(cfg_wnf)
+    reached = hellings_initialize(graph, term_prods, epsilon_prods)
+
+    changed = True
+    while changed:
+        changed = False
+        for A, B, C in binary_prods:
+            if B in reached and C in reached:
+                b_pairs = list(reached[B])
+                c_pairs = list(reached[C])
+                for u, v1 in b_pairs:
+                    for v2, w in c_pairs:
+                        if v1 == v2 and (u, w) not in reached.setdefault(A, set()):
+                            reached[A].add((u, w))
+                            changed = True
+
+    return {
+        (u, v)
+        for u, v in reached.get(cfg_wnf.start_symbol, ())
+        if (not start_nodes or u in start_nodes)
+        and (not final_nodes or v in final_nodes)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--graph", nargs="*", default=[], help="CFPQ_Data graph names")
+    parser.add_argument("--nodes", type=int, default=300)
+    parser.add_argument("--labels", nargs=2, default=["a", "b"])
+    parser.add_argument("--sources", type=int, default=5)
+    args = parser.parse_args()
+
+    graphs = {name: get_graph_by_name(name) for name in args.graph}
+    if not graphs:
+        graphs[f"scale_free_{args.nodes}"] = cfpq_data.labeled_scale_free_graph(
+            args.nodes, labels=["a", "b"]
+        )
+
+    for graph_name, graph in graphs.items():
+        for grammar_name, text in GRAMMARS.items():
+            a, b = args.labels
+            cfg = CFG.from_text(text.format(a=a, b=b))
+            old_time, old = timed(fixpoint_hellings, cfg, graph)
+            new_time, new = timed(hellings_based_cfpq, cfg, graph)
+            assert old == new
+            print(
+                f"{graph_name:>20} {grammar_name:>16}: fixpoint {old_time:8.3f} s, "
+                f"worklist {new_time:8.3f} s, {len(new)} pairs, "
+                f"speedup {old_time / new_time:.1f}x"
+            )
+
+            start_nodes = set(list(graph.nodes)[: args.sources])
+            all_time, all_pairs = timed(
+                hellings_based_cfpq, cfg, graph, start_nodes, None, "all_pairs"
+            )
+            demand_time, demand = timed(
+                hellings_based_cfpq, cfg, graph, start_nodes, None, "demand"
+            )
+            assert all_pairs == demand
+            print(
+                f"{graph_name:>20} {grammar_name:>16}: {len(start_nodes)} sources, "
+                f"all pairs {all_time:8.3f} s, demand {demand_time:8.3f} s, "
+                f"{len(demand)} pairs, speedup {all_time / demand_time:.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Cost of keeping an RPQ answer up to date under edge insertions, edge
+deletions and node removals with ``MaintainedRPQ`` versus recomputing it with
+``ms_bfs_based_rpq`` after every batch.
+
+Usage: python -m benchmarks.incremental_rpq [--nodes N] [--edges M]
+       [--batches B] [--batch-size K]
+Edge batches have K edges, node removal batches one node.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import synthetic_graph
+from project.incremental_rpq import MaintainedRPQ
+from project.task4_rpq import ms_bfs_based_rpq
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=20_000)
+    parser.add_argument("--edges", type=int, default=60_000)
+    parser.add_argument("--regex", default="l0* (l1 | l2) l3*")
+    parser.add_argument("--start-size", type=int, default=100)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    graph = synthetic_graph(args.nodes, args.edges, 4, args.seed)
+    start_nodes = set(range(args.start_size))
+    rng = np.random.default_rng(args.seed + 1)
+
+    start = time.perf_counter()
+    maintained = MaintainedRPQ(args.regex, graph, start_nodes, set())
+    build_time = time.perf_counter() - start
+
+    def timed_batch(update, apply_to_graph) -> tuple[float, float]:
+        start = time.perf_counter()
+        update()
+        update_time = time.perf_counter() - start
+        apply_to_graph()
+        start = time.perf_counter()
+        expected = ms_bfs_based_rpq(args.regex, graph, start_nodes, set())
+        recompute_time = time.perf_counter() - start
+        assert maintained.result() == expected
+        return update_time, recompute_time
+
+    times = {"insert edges": [], "delete edges": [], "remove nodes": []}
+    for _ in range(args.batches):
+        edges = [
+            (int(u), int(v), f"l{label}")
+            for u, v, label in zip(
+                rng.integers(0, args.nodes, args.batch_size),
+                rng.integers(0, args.nodes, args.batch_size),
+                rng.integers(0, 4, args.batch_size),
+            )
+        ]
+        times["insert edges"].append(
+            timed_batch(
+                lambda: maintained.add_edges(edges),
+                lambda: graph.add_edges_from(
+                    (u, v, {"label": label}) for u, v, label in edges
+                ),
+            )
+        )
+
+    for _ in range(args.batches):
+        all_edges = list(graph.edges(keys=True, data="label"))
+        picked = [all_edges[i] for i in rng.choice(len(all_edges), args.batch_size)]
+        picked = list({(u, v, key): label for u, v, key, label in picked}.items())
+        times["delete edges"].append(
+            timed_batch(
+                lambda: maintained.remove_edges(
+                    (u, v, label) for (u, v, _), label in picked
+                ),
+                lambda: graph.remove_edges_from(edge for edge, _ in picked),
+            )
+        )
+
+    for _ in range(args.batches):
+        # start nodes are kept, removing one would also change the query
+        candidates = [node for node in graph.nodes if node not in start_nodes]
+        nodes = [candidates[i] for i in rng.choice(len(candidates), 1)]
+        times["remove nodes"].append(
+            timed_batch(
+                lambda: maintained.remove_nodes(nodes),
+                lambda: graph.remove_nodes_from(nodes),
+            )
+        )
+
+    print(f"graph: {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
+    print(f"initial build: {build_time:.3f} s, {len(maintained.pairs)} pairs")
+    for name, samples in times.items():
+        update = sum(t for t, _ in samples) / len(samples) * 1000
+        recompute = sum(t for _, t in samples) / len(samples) * 1000
+        print(
+            f"{name:>12}: maintained {update:9.2f} ms, "
+            f"recompute {recompute:9.2f} ms per batch"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Scaling of ``parallel_ms_bfs_based_rpq`` with the number of worker processes,
+compared with the single-process ``ms_bfs_based_rpq``.
+
+Usage: python -m benchmarks.parallel_rpq [--workers 1 2 4 8] [--graph NAME]
+"""
+
+import argparse
+import os
+
+import cfpq_data
+
+from benchmarks.common import synthetic_graph, timed
+from project.parallel_rpq import parallel_ms_bfs_based_rpq
+from project.task1_graph_utilities import get_graph_by_name
+from project.task4_rpq import ms_bfs_based_rpq
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--graph", help="CFPQ_Data graph name")
+    parser.add_argument("--nodes", type=int, default=20_000)
+    parser.add_argument("--edges", type=int, default=60_000)
+    parser.add_argument("--start-size", type=int, default=2_000)
+    parser.add_argument(
+        "--workers", type=int, nargs="*", default=[1, 2, 4, os.cpu_count()]
+    )
+    parser.add_argument("--regex", help="defaults to '(l0 | l1)* l2' over the labels")
+    args = parser.parse_args()
+
+    if args.graph:
+        graph = get_graph_by_name(args.graph)
+    else:
+        graph = synthetic_graph(args.nodes, args.edges, 6, 0)
+    labels = cfpq_data.get_sorted_labels(graph)
+    regex = args.regex or "({0} | {1})* {2}".format(*(labels * 3)[:3])
+    start_nodes = set(list(graph.nodes)[: args.start_size])
+
+    print(f"graph: {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
+    print(f"query: {regex}, {len(start_nodes)} start nodes, {os.cpu_count()} cpus")
+    base_time, expected = timed(ms_bfs_based_rpq, regex, graph, start_nodes, set())
+    print(f"{'ms_bfs':>12}: {base_time:7.3f} s")
+    for workers in sorted(set(args.workers)):
+        elapsed, result = timed(
+            parallel_ms_bfs_based_rpq, regex, graph, start_nodes, set(), workers
+        )
+        assert result == expected
+        print(
+            f"{workers:>4} workers: {elapsed:7.3f} s, "
+            f"speedup {base_time / elapsed:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Compares ``tensor_based_rpq`` and ``ms_bfs_based_rpq`` (task 5) on CFPQ_Data
+graphs or a synthetic one. Queries are built from templates over the most
+frequent labels of a graph, start sets of every size are sampled with
+``cfpq_data.generate_multiple_source``, and every run records wall time, peak
+RSS and result size.
+
+Usage: python -m benchmarks.rpq --graph wine bzip --start-sizes 1 10 100 --csv rpq.csv
+       python -m benchmarks.rpq --synthetic 10000 50000 4 --json rpq.json
+"""
+
+import argparse
+from dataclasses import asdict, dataclass
+
+import cfpq_data
+from networkx import MultiDiGraph
+
+from benchmarks.common import load_graphs, measure, write_records
+from project.task3_adjacency_matrix import tensor_based_rpq
+from project.task4_rpq import ms_bfs_based_rpq
+
+ALGORITHMS = {"tensor": tensor_based_rpq, "ms_bfs": ms_bfs_based_rpq}
+
+# {k} is the k-th most frequent label of the graph
+TEMPLATES = [
+    "{0}*",
+    "({0} | {1})*",
+    "{0} {1}* {2}",
+    "({0} {1})* ({2} | {0})*",
+]
+
+
+@dataclass
+class RPQRecord:
+    graph: str
+    nodes: int
+    edges: int
+    algorithm: str
+    query: str
+    start_size: int
+    repeat: int
+    seconds: float
+    result_size: int
+    peak_rss_mib: float
+    rss_growth_mib: float
+
+
+def make_queries(graph: MultiDiGraph, templates: list[str] = None) -> list[str]:
+    labels = cfpq_data.get_sorted_labels(graph)
+    top = [labels[k % len(labels)] for k in range(3)]
+    return [template.format(*top) for template in templates or TEMPLATES]
+
+
+def main(argv: list[str] = None) -> list[RPQRecord]:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--graph", nargs="*", default=[], help="CFPQ_Data graph names")
+    parser.add_argument(
+        "--synthetic",
+        nargs=3,
+        type=int,
+        default=[2_000, 10_000, 4],
+        metavar=("NODES", "EDGES", "LABELS"),
+        help="random graph used when no --graph is given",
+    )
+    parser.add_argument(
+        "--algorithms", nargs="+", choices=sorted(ALGORITHMS), default=list(ALGORITHMS)
+    )
+    parser.add_argument("--start-sizes", nargs="+", type=int, default=[1, 10, 100])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--csv", help="write records to this CSV file")
+    parser.add_argument("--json", help="write records to this JSON file")
+    parser.add_argument(
+        "--no-isolation",
+        action="store_true",
+        help="run in this process, peak RSS then covers all previous runs",
+    )
+    args = parser.parse_args(argv)
+
+    records = []
+    for graph_name, graph in load_graphs(args.graph, args.synthetic, args.seed).items():
+        final_nodes = set(graph.nodes)
+        for start_size in args.start_sizes:
+            start_size = min(start_size, graph.number_of_nodes())
+            start_nodes = cfpq_data.generate_multiple_source(
+                graph, start_size, seed=args.seed
+            )
+            for query in make_queries(graph):
+                for algorithm in args.algorithms:
+                    for repeat in range(args.repeats):
+                        measurement = measure(
+                            ALGORITHMS[algorithm],
+                            query,
+                            graph,
+                            start_nodes,
+                            final_nodes,
+                            isolated=not args.no_isolation,
+                        )
+                        record = RPQRecord(
+                            graph=graph_name,
+                            nodes=graph.number_of_nodes(),
+                            edges=graph.number_of_edges(),
+                            algorithm=algorithm,
+                            query=query,
+                            start_size=start_size,
+                            repeat=repeat,
+                            **asdict(measurement),
+                        )
+                        records.append(record)
+                        print(
+                            f"{graph_name} {algorithm:>7} {start_size:>6} "
+                            f"{query!r:>30}: {record.seconds:8.3f} s, "
+                            f"{record.result_size} pairs, "
+                            f"peak RSS {record.peak_rss_mib:.0f} MiB "
+                            f"(+{record.rss_growth_mib:.0f})"
+                        )
+
+    write_records(records, args.csv, args.json)
+    return records
+
+
+if __name__ == "__main__":
+    main()
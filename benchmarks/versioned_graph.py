@@ -0,0 +1,85 @@
+"""
+Cost of a graph snapshot per mutation, as the query language interpreter
+takes one: copying a ``MultiDiGraph`` and indexing the copy versus deriving a
+``GraphVersion`` that shares the label matrices of the unchanged labels.
+Every snapshot is queried, and all snapshots are queried again at the end to
+check that older versions stay valid.
+
+Usage: python -m benchmarks.versioned_graph [--nodes N] [--edges M]
+       [--labels L] [--steps S]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import synthetic_graph
+from project.task4_rpq import GraphIndex, compile_regex, ms_bfs
+from project.versioned_graph import GraphVersion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=20_000)
+    parser.add_argument("--edges", type=int, default=100_000)
+    parser.add_argument("--labels", type=int, default=8)
+    parser.add_argument("--regex", default="l0 l1* l2")
+    parser.add_argument("--start-size", type=int, default=20)
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    graph = synthetic_graph(args.nodes, args.edges, args.labels, args.seed)
+    regex_am = compile_regex(args.regex)
+    start_nodes = list(range(args.start_size))
+    rng = np.random.default_rng(args.seed + 1)
+    edges = [
+        (int(u), int(v), f"l{label}")
+        for u, v, label in zip(
+            rng.integers(0, args.nodes, args.steps),
+            rng.integers(0, args.nodes, args.steps),
+            rng.integers(0, args.labels, args.steps),
+        )
+    ]
+
+    copies, copy_times, copy_results = [], [], []
+    current = graph
+    for u, v, label in edges:
+        start = time.perf_counter()
+        current = current.copy()
+        current.add_edge(u, v, label=label)
+        index = GraphIndex(current)
+        copy_results.append(ms_bfs(index, regex_am, start_nodes, ()))
+        copy_times.append(time.perf_counter() - start)
+        copies.append(index)
+
+    start = time.perf_counter()
+    version = GraphVersion.from_graph(graph)
+    version.automaton()
+    build_time = time.perf_counter() - start
+    versions, version_times, version_results = [], [], []
+    for u, v, label in edges:
+        start = time.perf_counter()
+        version = version.add_edge(u, label, v)
+        index = GraphIndex.from_automaton(version.automaton())
+        version_results.append(ms_bfs(index, regex_am, start_nodes, ()))
+        version_times.append(time.perf_counter() - start)
+        versions.append(version)
+
+    assert copy_results == version_results
+    for version, expected in zip(versions, version_results):
+        index = GraphIndex.from_automaton(version.automaton())
+        assert ms_bfs(index, regex_am, start_nodes, ()) == expected
+
+    print(f"graph: {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
+    print(f"initial version build: {build_time:.3f} s")
+    for name, samples in (("copy", copy_times), ("version", version_times)):
+        print(
+            f"{name:>8}: {sum(samples) / len(samples) * 1000:9.2f} ms "
+            "per mutation, snapshot and query"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import numpy as np
+from scipy.sparse import csr_matrix, dok_matrix, spmatrix
+from scipy.sparse.csgraph import connected_components
+
+WORD_BITS = 64
+
+
+def words_for(size: int) -> int:
+    return (size + WORD_BITS - 1) // WORD_BITS
+
+
+class BitMatrix:
+    """
+    Square boolean matrix whose rows are packed into uint64 words.
+
+    Several rows may share one packed row: ``row_map[i]`` is the index of the
+    packed row used for row ``i``. This is how vertices of one strongly
+    connected component share their (identical) reachability row.
+    """
+
+    words: np.ndarray
+    row_map: np.ndarray
+    size: int
+
+    def __init__(self, words: np.ndarray, size: int, row_map: np.ndarray = None):
+        self.words = words
+        self.size = size
+        self.row_map = row_map if row_map is not None else np.arange(size)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.size, self.size
+
+    def __getitem__(self, key: tuple[int, int]) -> bool:
+        i, j = key
+        word = self.words[self.row_map[i], j // WORD_BITS]
+        return bool((int(word) >> (j % WORD_BITS)) & 1)
+
+    def row(self, i: int) -> np.ndarray:
+        # little bit order matches the layout used by ``from_sparse``
+        bits = np.unpackbits(
+            self.words[self.row_map[i]].view(np.uint8), bitorder="little"
+        )
+        return np.flatnonzero(bits[: self.size])
+
+    def rows(self, indices) -> csr_matrix:
+        """The given rows as a ``len(indices) x size`` sparse matrix."""
+        rows = [self.row(i) for i in indices]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(r) for r in rows])
+        indices = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        data = np.ones(len(indices), dtype=bool)
+        return csr_matrix((data, indices, indptr), shape=(len(rows), self.size))
+
+    def tocsr(self) -> csr_matrix:
+        return self.rows(range(self.size))
+
+    def todok(self) -> dok_matrix:
+        return self.tocsr().todok()
+
+    @classmethod
+    def from_sparse(cls, matrix: spmatrix) -> "BitMatrix":
+        size = matrix.shape[0]
+        coo = matrix.tocoo()
+        words = np.zeros((size, words_for(size)), dtype=np.uint64)
+        set_bits(words, coo.row, coo.col)
+        return cls(words, size)
+
+
+def set_bits(words: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> None:
+    cols = np.asarray(cols, dtype=np.uint64)
+    masks = np.left_shift(np.uint64(1), cols % np.uint64(WORD_BITS))
+    np.bitwise_or.at(
+        words,
+        (np.asarray(rows), (cols // np.uint64(WORD_BITS)).astype(np.int64)),
+        masks,
+    )
+
+
+def _gather_segments(indptr: np.ndarray, rows: np.ndarray):
+    # positions of csr entries of the given rows, and the start of each row segment
+    lengths = indptr[rows + 1] - indptr[rows]
+    seg_starts = np.zeros(len(rows), dtype=np.int64)
+    seg_starts[1:] = np.cumsum(lengths)[:-1]
+    positions = np.repeat(indptr[rows] - seg_starts, lengths) + np.arange(lengths.sum())
+    return positions, seg_starts
+
+
+def bitset_transitive_closure(adjacency: spmatrix) -> BitMatrix:
+    """
+    Reflexive-transitive closure of a boolean adjacency matrix.
+
+    Vertices are collapsed into strongly connected components, and the rows of
+    the condensation are filled in reverse topological order, one level at a
+    time: a component row is the OR of its own members and the rows of all its
+    successors, computed with word-level ``bitwise_or.reduceat``.
+    """
+    size = adjacency.shape[0]
+    if size == 0:
+        return BitMatrix(np.zeros((0, 0), dtype=np.uint64), 0)
+    adjacency = csr_matrix(adjacency, dtype=bool)
+    comp_num, labels = connected_components(
+        adjacency, directed=True, connection="strong"
+    )
+
+    coo = adjacency.tocoo()
+    cross = labels[coo.row] != labels[coo.col]
+    condensed = csr_matrix(
+        (
+            np.ones(cross.sum(), dtype=bool),
+            (labels[coo.row[cross]], labels[coo.col[cross]]),
+        ),
+        shape=(comp_num, comp_num),
+    )
+    condensed.sum_duplicates()
+    condensed.indptr = condensed.indptr.astype(np.int64)
+
+    words = np.zeros((comp_num, words_for(size)), dtype=np.uint64)
+    set_bits(words, labels, np.arange(size))
+
+    predecessors = condensed.T.tocsr()
+    predecessors.indptr = predecessors.indptr.astype(np.int64)
+    out_degree = np.diff(condensed.indptr)
+    level = np.flatnonzero(out_degree == 0)
+    while len(level) > 0:
+        positions, seg_starts = _gather_segments(condensed.indptr, level)
+        if len(positions) > 0:
+            nonempty = np.diff(np.append(seg_starts, len(positions))) > 0
+            reduced = np.bitwise_or.reduceat(
+                words[condensed.indices[positions]], seg_starts[nonempty], axis=0
+            )
+            words[level[nonempty]] |= reduced
+
+        pred_positions, _ = _gather_segments(predecessors.indptr, level)
+        preds = predecessors.indices[pred_positions]
+        np.subtract.at(out_degree, preds, 1)
+        level = np.unique(preds[out_degree[preds] == 0])
+
+    return BitMatrix(words, size, labels)
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import cfpq_data
+import networkx as nx
+import numpy as np
+
+GRAPH_CACHE_ENV = "FORMAL_LANG_GRAPH_CACHE"
+DEFAULT_GRAPH_CACHE = Path.home() / ".cache" / "formal-lang-course" / "graphs"
+
+ARRAYS = ("nodes", "sources", "targets", "label_ids")
+
+
+@dataclass
+class StoredGraph:
+    """
+    A graph kept as flat edge arrays plus a label dictionary. The arrays are
+    memory-mapped from the store, so opening a stored graph reads only
+    ``meta.json``.
+    """
+
+    name: str
+    content_hash: str
+    nodes: np.ndarray
+    sources: np.ndarray
+    targets: np.ndarray
+    label_ids: np.ndarray
+    labels: list
+    sorted_labels: list
+
+    @property
+    def nodes_num(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def edges_num(self) -> int:
+        return len(self.sources)
+
+    def to_networkx(self) -> nx.MultiDiGraph:
+        graph = nx.MultiDiGraph()
+        graph.add_nodes_from(self.nodes.tolist())
+        labels = self.labels
+        graph.add_edges_from(
+            (u, v, {"label": labels[label_id]})
+            for u, v, label_id in zip(
+                self.sources.tolist(), self.targets.tolist(), self.label_ids.tolist()
+            )
+        )
+        return graph
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class GraphStore:
+    """
+    On-disk store of parsed graphs, laid out as ``<root>/<name>/<hash>/``
+    with one ``.npy`` file per array and ``meta.json``. ``<root>/<name>/current``
+    names the hash returned by ``load``.
+    """
+
+    root: Path
+
+    def __init__(self, root: Path | str):
+        self.root = Path(root)
+
+    def _current_file(self, name: str) -> Path:
+        return self.root / name / "current"
+
+    def load(self, name: str) -> StoredGraph | None:
+        current = self._current_file(name)
+        if not current.is_file():
+            return None
+        content_hash = current.read_text().strip()
+        entry = self.root / name / content_hash
+        try:
+            with open(entry / "meta.json") as f:
+                meta = json.load(f)
+            arrays = {
+                array: np.load(entry / f"{array}.npy", mmap_mode="r")
+                for array in ARRAYS
+            }
+        except (OSError, ValueError):
+            return None
+        return StoredGraph(
+            name=name,
+            content_hash=content_hash,
+            labels=meta["labels"],
+            sorted_labels=meta["sorted_labels"],
+            **arrays,
+        )
+
+    def save(self, name: str, graph: nx.MultiDiGraph, content_hash: str) -> StoredGraph:
+        nodes = list(graph.nodes)
+        node_array = np.asarray(nodes, dtype=np.int64)
+        edges = list(graph.edges(data="label"))
+        label_index = {}
+        for _, _, label in edges:
+            label_index.setdefault(label, len(label_index))
+        labels = [_json_value(label) for label in label_index]
+        arrays = {
+            "nodes": node_array,
+            "sources": np.fromiter((u for u, _, _ in edges), np.int64, len(edges)),
+            "targets": np.fromiter((v for _, v, _ in edges), np.int64, len(edges)),
+            "label_ids": np.fromiter(
+                (label_index[label] for _, _, label in edges), np.int32, len(edges)
+            ),
+        }
+        sorted_labels = [
+            _json_value(label) for label in cfpq_data.get_sorted_labels(graph)
+        ]
+
+        entry = self.root / name / content_hash
+        entry.mkdir(parents=True, exist_ok=True)
+        for array, values in arrays.items():
+            np.save(entry / f"{array}.npy", values)
+        with open(entry / "meta.json", "w") as f:
+            json.dump({"labels": labels, "sorted_labels": sorted_labels}, f)
+
+        # written last and replaced atomically, so a half-written entry is never used
+        current = self._current_file(name)
+        tmp = current.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(content_hash)
+        os.replace(tmp, current)
+        return self.load(name)
+
+    def fetch(self, name: str) -> tuple[StoredGraph, nx.MultiDiGraph | None]:
+        """
+        Returns the stored graph, downloading and parsing it on a cache miss.
+        The parsed graph is returned as well when it had to be built.
+        """
+        stored = self.load(name)
+        if stored is not None:
+            return stored, None
+        path = cfpq_data.download(name)
+        graph = cfpq_data.graph_from_csv(path)
+        return self.save(name, graph, file_hash(path)), graph
+
+
+def _json_value(value):
+    # labels parsed by pandas may be NumPy scalars
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def default_graph_store() -> GraphStore:
+    return GraphStore(os.environ.get(GRAPH_CACHE_ENV, DEFAULT_GRAPH_CACHE))
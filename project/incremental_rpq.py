@@ -0,0 +1,264 @@
+from collections import deque
+from typing import Any, Hashable, Iterable
+
+from networkx import MultiDiGraph
+
+from project.task3_adjacency_matrix import compile_regex
+
+
+def _bit_positions(bits: int) -> Iterable[int]:
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class MaintainedRPQ:
+    """
+    Answer of ``ms_bfs_based_rpq(regex, graph, start_nodes, final_nodes)``
+    kept up to date under edge insertions and deletions. For every graph node
+    and regex state the start nodes reaching that product state are stored as
+    a bitmask, and an inserted edge only propagates the bits that are new at
+    its target, so an update costs time proportional to the product states
+    and edges it newly reaches.
+
+    Every bit also records the product state it was first derived from, which
+    makes the recorded derivations a forest rooted at the start states.
+    Deletions use delete-and-rederive over that forest: only the bits whose
+    recorded derivation passes through a removed edge are deleted, and the
+    deleted ones with a remaining predecessor are derived again.
+
+    As in ``ms_bfs``, an empty node set stands for all nodes, including the
+    ones added later. The graph itself is copied and not modified, parallel
+    edges are counted.
+    """
+
+    def __init__(
+        self,
+        regex: str,
+        graph: MultiDiGraph,
+        start_nodes: set[int] = None,
+        final_nodes: set[int] = None,
+    ):
+        regex_am = compile_regex(regex)
+        self.regex_size = regex_am.size
+        # label -> targets of every regex state
+        self.transitions: dict[Any, list[list[int]]] = {}
+        for symbol, matr in regex_am.decomposed_adj_matrix.items():
+            targets = [[] for _ in range(self.regex_size)]
+            coo = matr.tocoo()
+            for q, q_to in zip(coo.row.tolist(), coo.col.tolist()):
+                targets[q].append(q_to)
+            self.transitions[symbol.value] = targets
+        self.reverse_transitions: dict[Any, list[list[int]]] = {}
+        for label, targets in self.transitions.items():
+            sources = [[] for _ in range(self.regex_size)]
+            for q, q_targets in enumerate(targets):
+                for q_to in q_targets:
+                    sources[q_to].append(q)
+            self.reverse_transitions[label] = sources
+        self.regex_starts = regex_am.start_indices().tolist()
+        self.is_final_state = regex_am.final_mask().tolist()
+
+        self.all_sources = not start_nodes
+        self.all_finals = not final_nodes
+        self.final_nodes = set(final_nodes or ())
+        # given start and final nodes stay even when removed from the graph
+        self.pinned = set(start_nodes or ()) | self.final_nodes
+        # bit i of a mask is the start node sources[i]
+        self.sources: list[Hashable] = []
+        # node -> label -> successor -> number of parallel edges, the inverse
+        # without counts, and node -> source bitmask per regex state
+        self.successors: dict[Hashable, dict[Any, dict[Hashable, int]]] = {}
+        self.predecessors: dict[Hashable, dict[Any, set[Hashable]]] = {}
+        self.reached: dict[Hashable, list[int]] = {}
+        # node -> per regex state, the bits first derived from every parent
+        # (node, regex state), None for start states
+        self.parents: dict[Hashable, list[dict[tuple | None, int]]] = {}
+        self.pairs: set[tuple[int, int]] = set()
+
+        front = []
+        for node in [*graph.nodes, *(start_nodes or ()), *(final_nodes or ())]:
+            self._add_node(node, front)
+        for node in start_nodes or ():
+            self._add_source(node, front)
+        self._propagate(front)
+        self.add_edges(graph.edges(data="label"))
+
+    def _add_source(self, node: Hashable, front: list):
+        bit = 1 << len(self.sources)
+        self.sources.append(node)
+        front.extend((node, q, bit, None) for q in self.regex_starts)
+
+    def _add_node(self, node: Hashable, front: list):
+        if node in self.reached:
+            return
+        self.reached[node] = [0] * self.regex_size
+        self.successors[node] = {}
+        self.predecessors[node] = {}
+        self.parents[node] = [{} for _ in range(self.regex_size)]
+        if self.all_sources:
+            self._add_source(node, front)
+
+    def _propagate(self, front: list[tuple[Hashable, int, int, tuple]]) -> set:
+        # breadth-first, so recorded derivations stay short and
+        # deleting an edge cuts off small subtrees
+        front = deque(front)
+        new_pairs = set()
+        while front:
+            node, q, bits, parent = front.popleft()
+            masks = self.reached[node]
+            bits &= ~masks[q]
+            if not bits:
+                continue
+            masks[q] |= bits
+            tree = self.parents[node][q]
+            tree[parent] = tree.get(parent, 0) | bits
+            if self.is_final_state[q] and (self.all_finals or node in self.final_nodes):
+                for i in _bit_positions(bits):
+                    new_pairs.add((self.sources[i], node))
+            key = (node, q)
+            for label, targets in self.successors[node].items():
+                moves = self.transitions.get(label)
+                if moves is None:
+                    continue
+                for q_to in moves[q]:
+                    front.extend((v, q_to, bits, key) for v in targets)
+        new_pairs -= self.pairs
+        self.pairs |= new_pairs
+        return new_pairs
+
+    def add_edges(self, edges: Iterable[tuple[Hashable, Hashable, Any]]) -> set:
+        """Inserts ``(u, v, label)`` edges and returns the answer pairs they add."""
+        front = []
+        for u, v, label in edges:
+            self._add_node(u, front)
+            self._add_node(v, front)
+            targets = self.successors[u].setdefault(label, {})
+            targets[v] = targets.get(v, 0) + 1
+            if targets[v] > 1:
+                continue
+            self.predecessors[v].setdefault(label, set()).add(u)
+            moves = self.transitions.get(label)
+            if moves is None:
+                continue
+            for q, bits in enumerate(self.reached[u]):
+                if bits:
+                    front.extend((v, q_to, bits, (u, q)) for q_to in moves[q])
+        return self._propagate(front)
+
+    def remove_edges(self, edges: Iterable[tuple[Hashable, Hashable, Any]]) -> set:
+        """
+        Deletes one copy of every ``(u, v, label)`` edge and returns the answer
+        pairs that are lost.
+        """
+        front = []
+        for u, v, label in edges:
+            targets = self.successors.get(u, {}).get(label, {})
+            if v not in targets:
+                continue
+            targets[v] -= 1
+            if targets[v] > 0:
+                continue
+            del targets[v]
+            self.predecessors[v][label].discard(u)
+            moves = self.transitions.get(label)
+            if moves is None:
+                continue
+            for q, bits in enumerate(self.reached[u]):
+                if bits:
+                    front.extend((v, q_to, bits, (u, q)) for q_to in moves[q])
+        return self._delete_and_rederive(front)
+
+    def remove_nodes(self, nodes: Iterable[Hashable]) -> set:
+        """Deletes nodes with their edges and returns the answer pairs that are lost."""
+        lost = set()
+        for node in nodes:
+            if node not in self.reached:
+                continue
+            edges = [
+                (node, v, label)
+                for label, targets in self.successors[node].items()
+                for v, count in targets.items()
+                for _ in range(count)
+            ]
+            edges += [
+                (u, node, label)
+                for label, sources in self.predecessors[node].items()
+                for u in sources
+                for _ in range(self.successors[u][label][node])
+            ]
+            lost |= self.remove_edges(edges)
+            if node in self.pinned:
+                continue
+            # the node is isolated now, so its source bit is set nowhere else
+            del self.reached[node], self.successors[node], self.predecessors[node]
+            del self.parents[node]
+            if (node, node) in self.pairs:
+                self.pairs.discard((node, node))
+                lost.add((node, node))
+        return lost
+
+    def _rederivations(self, node: Hashable, q: int, bits: int) -> list[tuple]:
+        # (node, q, bits, parent) for the given bits held by a predecessor
+        found = []
+        for label, sources in self.predecessors[node].items():
+            back = self.reverse_transitions.get(label)
+            if back is None:
+                continue
+            for q_from in back[q]:
+                for u in sources:
+                    held = bits & self.reached[u][q_from]
+                    if held:
+                        found.append((node, q, held, (u, q_from)))
+        return found
+
+    def _delete_and_rederive(self, front: list[tuple[Hashable, int, int, tuple]]):
+        # delete the bits whose recorded derivation passes through a removed
+        # edge; a parent key may stand for several labels, which only deletes
+        # more than needed
+        deleted: dict[Hashable, list[int]] = {}
+        while front:
+            node, q, bits, parent = front.pop()
+            tree = self.parents[node][q]
+            bits &= tree.get(parent, 0)
+            if not bits:
+                continue
+            if tree[parent] == bits:
+                del tree[parent]
+            else:
+                tree[parent] &= ~bits
+            self.reached[node][q] &= ~bits
+            deleted.setdefault(node, [0] * self.regex_size)[q] |= bits
+            key = (node, q)
+            for label, targets in self.successors[node].items():
+                moves = self.transitions.get(label)
+                if moves is None:
+                    continue
+                for q_to in moves[q]:
+                    front.extend((v, q_to, bits, key) for v in targets)
+
+        # start states are never deleted, so every deleted bit that is still
+        # derivable has a derivation leaving the kept bits
+        for node, masks in deleted.items():
+            for q, bits in enumerate(masks):
+                if bits:
+                    front.extend(self._rederivations(node, q, bits))
+        self._propagate(front)
+
+        lost = set()
+        for node, masks in deleted.items():
+            if not (self.all_finals or node in self.final_nodes):
+                continue
+            deleted_bits = kept_bits = 0
+            for q, bits in enumerate(masks):
+                if self.is_final_state[q]:
+                    deleted_bits |= bits
+                    kept_bits |= self.reached[node][q]
+            for i in _bit_positions(deleted_bits & ~kept_bits):
+                lost.add((self.sources[i], node))
+        self.pairs -= lost
+        return lost
+
+    def result(self) -> set[tuple[int, int]]:
+        return set(self.pairs)
@@ -0,0 +1,169 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+from networkx import MultiDiGraph
+from scipy.sparse import csr_matrix
+
+from project.task3_adjacency_matrix import compile_regex
+from project.task4_rpq import GraphIndex, ms_bfs_reachability
+
+
+@dataclass(frozen=True)
+class SharedArray:
+    name: str
+    dtype: str
+    shape: tuple[int, ...]
+
+
+@dataclass(frozen=True)
+class SharedCSR:
+    """Picklable handle of a CSR matrix whose buffers live in shared memory."""
+
+    data: SharedArray
+    indices: SharedArray
+    indptr: SharedArray
+    shape: tuple[int, int]
+
+
+class SharedMatrices:
+    """
+    Owner of the shared memory blocks holding a set of CSR matrices. Workers
+    attach to them by name, so no matrix is pickled or copied per worker.
+    """
+
+    def __init__(self):
+        self._blocks: list[shared_memory.SharedMemory] = []
+
+    def __enter__(self) -> "SharedMatrices":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _share_array(self, array: np.ndarray) -> SharedArray:
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self._blocks.append(block)
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+        return SharedArray(block.name, array.dtype.str, array.shape)
+
+    def share(self, matrix: csr_matrix) -> SharedCSR:
+        matrix = csr_matrix(matrix)
+        return SharedCSR(
+            self._share_array(matrix.data),
+            self._share_array(matrix.indices),
+            self._share_array(matrix.indptr),
+            matrix.shape,
+        )
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks.clear()
+
+
+# blocks a worker is attached to; they must stay open while matrices use them
+_attached: list[shared_memory.SharedMemory] = []
+_worker_query: dict = {}
+
+
+def _attach_array(handle: SharedArray) -> np.ndarray:
+    # workers report to the parent's resource tracker, where the block is
+    # already registered, so attaching leaves the owner responsible for unlink
+    block = shared_memory.SharedMemory(name=handle.name)
+    _attached.append(block)
+    return np.ndarray(handle.shape, np.dtype(handle.dtype), buffer=block.buf)
+
+
+def attach_csr(handle: SharedCSR) -> csr_matrix:
+    matrix = csr_matrix(handle.shape, dtype=bool)
+    matrix.data = _attach_array(handle.data)
+    matrix.indices = _attach_array(handle.indices)
+    matrix.indptr = _attach_array(handle.indptr)
+    return matrix
+
+
+def _init_worker(graph_handles, graph_size, regex_handles, regex_size, starts, finals):
+    _worker_query.update(
+        graph_transposed={s: attach_csr(h) for s, h in graph_handles.items()},
+        graph_size=graph_size,
+        regex_matrices={s: attach_csr(h) for s, h in regex_handles.items()},
+        regex_size=regex_size,
+        regex_starts=starts,
+        regex_finals=finals,
+    )
+
+
+def _run_shard(
+    sources: np.ndarray, finals: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    source_pos, targets = ms_bfs_reachability(
+        sources=sources, finals=finals, **_worker_query
+    )
+    return sources[source_pos], targets
+
+
+def parallel_ms_bfs_based_rpq(
+    regex: str,
+    graph: MultiDiGraph,
+    start_nodes: set[int],
+    final_nodes: set[int],
+    workers: int = None,
+    shards: int = None,
+) -> set[tuple[int, int]]:
+    """
+    ``ms_bfs_based_rpq`` with start nodes split into shards that are evaluated
+    by a process pool. Graph and regex label matrices are placed in shared
+    memory once and attached by every worker; only shard index arrays and
+    reached index pairs cross process boundaries.
+    """
+    workers = workers or os.cpu_count() or 1
+    shards = shards or workers * 4
+    index = GraphIndex(graph, set(start_nodes or ()) | set(final_nodes or ()))
+    regex_am = compile_regex(regex)
+    alphabet = regex_am.alphabet & index.alphabet
+    sources = index.indices(start_nodes)
+    finals = index.indices(final_nodes)
+
+    reached_sources, reached_targets = [], []
+    with SharedMatrices() as shared:
+        # symbols are sent as their labels, pyformlang objects stay in the parent
+        graph_handles = {
+            symbol.value: shared.share(index.transposed(symbol)) for symbol in alphabet
+        }
+        regex_handles = {
+            symbol.value: shared.share(regex_am.decomposed_adj_matrix[symbol])
+            for symbol in alphabet
+        }
+        init_args = (
+            graph_handles,
+            index.size,
+            regex_handles,
+            regex_am.size,
+            regex_am.start_indices(),
+            regex_am.final_indices(),
+        )
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=init_args
+        ) as pool:
+            futures = [
+                pool.submit(_run_shard, shard, finals)
+                for shard in np.array_split(sources, shards)
+                if len(shard) > 0
+            ]
+            for future in futures:
+                shard_sources, targets = future.result()
+                reached_sources.append(shard_sources)
+                reached_targets.append(targets)
+
+    node_values = index.node_values
+    return {
+        (u, v)
+        for shard_sources, targets in zip(reached_sources, reached_targets)
+        for u, v in zip(
+            node_values[shard_sources].tolist(), node_values[targets].tolist()
+        )
+    }
@@ -0,0 +1,361 @@
+"""
+Parse trees of the graph query language (task 11) and a recursive-descent
+parser for it. Regular expression operators bind, from loosest to tightest:
+``|``, ``&``, ``.``, ``^``; ``^ [n]`` is a shorthand for ``^ [n .. n]``.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+KEYWORDS = {
+    "let",
+    "is",
+    "graph",
+    "add",
+    "remove",
+    "vertex",
+    "edge",
+    "vertices",
+    "from",
+    "to",
+    "for",
+    "in",
+    "return",
+    "where",
+    "reachable",
+    "by",
+}
+
+TOKEN = re.compile(
+    r"""
+    (?P<space>\s+)
+    | (?P<num>0|[1-9][0-9]*)
+    | (?P<char>"[a-z]")
+    | (?P<name>[a-z][a-z0-9]*)
+    | (?P<op>\.\.|[=()\[\],|^.&])
+    """,
+    re.VERBOSE,
+)
+
+
+class QuerySyntaxError(ValueError):
+    pass
+
+
+@dataclass
+class Token:
+    kind: str
+    text: str
+    line: int
+    column: int
+
+
+def tokenize(program: str) -> list[Token]:
+    tokens = []
+    pos, line, line_start = 0, 1, 0
+    while pos < len(program):
+        match = TOKEN.match(program, pos)
+        if match is None:
+            raise QuerySyntaxError(
+                f"line {line}, column {pos - line_start + 1}: "
+                f"unexpected character {program[pos]!r}"
+            )
+        kind, text = match.lastgroup, match.group()
+        if kind == "space":
+            newlines = text.count("\n")
+            if newlines:
+                line += newlines
+                line_start = pos + text.rindex("\n") + 1
+        else:
+            if kind == "name" and text in KEYWORDS:
+                kind = "keyword"
+            tokens.append(Token(kind, text, line, pos - line_start + 1))
+        pos = match.end()
+    tokens.append(Token("end", "", line, pos - line_start + 1))
+    return tokens
+
+
+class Expr:
+    pass
+
+
+@dataclass
+class Num(Expr):
+    value: int
+
+
+@dataclass
+class Char(Expr):
+    value: str
+
+
+@dataclass
+class Var(Expr):
+    name: str
+
+
+@dataclass
+class EdgeExpr(Expr):
+    source: Expr
+    label: Expr
+    target: Expr
+
+
+@dataclass
+class SetExpr(Expr):
+    items: list[Expr]
+
+
+@dataclass
+class Union(Expr):
+    left: Expr
+    right: Expr
+
+
+@dataclass
+class Intersect(Expr):
+    left: Expr
+    right: Expr
+
+
+@dataclass
+class Concat(Expr):
+    left: Expr
+    right: Expr
+
+
+@dataclass
+class Repeat(Expr):
+    expr: Expr
+    low: int
+    # None for an unbounded range
+    high: int | None
+
+
+@dataclass
+class Group(Expr):
+    """A regexp in parentheses."""
+
+    expr: Expr
+
+
+@dataclass
+class Select(Expr):
+    # (variable, vertex set) of every ``for ... in ...``
+    filters: list[tuple[str, Expr]]
+    returns: list[str]
+    # ``target reachable from source in graph by query``
+    target: str
+    source: str
+    graph: str
+    query: Expr
+
+
+@dataclass
+class Stmt:
+    line: int = field(kw_only=True)
+
+
+@dataclass
+class Declare(Stmt):
+    name: str
+
+
+@dataclass
+class Bind(Stmt):
+    name: str
+    expr: Expr
+
+
+@dataclass
+class Add(Stmt):
+    # "vertex" or "edge"
+    kind: str
+    expr: Expr
+    graph: str
+
+
+@dataclass
+class Remove(Stmt):
+    # "vertex", "edge" or "vertices"
+    kind: str
+    expr: Expr
+    graph: str
+
+
+@dataclass
+class Program:
+    statements: list[Stmt]
+
+
+class Parser:
+    def __init__(self, program: str):
+        self.tokens = tokenize(program)
+        self.pos = 0
+
+    @property
+    def current(self) -> Token:
+        return self.tokens[self.pos]
+
+    def error(self, expected: str):
+        token = self.current
+        found = repr(token.text) if token.kind != "end" else "end of program"
+        raise QuerySyntaxError(
+            f"line {token.line}, column {token.column}: expected {expected}, "
+            f"found {found}"
+        )
+
+    def at(self, *texts: str) -> bool:
+        token = self.current
+        return token.kind in ("keyword", "op") and token.text in texts
+
+    def expect(self, text: str) -> Token:
+        if not self.at(text):
+            self.error(repr(text))
+        return self.advance()
+
+    def advance(self) -> Token:
+        token = self.current
+        self.pos += 1
+        return token
+
+    def name(self) -> str:
+        if self.current.kind != "name":
+            self.error("a variable")
+        return self.advance().text
+
+    def num(self) -> int:
+        if self.current.kind != "num":
+            self.error("a number")
+        return int(self.advance().text)
+
+    def program(self) -> Program:
+        statements = []
+        while self.current.kind != "end":
+            statements.append(self.statement())
+        return Program(statements)
+
+    def statement(self) -> Stmt:
+        line = self.current.line
+        if self.at("let"):
+            self.advance()
+            name = self.name()
+            if self.at("is"):
+                self.advance()
+                self.expect("graph")
+                return Declare(name, line=line)
+            self.expect("=")
+            return Bind(name, self.expr(), line=line)
+        if self.at("add"):
+            self.advance()
+            if not self.at("vertex", "edge"):
+                self.error("'vertex' or 'edge'")
+            kind = self.advance().text
+            expr = self.expr()
+            self.expect("to")
+            return Add(kind, expr, self.name(), line=line)
+        if self.at("remove"):
+            self.advance()
+            if not self.at("vertex", "edge", "vertices"):
+                self.error("'vertex', 'edge' or 'vertices'")
+            kind = self.advance().text
+            expr = self.expr()
+            self.expect("from")
+            return Remove(kind, expr, self.name(), line=line)
+        self.error("'let', 'add' or 'remove'")
+
+    def expr(self) -> Expr:
+        if self.at("for", "return"):
+            return self.select()
+        return self.union()
+
+    def select(self) -> Select:
+        filters = []
+        while self.at("for") and len(filters) < 2:
+            self.advance()
+            var = self.name()
+            self.expect("in")
+            filters.append((var, self.expr()))
+        self.expect("return")
+        returns = [self.name()]
+        if self.at(","):
+            self.advance()
+            returns.append(self.name())
+        self.expect("where")
+        target = self.name()
+        self.expect("reachable")
+        self.expect("from")
+        source = self.name()
+        self.expect("in")
+        graph = self.name()
+        self.expect("by")
+        return Select(filters, returns, target, source, graph, self.expr())
+
+    def union(self) -> Expr:
+        expr = self.intersect()
+        while self.at("|"):
+            self.advance()
+            expr = Union(expr, self.intersect())
+        return expr
+
+    def intersect(self) -> Expr:
+        expr = self.concat()
+        while self.at("&"):
+            self.advance()
+            expr = Intersect(expr, self.concat())
+        return expr
+
+    def concat(self) -> Expr:
+        expr = self.repeat()
+        while self.at("."):
+            self.advance()
+            expr = Concat(expr, self.repeat())
+        return expr
+
+    def repeat(self) -> Expr:
+        expr = self.atom()
+        while self.at("^"):
+            self.advance()
+            self.expect("[")
+            low = high = self.num()
+            if self.at(".."):
+                self.advance()
+                high = self.num() if self.current.kind == "num" else None
+            self.expect("]")
+            expr = Repeat(expr, low, high)
+        return expr
+
+    def atom(self) -> Expr:
+        token = self.current
+        if token.kind == "num":
+            return Num(self.num())
+        if token.kind == "char":
+            self.advance()
+            return Char(token.text[1])
+        if token.kind == "name":
+            return Var(self.name())
+        if self.at("["):
+            self.advance()
+            items = [self.expr()]
+            while self.at(","):
+                self.advance()
+                items.append(self.expr())
+            self.expect("]")
+            return SetExpr(items)
+        if self.at("("):
+            self.advance()
+            first = self.expr()
+            if self.at(","):
+                self.advance()
+                label = self.expr()
+                self.expect(",")
+                target = self.expr()
+                self.expect(")")
+                return EdgeExpr(first, label, target)
+            self.expect(")")
+            return Group(first)
+        self.error("an expression")
+
+
+def parse_program(program: str) -> Program:
+    return Parser(program).program()
@@ -0,0 +1,154 @@
+from collections.abc import KeysView, Mapping, Set as AbstractSet
+from typing import Iterable, Iterator
+
+import numpy as np
+from pyformlang.finite_automaton import State
+
+
+class StateTable(Mapping):
+    """
+    ``State -> index`` mapping of an automaton whose states are integer graph
+    nodes. ``nodes[i]`` is the node of state ``i`` and lookups binary search a
+    sorted copy, so only two int64 arrays are kept and State objects are
+    created on iteration only.
+    """
+
+    __slots__ = ("nodes", "_order", "_sorted", "all_states")
+
+    def __init__(self, nodes: np.ndarray):
+        self.nodes = np.asarray(nodes, dtype=np.int64)
+        self._order = np.argsort(self.nodes, kind="stable")
+        self._sorted = self.nodes[self._order]
+        self.all_states = KeysView(self)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __iter__(self) -> Iterator[State]:
+        return (State(node) for node in self.nodes.tolist())
+
+    def __getitem__(self, state: State) -> int:
+        if not isinstance(state.value, (int, np.integer)):
+            raise KeyError(state)
+        index = int(self.lookup([state.value])[0])
+        if index < 0:
+            raise KeyError(state)
+        return index
+
+    def keys(self) -> KeysView:
+        return self.all_states
+
+    def items(self) -> Iterator[tuple[State, int]]:
+        return zip(self, range(len(self)))
+
+    def lookup(self, nodes: Iterable[int]) -> np.ndarray:
+        """Indices of the given nodes, -1 for nodes that are not states."""
+        nodes = np.asarray(nodes, dtype=np.int64)
+        if len(self.nodes) == 0:
+            return np.full(nodes.shape, -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self._sorted, nodes), len(self.nodes) - 1)
+        return np.where(self._sorted[pos] == nodes, self._order[pos], -1)
+
+    def indices(self, states: Iterable[State]) -> np.ndarray:
+        if states is self.all_states:
+            return np.arange(len(self.nodes))
+        found = self.lookup([state.value for state in states])
+        if (found < 0).any():
+            raise KeyError("not all states belong to the table")
+        return found
+
+
+class ProductStateSet(AbstractSet):
+    """Set of ``State((s1, s2))`` for all pairs of two state sets, not materialized."""
+
+    __slots__ = ("first", "second")
+
+    def __init__(self, first: AbstractSet[State], second: AbstractSet[State]):
+        self.first = first
+        self.second = second
+
+    def __len__(self) -> int:
+        return len(self.first) * len(self.second)
+
+    def __iter__(self) -> Iterator[State]:
+        for s1 in self.first:
+            for s2 in self.second:
+                yield State((s1.value, s2.value))
+
+    def __contains__(self, state) -> bool:
+        value = state.value if isinstance(state, State) else None
+        if not isinstance(value, tuple) or len(value) != 2:
+            return False
+        return State(value[0]) in self.first and State(value[1]) in self.second
+
+
+class ProductStateTable(Mapping):
+    """
+    State index of ``intersect_automata``: ``State((s1, s2))`` has index
+    ``i1 * len(second) + i2``. It is computed from the factor tables on
+    demand instead of storing a dict entry per product state.
+    """
+
+    __slots__ = ("first", "second", "all_states")
+
+    def __init__(self, first: Mapping[State, int], second: Mapping[State, int]):
+        self.first = first
+        self.second = second
+        self.all_states = ProductStateSet(first.keys(), second.keys())
+
+    def __len__(self) -> int:
+        return len(self.first) * len(self.second)
+
+    def __iter__(self) -> Iterator[State]:
+        return iter(self.all_states)
+
+    def __getitem__(self, state: State) -> int:
+        if state not in self.all_states:
+            raise KeyError(state)
+        s1, s2 = state.value
+        return self.first[State(s1)] * len(self.second) + self.second[State(s2)]
+
+    def keys(self) -> ProductStateSet:
+        return self.all_states
+
+    def items(self) -> Iterator[tuple[State, int]]:
+        for s1, i in self.first.items():
+            for s2, j in self.second.items():
+                yield State((s1.value, s2.value)), i * len(self.second) + j
+
+    def indices(self, states: Iterable[State]) -> np.ndarray:
+        if isinstance(states, ProductStateSet):
+            first = state_indices(self.first, states.first)
+            second = state_indices(self.second, states.second)
+            return (first[:, None] * len(self.second) + second[None, :]).ravel()
+        return np.fromiter((self[state] for state in states), dtype=np.int64)
+
+    def split(self, indices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        return np.divmod(np.asarray(indices, dtype=np.int64), len(self.second))
+
+
+def state_indices(
+    state_index: Mapping[State, int], states: Iterable[State]
+) -> np.ndarray:
+    if isinstance(state_index, (StateTable, ProductStateTable)):
+        return state_index.indices(states)
+    return np.fromiter((state_index[state] for state in states), dtype=np.int64)
+
+
+def state_values(state_index: Mapping[State, int], indices: Iterable[int]) -> list:
+    """Values of the states with the given indices, tuples for product states."""
+    indices = np.asarray(indices, dtype=np.int64)
+    if isinstance(state_index, StateTable):
+        return state_index.nodes[indices].tolist()
+    if isinstance(state_index, ProductStateTable):
+        first, second = state_index.split(indices)
+        return list(
+            zip(
+                state_values(state_index.first, first),
+                state_values(state_index.second, second),
+            )
+        )
+    values = [None] * len(state_index)
+    for state, i in state_index.items():
+        values[i] = state.value
+    return [values[i] for i in indices.tolist()]
@@ -0,0 +1,852 @@
+"""Type inference and interpreter of the graph query language (task 12)."""
+
+import abc
+import hashlib
+import itertools
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Hashable
+
+from pyformlang.finite_automaton import (
+    DeterministicFiniteAutomaton,
+    Epsilon,
+    EpsilonNFA,
+    Symbol,
+)
+from pyformlang.rsa import Box, RecursiveAutomaton
+
+from project.query_language import (
+    Add,
+    Bind,
+    Char,
+    Concat,
+    Declare,
+    EdgeExpr,
+    Expr,
+    Group,
+    Intersect,
+    Num,
+    Program,
+    QuerySyntaxError,
+    Remove,
+    Repeat,
+    Select,
+    SetExpr,
+    Union,
+    Var,
+    parse_program,
+)
+from project.task3_adjacency_matrix import AdjacencyMatrixFA
+from project.task4_rpq import GraphIndex, ms_bfs
+from project.task9_gll_cfpq import gll_based_cfpq
+from project.versioned_graph import GraphVersion
+
+
+class Type(Enum):
+    INT = "int"
+    CHAR = "char"
+    EDGE = "int * char * int"
+    SET_INT = "Set<int>"
+    SET_PAIR = "Set<int * int>"
+    FA = "FA"
+    RSM = "RSM"
+    GRAPH = "graph"
+
+
+AUTOMATON_TYPES = {Type.CHAR, Type.FA, Type.RSM}
+
+
+class QueryTypeError(TypeError):
+    pass
+
+
+class AutomatonNode:
+    """
+    Automaton expression. ``op`` is one of ``symbol``, ``call``, ``concat``,
+    ``union``, ``intersect``, ``repeat``; ``calls`` are the ``call`` symbols
+    ``("call", name, key)`` it contains, where ``key`` names the called
+    binding or is None for a call resolved per query.
+    """
+
+    def __init__(self, op: str, args: tuple):
+        self.op = op
+        self.args = args
+        parts = [
+            a.fingerprint if isinstance(a, AutomatonNode) else repr(a) for a in args
+        ]
+        self.fingerprint = hashlib.sha1(f"{op}({','.join(parts)})".encode()).hexdigest()
+        if op == "call":
+            self.calls = frozenset([("call", *args)])
+        else:
+            self.calls = frozenset().union(
+                *(a.calls for a in args if isinstance(a, AutomatonNode))
+            )
+
+    @property
+    def type(self) -> Type:
+        return Type.RSM if self.calls else Type.FA
+
+
+@dataclass
+class CompiledQuery:
+    fingerprint: str
+    node: AutomatonNode
+    # name -> binding key of every call resolved per query
+    resolution: dict[str, str]
+
+    @property
+    def regular(self) -> bool:
+        return not self.node.calls
+
+
+@dataclass
+class Table:
+    """Automaton with int states; symbols are chars, calls or products."""
+
+    start: int
+    finals: frozenset[int]
+    moves: list[dict[Hashable, int]]
+
+
+def _table(dfa: DeterministicFiniteAutomaton) -> Table:
+    index = {s: i for i, s in enumerate(dfa.states)}
+    moves = [{} for _ in index]
+    for s, symbol_targets in dfa.to_dict().items():
+        for symbol, t in symbol_targets.items():
+            moves[index[s]][symbol.value] = index[t]
+    return Table(
+        index[dfa.start_state], frozenset(index[s] for s in dfa.final_states), moves
+    )
+
+
+def _minimize(enfa: EpsilonNFA) -> Table:
+    return _table(enfa.minimize())
+
+
+def _product_table(table1: Table, table2: Table) -> Table:
+    start = (table1.start, table2.start)
+    index, moves = {start: 0}, [{}]
+    pending = [start]
+    while pending:
+        q1, q2 = pending.pop()
+        state_moves = moves[index[(q1, q2)]]
+        for symbol, t1 in table1.moves[q1].items():
+            t2 = table2.moves[q2].get(symbol)
+            if t2 is None:
+                continue
+            if (t1, t2) not in index:
+                index[(t1, t2)] = len(moves)
+                moves.append({})
+                pending.append((t1, t2))
+            state_moves[symbol] = index[(t1, t2)]
+    finals = frozenset(
+        i
+        for (q1, q2), i in index.items()
+        if q1 in table1.finals and q2 in table2.finals
+    )
+    return Table(0, finals, moves)
+
+
+class AutomatonBuilder:
+    """
+    Interned automaton nodes and bindings, and their minimal DFAs cached by
+    fingerprint. Calls stay symbols of the DFAs and become boxes of an RSM
+    only when a query is assembled, so one DFA serves every query.
+    """
+
+    def __init__(self):
+        self.nodes: dict[str, AutomatonNode] = {}
+        # binding key -> automaton bound
+        self.definitions: dict[str, AutomatonNode] = {}
+        self.tables: dict[str, Table] = {}
+        self.regex_automata: dict[str, AdjacencyMatrixFA] = {}
+        self.rsms: dict[str, RecursiveAutomaton] = {}
+
+    def node(self, op: str, *args) -> AutomatonNode:
+        node = AutomatonNode(op, args)
+        return self.nodes.setdefault(node.fingerprint, node)
+
+    def table(self, node: AutomatonNode) -> Table:
+        if node.fingerprint not in self.tables:
+            enfa = EpsilonNFA()
+            start, final = self._thompson(node, enfa, itertools.count())
+            enfa.add_start_state(start)
+            enfa.add_final_state(final)
+            self.tables[node.fingerprint] = _minimize(enfa)
+        return self.tables[node.fingerprint]
+
+    def _thompson(self, node: AutomatonNode, enfa: EpsilonNFA, states) -> tuple:
+        s, e = next(states), next(states)
+
+        def epsilon(s_from, s_to):
+            enfa.add_transition(s_from, Epsilon(), s_to)
+
+        def child(expr, s_from, s_to):
+            c_start, c_final = self._thompson(expr, enfa, states)
+            epsilon(s_from, c_start)
+            epsilon(c_final, s_to)
+
+        op, args = node.op, node.args
+        if op == "symbol":
+            enfa.add_transition(s, Symbol(args[0]), e)
+        elif op == "call":
+            enfa.add_transition(s, Symbol(("call", *args)), e)
+        elif op == "concat":
+            middle = next(states)
+            child(args[0], s, middle)
+            child(args[1], middle, e)
+        elif op == "union":
+            child(args[0], s, e)
+            child(args[1], s, e)
+        elif op == "repeat":
+            expr, low, high = args
+            current = s
+            for _ in range(low):
+                current, previous = next(states), current
+                child(expr, previous, current)
+            if high is None:
+                child(expr, current, current)
+            else:
+                for _ in range(high - low):
+                    epsilon(current, e)
+                    current, previous = next(states), current
+                    child(expr, previous, current)
+            epsilon(current, e)
+        elif op == "intersect":
+            fa, other = args if not args[0].calls else args[::-1]
+            fa_table = self.table(fa)
+            if not other.calls:
+                table = _product_table(fa_table, self.table(other))
+                offset = {q: next(states) for q in range(len(table.moves))}
+                epsilon(s, offset[table.start])
+                for q, state_moves in enumerate(table.moves):
+                    for symbol, q_to in state_moves.items():
+                        enfa.add_transition(offset[q], Symbol(symbol), offset[q_to])
+                for q in table.finals:
+                    epsilon(offset[q], e)
+            else:
+                # the language of other restricted to the words taking fa from
+                # its start to a final state, one product box per final state
+                base = ("node", other.fingerprint)
+                for t in fa_table.finals:
+                    constraint = (fa.fingerprint, fa_table.start, t)
+                    product = ("product", base, frozenset([constraint]))
+                    enfa.add_transition(s, Symbol(product), e)
+        return s, e
+
+    def regex_automaton(self, query: CompiledQuery) -> AdjacencyMatrixFA:
+        if query.fingerprint not in self.regex_automata:
+            self.regex_automata[query.fingerprint] = AdjacencyMatrixFA(
+                _to_dfa(self.table(query.node), lambda symbol: symbol)
+            )
+        return self.regex_automata[query.fingerprint]
+
+    def rsm(self, query: CompiledQuery) -> RecursiveAutomaton | None:
+        """RSM of a context-free query, None if its language is empty."""
+        if query.fingerprint in self.rsms:
+            return self.rsms[query.fingerprint]
+
+        def resolve(symbol: tuple) -> Hashable:
+            # box id of a call or product symbol
+            if symbol[0] == "call":
+                _, name, key = symbol
+                return key or query.resolution[name]
+            return symbol
+
+        tables: dict[Hashable, Table] = {}
+
+        def box_table(box: Hashable) -> Table:
+            if box not in tables:
+                if isinstance(box, str):
+                    tables[box] = self.table(self.definitions[box])
+                elif box[0] == "node":
+                    tables[box] = self.table(self.nodes[box[1]])
+                else:
+                    _, base, constraints = box
+                    tables[box] = self._product_box(
+                        box_table(base), sorted(constraints), resolve
+                    )
+            return tables[box]
+
+        labels: dict[Hashable, str] = {}
+
+        def label(box: Hashable) -> str:
+            if box not in labels:
+                labels[box] = (
+                    f"<{box}>" if isinstance(box, str) else f"<#{len(labels)}>"
+                )
+            return labels[box]
+
+        start = ("node", query.node.fingerprint)
+        # box -> (call symbol -> callee) of every box the start box reaches
+        called: dict[Hashable, dict[tuple, Hashable]] = {}
+        pending = [start]
+        while pending:
+            box = pending.pop()
+            if box in called:
+                continue
+            called[box] = {
+                symbol: resolve(symbol)
+                for state_moves in box_table(box).moves
+                for symbol in state_moves
+                if isinstance(symbol, tuple)
+            }
+            pending.extend(called[box].values())
+
+        # boxes with a nonempty language; calls of the others are dropped,
+        # which also prunes the product boxes no fa path passes through
+        productive = set()
+        changed = True
+        while changed:
+            changed = False
+            for box in called.keys() - productive:
+                if _accepts_something(box_table(box), called[box], productive):
+                    productive.add(box)
+                    changed = True
+        if start not in productive:
+            self.rsms[query.fingerprint] = None
+            return None
+
+        boxes = []
+        for box in productive:
+            calls = called[box]
+            dfa = _to_dfa(
+                box_table(box),
+                lambda symbol: (
+                    symbol
+                    if symbol not in calls
+                    else label(calls[symbol])
+                    if calls[symbol] in productive
+                    else None
+                ),
+            )
+            boxes.append(Box(dfa, Symbol(label(box))))
+        rsm = RecursiveAutomaton(initial_label=Symbol(label(start)), boxes=set(boxes))
+        self.rsms[query.fingerprint] = rsm
+        return rsm
+
+    def _product_box(
+        self, base: Table, constraints: list[tuple[str, int, int]], resolve
+    ) -> Table:
+        # words of base taking every constraint's fa from its first to its
+        # second state: states (q, g_1, ..., g_k) of the product; a call moving
+        # the fas to g_1', ..., g_k' calls the callee with the constraints
+        # (fa_i, g_i, g_i') added, so nested products stay one flat box id
+        fas = [self.table(self.nodes[fa]) for fa, _, _ in constraints]
+        start = (base.start, *(f for _, f, _ in constraints))
+        index, moves = {start: 0}, [{}]
+        pending = [start]
+        while pending:
+            q, *gs = state = pending.pop()
+            state_moves = moves[index[state]]
+            for symbol, q_to in base.moves[q].items():
+                if isinstance(symbol, tuple):
+                    callee = resolve(symbol)
+                    if isinstance(callee, tuple) and callee[0] == "product":
+                        _, callee, inner = callee
+                    else:
+                        inner = frozenset()
+                    targets = []
+                    for gs_to in itertools.product(
+                        *(range(len(fa.moves)) for fa in fas)
+                    ):
+                        added = {
+                            (fa, g, g_to)
+                            for (fa, _, _), g, g_to in zip(constraints, gs, gs_to)
+                        }
+                        merged = _merge_constraints(inner, added)
+                        if merged is not None:
+                            targets.append((("product", callee, merged), gs_to))
+                else:
+                    gs_to = tuple(fa.moves[g].get(symbol) for fa, g in zip(fas, gs))
+                    targets = [] if None in gs_to else [(symbol, gs_to)]
+                for product_symbol, gs_to in targets:
+                    state_to = (q_to, *gs_to)
+                    if state_to not in index:
+                        index[state_to] = len(moves)
+                        moves.append({})
+                        pending.append(state_to)
+                    state_moves[product_symbol] = index[state_to]
+        finals = frozenset(
+            i
+            for (q, *gs), i in index.items()
+            if q in base.finals and all(g == t for g, (_, _, t) in zip(gs, constraints))
+        )
+        return Table(0, finals, moves)
+
+
+def _merge_constraints(inner: frozenset, added: set) -> frozenset | None:
+    # a dfa run from a state ends in one state, so (fa, f, t) and (fa, f, t')
+    # with t != t' admit no word
+    merged = inner | added
+    ends = {}
+    for fa, f, t in merged:
+        if ends.setdefault((fa, f), t) != t:
+            return None
+    return frozenset(merged)
+
+
+def _to_dfa(table: Table, symbol_value) -> DeterministicFiniteAutomaton:
+    # moves whose symbol_value is None are dropped
+    dfa = DeterministicFiniteAutomaton()
+    dfa.add_start_state(table.start)
+    for q in table.finals:
+        dfa.add_final_state(q)
+    for q, state_moves in enumerate(table.moves):
+        for symbol, q_to in state_moves.items():
+            value = symbol_value(symbol)
+            if value is not None:
+                dfa.add_transition(q, Symbol(value), q_to)
+    return dfa
+
+
+def _accepts_something(
+    table: Table, calls: dict[tuple, Hashable], productive: set
+) -> bool:
+    # a final state is reachable by chars and calls of productive boxes
+    seen, pending = {table.start}, [table.start]
+    while pending:
+        q = pending.pop()
+        if q in table.finals:
+            return True
+        for symbol, q_to in table.moves[q].items():
+            if symbol in calls and calls[symbol] not in productive:
+                continue
+            if q_to not in seen:
+                seen.add(q_to)
+                pending.append(q_to)
+    return False
+
+
+class Runtime:
+    def __init__(self, builder: AutomatonBuilder):
+        self.builder = builder
+        self.env: dict[str, Any] = {}
+        self.results: dict[str, set] = {}
+        # (graph version id, query fingerprint, start set, filtered vertices
+        # missing from the graph) -> (start, final) pairs
+        self.cache: dict[tuple, set[tuple[int, int]]] = {}
+        self.indices: dict[int, GraphIndex] = {}
+
+    def reachable(
+        self,
+        graph: GraphVersion,
+        query: CompiledQuery,
+        sources: frozenset | None,
+        targets: frozenset | None,
+    ) -> set[tuple[int, int]]:
+        """
+        Pairs of the query from ``sources``, all vertices if None. As in
+        ``ms_bfs_based_rpq``, filtered vertices missing from the graph are
+        taken as isolated vertices of it.
+        """
+        extra = frozenset(
+            v
+            for v in (sources or frozenset()) | (targets or frozenset())
+            if v not in graph
+        )
+        key = (graph.id, query.fingerprint, sources, extra)
+        if key not in self.cache:
+            self.cache[key] = self._evaluate(
+                graph.add_vertices(extra), query, sources, not extra
+            )
+        return self.cache[key]
+
+    def _evaluate(
+        self,
+        graph: GraphVersion,
+        query: CompiledQuery,
+        sources: frozenset | None,
+        cache_index: bool,
+    ) -> set[tuple[int, int]]:
+        if (sources is not None and not sources) or len(graph) == 0:
+            return set()
+        if sources is None and graph.removed:
+            # removed vertices are still isolated states of the automaton
+            sources = frozenset(graph.nodes().tolist())
+        automaton = graph.automaton()
+        if query.regular:
+            if not cache_index:
+                index = GraphIndex.from_automaton(automaton)
+            else:
+                if graph.id not in self.indices:
+                    self.indices[graph.id] = GraphIndex.from_automaton(automaton)
+                index = self.indices[graph.id]
+            regex_am = self.builder.regex_automaton(query)
+            return ms_bfs(index, regex_am, sources or (), ())
+        rsm = self.builder.rsm(query)
+        if rsm is None:
+            return set()
+        return gll_based_cfpq(rsm, automaton, sources)
+
+
+class Op(abc.ABC):
+    @abc.abstractmethod
+    def evaluate(self, runtime: Runtime) -> Any: ...
+
+
+@dataclass
+class Const(Op):
+    value: Any
+
+    def evaluate(self, runtime: Runtime) -> Any:
+        return self.value
+
+
+@dataclass
+class Load(Op):
+    name: str
+
+    def evaluate(self, runtime: Runtime) -> Any:
+        return runtime.env[self.name]
+
+
+@dataclass
+class MakeEdge(Op):
+    source: Op
+    label: Op
+    target: Op
+
+    def evaluate(self, runtime: Runtime) -> tuple:
+        return (
+            self.source.evaluate(runtime),
+            self.label.evaluate(runtime),
+            self.target.evaluate(runtime),
+        )
+
+
+@dataclass
+class MakeSet(Op):
+    items: list[Op]
+
+    def evaluate(self, runtime: Runtime) -> set:
+        return {item.evaluate(runtime) for item in self.items}
+
+
+@dataclass
+class Query(Op):
+    query: CompiledQuery
+    graph: str
+    source_filters: list[Op]
+    target_filters: list[Op]
+    same_vertex: bool
+    # "source", "target" or "pair"; in ``where u reachable from v`` paths go
+    # from v to u and pairs are (v, u), the order of the CFPQ functions
+    returns: str
+
+    def evaluate(self, runtime: Runtime) -> set:
+        def selected(filters):
+            if not filters:
+                return None
+            return frozenset.intersection(
+                *(frozenset(f.evaluate(runtime)) for f in filters)
+            )
+
+        sources, targets = selected(self.source_filters), selected(self.target_filters)
+        pairs = runtime.reachable(runtime.env[self.graph], self.query, sources, targets)
+        if targets is not None:
+            pairs = {(u, v) for u, v in pairs if v in targets}
+        if self.same_vertex:
+            pairs = {(u, v) for u, v in pairs if u == v}
+        if self.returns == "source":
+            return {u for u, _ in pairs}
+        if self.returns == "target":
+            return {v for _, v in pairs}
+        return set(pairs)
+
+
+class Step(abc.ABC):
+    @abc.abstractmethod
+    def run(self, runtime: Runtime): ...
+
+
+@dataclass
+class BindValue(Step):
+    name: str
+    op: Op
+    is_select: bool
+
+    def run(self, runtime: Runtime):
+        value = self.op.evaluate(runtime)
+        runtime.env[self.name] = value
+        if self.is_select:
+            runtime.results[self.name] = value
+
+
+@dataclass
+class DeclareGraph(Step):
+    name: str
+
+    def run(self, runtime: Runtime):
+        runtime.env[self.name] = GraphVersion.empty()
+
+
+@dataclass
+class MutateGraph(Step):
+    # "add vertex", "add edge", "remove vertex", "remove edge", "remove vertices"
+    action: str
+    op: Op
+    graph: str
+
+    def run(self, runtime: Runtime):
+        graph = runtime.env[self.graph]
+        value = self.op.evaluate(runtime)
+        if self.action == "add vertex":
+            graph = graph.add_vertex(value)
+        elif self.action == "add edge":
+            graph = graph.add_edge(*value)
+        elif self.action == "remove edge":
+            graph = graph.remove_edge(*value)
+        else:
+            vertices = value if self.action == "remove vertices" else [value]
+            graph = graph.remove_vertices(vertices)
+        runtime.env[self.graph] = graph
+
+
+@dataclass
+class Typed:
+    type: Type
+    # runtime value of ints, chars, edges, sets and graphs
+    op: Op | None = None
+    # automaton of chars, FAs and RSMs
+    node: AutomatonNode | None = None
+
+
+@dataclass
+class Plan:
+    steps: list[Step]
+    # type of every variable at the end of the program
+    types: dict[str, Type]
+    builder: AutomatonBuilder = field(repr=False)
+
+
+class Compiler:
+    def __init__(self):
+        self.builder = AutomatonBuilder()
+        self.types: dict[str, Type] = {}
+        # name -> key of its binding, for names bound to automata
+        self.bindings: dict[str, str] = {}
+        self.binding_counts: dict[str, int] = {}
+        # name -> line, for names called before they are bound
+        self.forward_calls: dict[str, int] = {}
+        self.queries: dict[str, CompiledQuery] = {}
+        self.steps: list[Step] = []
+        self.line = 0
+
+    def error(self, message: str) -> QueryTypeError:
+        return QueryTypeError(f"line {self.line}: {message}")
+
+    def compile(self, program: Program) -> Plan:
+        for statement in program.statements:
+            self.line = statement.line
+            if isinstance(statement, Declare):
+                self.assign(statement.name, Typed(Type.GRAPH))
+                self.steps.append(DeclareGraph(statement.name))
+            elif isinstance(statement, Bind):
+                typed = self.expr(statement.expr)
+                self.assign(statement.name, typed)
+                if typed.op is not None:
+                    self.steps.append(
+                        BindValue(
+                            statement.name, typed.op, isinstance(statement.expr, Select)
+                        )
+                    )
+            else:
+                self.mutation(statement)
+        for name, line in self.forward_calls.items():
+            if self.types.get(name) not in AUTOMATON_TYPES:
+                self.line = line
+                raise self.error(
+                    f"{name} is used as a nonterminal but never bound to an automaton"
+                )
+        return Plan(self.steps, dict(self.types), self.builder)
+
+    def assign(self, name: str, typed: Typed):
+        self.types[name] = typed.type
+        if typed.node is None:
+            self.bindings.pop(name, None)
+            return
+        count = self.binding_counts.get(name, 0) + 1
+        self.binding_counts[name] = count
+        key = name if count == 1 else f"{name}/{count}"
+        self.builder.definitions[key] = typed.node
+        self.bindings[name] = key
+
+    def graph(self, name: str) -> str:
+        if self.types.get(name) != Type.GRAPH:
+            found = self.types.get(name)
+            raise self.error(
+                f"{name} is not a graph"
+                + (f", it is {found.value}" if found else ", it is not defined")
+            )
+        return name
+
+    def mutation(self, statement: Add | Remove):
+        verb = "add" if isinstance(statement, Add) else "remove"
+        action = f"{verb} {statement.kind}"
+        expected = {"vertex": Type.INT, "edge": Type.EDGE, "vertices": Type.SET_INT}
+        op = self.value(statement.expr, expected[statement.kind], action)
+        self.steps.append(MutateGraph(action, op, self.graph(statement.graph)))
+
+    def value(self, expr: Expr, expected: Type, context: str) -> Op:
+        typed = self.expr(expr)
+        if typed.type != expected:
+            raise self.mismatch(expr, typed, f"{context} expects {expected.value}")
+        return typed.op
+
+    def automaton(self, expr: Expr, context: str) -> AutomatonNode:
+        typed = self.expr(expr)
+        if typed.node is None:
+            raise self.mismatch(expr, typed, f"{context} expects an FA or RSM")
+        return typed.node
+
+    def mismatch(self, expr: Expr, typed: Typed, message: str) -> QueryTypeError:
+        if isinstance(expr, Var) and expr.name not in self.types:
+            return self.error(f"{message}, {expr.name} is not defined")
+        return self.error(f"{message}, got {typed.type.value}")
+
+    def expr(self, expr: Expr) -> Typed:
+        builder = self.builder
+        if isinstance(expr, Num):
+            return Typed(Type.INT, Const(expr.value))
+        if isinstance(expr, Char):
+            return Typed(
+                Type.CHAR, Const(expr.value), builder.node("symbol", expr.value)
+            )
+        if isinstance(expr, Var):
+            return self.var(expr.name)
+        if isinstance(expr, EdgeExpr):
+            return Typed(
+                Type.EDGE,
+                MakeEdge(
+                    self.value(expr.source, Type.INT, "edge source"),
+                    self.value(expr.label, Type.CHAR, "edge label"),
+                    self.value(expr.target, Type.INT, "edge target"),
+                ),
+            )
+        if isinstance(expr, SetExpr):
+            items = [self.value(item, Type.INT, "set element") for item in expr.items]
+            return Typed(Type.SET_INT, MakeSet(items))
+        if isinstance(expr, Select):
+            return self.select(expr)
+        if isinstance(expr, Group):
+            return self.regexp(self.automaton(expr.expr, "parentheses"))
+        if isinstance(expr, Repeat):
+            if expr.high is not None and expr.high < expr.low:
+                raise self.error(f"empty repetition range [{expr.low}..{expr.high}]")
+            node = self.automaton(expr.expr, "repetition")
+            return self.regexp(builder.node("repeat", node, expr.low, expr.high))
+        ops = {Union: "union", Concat: "concat", Intersect: "intersect"}
+        op = ops[type(expr)]
+        left = self.automaton(expr.left, op)
+        right = self.automaton(expr.right, op)
+        if op == "intersect" and left.calls and right.calls:
+            raise self.error("intersection of two RSMs is not context-free")
+        return self.regexp(builder.node(op, left, right))
+
+    @staticmethod
+    def regexp(node: AutomatonNode) -> Typed:
+        return Typed(node.type, node=node)
+
+    def var(self, name: str) -> Typed:
+        found = self.types.get(name)
+        if found is None:
+            self.forward_calls.setdefault(name, self.line)
+            return self.regexp(self.builder.node("call", name, None))
+        if found not in AUTOMATON_TYPES:
+            return Typed(found, Load(name))
+        key = self.bindings[name]
+        node = self.builder.definitions[key]
+        if found == Type.RSM:
+            node = self.builder.node("call", name, key)
+        return Typed(found, Load(name) if found == Type.CHAR else None, node)
+
+    def query(self, node: AutomatonNode) -> CompiledQuery:
+        resolution = {}
+        pending, seen = list(node.calls), set()
+        while pending:
+            _, name, key = pending.pop()
+            if key is None:
+                key = self.bindings.get(name)
+                if key is None:
+                    raise self.error(
+                        f"{name} is called by the query but is not bound to an automaton"
+                    )
+                resolution[name] = key
+            if key not in seen:
+                seen.add(key)
+                pending.extend(self.builder.definitions[key].calls)
+        parts = [node.fingerprint, *sorted(f"{n}={k}" for n, k in resolution.items())]
+        fingerprint = hashlib.sha1(";".join(parts).encode()).hexdigest()
+        return self.queries.setdefault(
+            fingerprint, CompiledQuery(fingerprint, node, resolution)
+        )
+
+    def select(self, select: Select) -> Typed:
+        graph = self.graph(select.graph)
+        where = (select.source, select.target)
+        for name in select.returns:
+            if name not in where:
+                raise self.error(
+                    f"returned {name} is not a variable of the where clause"
+                )
+        if len(select.returns) == 2 and (
+            select.source == select.target or select.returns[0] == select.returns[1]
+        ):
+            raise self.error(
+                "a select returning two variables needs two distinct vertices"
+            )
+        source_filters, target_filters = [], []
+        for name, expr in select.filters:
+            if name not in where:
+                raise self.error(
+                    f"filtered {name} is not a variable of the where clause"
+                )
+            op = self.value(expr, Type.SET_INT, f"filter of {name}")
+            if name == select.source:
+                source_filters.append(op)
+            if name == select.target:
+                target_filters.append(op)
+        query = self.query(self.automaton(select.query, "select"))
+        if len(select.returns) == 2:
+            returns, result = "pair", Type.SET_PAIR
+        else:
+            returns = "source" if select.returns[0] == select.source else "target"
+            result = Type.SET_INT
+        op = Query(
+            query,
+            graph,
+            source_filters,
+            target_filters,
+            select.source == select.target,
+            returns,
+        )
+        return Typed(result, op)
+
+
+def compile_program(program: Program) -> Plan:
+    """Infers types and lowers the program, raises QueryTypeError if ill-typed."""
+    return Compiler().compile(program)
+
+
+def infer_types(program: Program) -> dict[str, Type]:
+    return compile_program(program).types
+
+
+def execute(plan: Plan) -> dict[str, set]:
+    runtime = Runtime(plan.builder)
+    for step in plan.steps:
+        step.run(runtime)
+    return runtime.results
+
+
+def typing_program(program: str) -> bool:
+    try:
+        compile_program(parse_program(program))
+    except (QuerySyntaxError, QueryTypeError):
+        return False
+    return True
+
+
+def exec_program(program: str) -> dict[str, set[tuple]]:
+    return execute(compile_program(parse_program(program)))
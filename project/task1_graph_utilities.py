@@ -1,8 +1,12 @@
-from dataclasses import dataclass
-from typing import List, Tuple
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, List, Tuple
 import cfpq_data
 from networkx.drawing.nx_pydot import write_dot
 import networkx as nx
+import numpy as np
+import pandas as pd
+from project.graph_store import default_graph_store
 
 
 @dataclass
@@ -12,17 +16,29 @@ class GraphInfo:
     edge_labels: List[str]
 
 
+# label_cooccurrence[(l1, l2)] is the number of nodes with an incoming l1 edge and
+# an outgoing l2 edge, i.e. the nodes where an "l1 l2" path can pass
+@dataclass
+class GraphStatistics(GraphInfo):
+    label_frequencies: dict[Any, int] = field(default_factory=dict)
+    out_degree_distribution: dict[int, int] = field(default_factory=dict)
+    in_degree_distribution: dict[int, int] = field(default_factory=dict)
+    label_cooccurrence: dict[tuple[Any, Any], int] = field(default_factory=dict)
+
+
+# graphs are downloaded and parsed once, then served from the local graph store
+# (see project/graph_store.py), which also makes repeated loads work offline
 def get_graph_by_name(name: str) -> nx.MultiDiGraph:
-    path = cfpq_data.download(name)
-    return cfpq_data.graph_from_csv(path)
+    stored, graph = default_graph_store().fetch(name)
+    return graph if graph is not None else stored.to_networkx()
 
 
 def get_graph_info_by_name(name: str) -> GraphInfo:
-    graph = get_graph_by_name(name)
+    stored, _ = default_graph_store().fetch(name)
     return GraphInfo(
-        nodes_num=graph.number_of_nodes(),
-        edges_num=graph.number_of_edges(),
-        edge_labels=cfpq_data.get_sorted_labels(graph),
+        nodes_num=stored.nodes_num,
+        edges_num=stored.edges_num,
+        edge_labels=stored.sorted_labels,
     )
 
 
@@ -35,6 +51,158 @@ def get_graph_info_from_graph(graph: nx.MultiDiGraph):
     )
 
 
+# popcount of every byte value
+_BYTE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+class _StatisticsAccumulator:
+    """
+    Folds edge chunks into per-node degree counters and per-label node bitmaps,
+    so memory depends on the number of nodes and labels but not on edges.
+    Node ids, which may be sparse or negative, are numbered densely chunk by
+    chunk, the ids new in a chunk in sorted order.
+    """
+
+    def __init__(self):
+        self.edges_num = 0
+        self.nodes_num = 0
+        # sorted node ids seen so far and the dense index of each
+        self.node_ids = np.zeros(0, dtype=np.int64)
+        self.node_slots = np.zeros(0, dtype=np.int64)
+        self.label_ids: dict[Any, int] = {}
+        self.label_counts = np.zeros(0, dtype=np.int64)
+        self.out_degree = np.zeros(0, dtype=np.int64)
+        self.in_degree = np.zeros(0, dtype=np.int64)
+        # bit v of row l is set when node v has an incoming (outgoing) l edge
+        self.label_in = np.zeros((0, 0), dtype=np.uint8)
+        self.label_out = np.zeros((0, 0), dtype=np.uint8)
+
+    def _grow(self, nodes_num: int, labels_num: int):
+        if nodes_num > len(self.out_degree):
+            nodes_num = max(nodes_num, 2 * len(self.out_degree))
+            pad = nodes_num - len(self.out_degree)
+            self.out_degree = np.pad(self.out_degree, (0, pad))
+            self.in_degree = np.pad(self.in_degree, (0, pad))
+        bitmap_bytes = (len(self.out_degree) + 7) // 8
+        labels_pad = labels_num - self.label_in.shape[0]
+        bytes_pad = bitmap_bytes - self.label_in.shape[1]
+        if labels_pad > 0 or bytes_pad > 0:
+            pads = ((0, max(labels_pad, 0)), (0, max(bytes_pad, 0)))
+            self.label_in = np.pad(self.label_in, pads)
+            self.label_out = np.pad(self.label_out, pads)
+            self.label_counts = np.pad(self.label_counts, (0, max(labels_pad, 0)))
+
+    def _dense(self, nodes: np.ndarray) -> np.ndarray:
+        values = np.unique(nodes)
+        new = values[~np.isin(values, self.node_ids, assume_unique=True)]
+        if len(new):
+            slots = np.arange(self.nodes_num, self.nodes_num + len(new))
+            self.nodes_num += len(new)
+            ids = np.concatenate([self.node_ids, new])
+            order = np.argsort(ids, kind="stable")
+            self.node_ids = ids[order]
+            self.node_slots = np.concatenate([self.node_slots, slots])[order]
+        return self.node_slots[np.searchsorted(self.node_ids, nodes)]
+
+    def add(self, sources: np.ndarray, targets: np.ndarray, labels: Iterable):
+        nodes = self._dense(
+            np.concatenate(
+                [
+                    np.asarray(sources, dtype=np.int64),
+                    np.asarray(targets, dtype=np.int64),
+                ]
+            )
+        )
+        sources, targets = nodes[: len(nodes) // 2], nodes[len(nodes) // 2 :]
+        chunk_labels, inverse = np.unique(np.asarray(labels), return_inverse=True)
+        for label in chunk_labels.tolist():
+            self.label_ids.setdefault(label, len(self.label_ids))
+        ids = np.array([self.label_ids[label] for label in chunk_labels.tolist()])
+        label_ids = ids[inverse] if len(ids) > 0 else inverse
+
+        self._grow(self.nodes_num, len(self.label_ids))
+        self.edges_num += len(sources)
+        np.add.at(self.out_degree, sources, 1)
+        np.add.at(self.in_degree, targets, 1)
+        np.add.at(self.label_counts, label_ids, 1)
+        for bitmap, nodes in ((self.label_out, sources), (self.label_in, targets)):
+            np.bitwise_or.at(
+                bitmap,
+                (label_ids, nodes >> 3),
+                np.left_shift(1, nodes & 7).astype(np.uint8),
+            )
+
+    def result(self) -> GraphStatistics:
+        labels = list(self.label_ids)
+        frequencies = {
+            label: int(self.label_counts[i]) for i, label in enumerate(labels)
+        }
+        cooccurrence = {}
+        for i, l_in in enumerate(labels):
+            common = self.label_in[i][None, :] & self.label_out
+            counts = _BYTE_BITS[common].sum(axis=1)
+            for j in np.flatnonzero(counts):
+                cooccurrence[(l_in, labels[j])] = int(counts[j])
+        return GraphStatistics(
+            nodes_num=self.nodes_num,
+            edges_num=self.edges_num,
+            edge_labels=sorted(
+                frequencies, key=lambda label: (-frequencies[label], label)
+            ),
+            label_frequencies=frequencies,
+            out_degree_distribution=_distribution(self.out_degree[: self.nodes_num]),
+            in_degree_distribution=_distribution(self.in_degree[: self.nodes_num]),
+            label_cooccurrence=cooccurrence,
+        )
+
+
+def _distribution(degrees: np.ndarray) -> dict[int, int]:
+    counts = np.bincount(degrees)
+    return {int(d): int(counts[d]) for d in np.flatnonzero(counts)}
+
+
+def get_graph_statistics_from_csv(
+    path: Path | str, chunk_size: int = 1_000_000
+) -> GraphStatistics:
+    """
+    Computes graph statistics in one pass over a CFPQ_Data edge list
+    (``from to label`` per line) without building a NetworkX graph.
+    """
+    accumulator = _StatisticsAccumulator()
+    chunks = pd.read_csv(
+        path,
+        sep=" ",
+        header=None,
+        names=["from", "to", "label"],
+        engine="c",
+        chunksize=chunk_size,
+    )
+    for chunk in chunks:
+        accumulator.add(
+            chunk["from"].to_numpy(), chunk["to"].to_numpy(), chunk["label"].to_numpy()
+        )
+    return accumulator.result()
+
+
+def get_graph_statistics_by_name(
+    name: str, chunk_size: int = 1_000_000
+) -> GraphStatistics:
+    stored = default_graph_store().load(name)
+    if stored is None:
+        return get_graph_statistics_from_csv(cfpq_data.download(name), chunk_size)
+
+    accumulator = _StatisticsAccumulator()
+    labels = np.array(stored.labels, dtype=object)
+    for start in range(0, stored.edges_num, chunk_size):
+        end = start + chunk_size
+        accumulator.add(
+            stored.sources[start:end],
+            stored.targets[start:end],
+            labels[stored.label_ids[start:end]],
+        )
+    return accumulator.result()
+
+
 def save_graph_from_two_cycles_to_dot_file(
     node_num_1: int, node_num_2: int, labels: Tuple[str, str], path: str
 ):
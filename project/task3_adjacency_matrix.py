@@ -1,18 +1,33 @@
-from typing import Iterable, Set
+import hashlib
+import os
+import pickle
+import re
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Iterable, Mapping, Sequence, Set
+import numpy as np
 from pyformlang.finite_automaton import NondeterministicFiniteAutomaton, State, Symbol
-from scipy.sparse import dok_matrix, identity, kron
+from scipy.sparse import csr_matrix, dok_matrix, identity, kron
 from networkx import MultiDiGraph
-from project.task2_automata_conversions import regex_to_dfa, graph_to_nfa
+from project.bit_matrix import WORD_BITS, BitMatrix, bitset_transitive_closure
+from project.state_table import (
+    ProductStateSet,
+    ProductStateTable,
+    StateTable,
+    state_indices,
+    state_values,
+)
+from project.task2_automata_conversions import regex_to_dfa
 
 
 class AdjacencyMatrixFA:
     alphabet: Set[Symbol]
     states: Set[State]
     size: int
-    state_index: dict[State, int]
+    state_index: Mapping[State, int]
     start_states: Set[State]
     final_states: Set[State]
-    decomposed_adj_matrix: dict[Symbol, dok_matrix]
+    decomposed_adj_matrix: dict[Symbol, csr_matrix]
 
     def __init__(self, fa: NondeterministicFiniteAutomaton):
         self.alphabet = fa.symbols
@@ -22,28 +37,96 @@ class AdjacencyMatrixFA:
         self.size = len(self.states)
         self.state_index = {s: i for i, s in enumerate(self.states)}
 
-        decomposed_adj_matrix = {
-            symbol: dok_matrix((self.size, self.size), dtype=bool)
-            for symbol in self.alphabet
-        }
-
-        for s_from, transitions in fa.to_dict().items():
-            for symbol, targets in transitions.items():
+        transitions = {symbol: ([], []) for symbol in self.alphabet}
+        for s_from, symbol_targets in fa.to_dict().items():
+            for symbol, targets in symbol_targets.items():
                 targets_iterable = (
                     targets if hasattr(targets, "__iter__") else [targets]
                 )
+                rows, cols = transitions[symbol]
                 for s_to in targets_iterable:
-                    decomposed_adj_matrix[symbol][
-                        self.state_index[s_from], self.state_index[s_to]
-                    ] = True
+                    rows.append(self.state_index[s_from])
+                    cols.append(self.state_index[s_to])
 
-        self.decomposed_adj_matrix = decomposed_adj_matrix
+        self.decomposed_adj_matrix = {
+            symbol: bool_csr(rows, cols, self.size)
+            for symbol, (rows, cols) in transitions.items()
+        }
+
+    @classmethod
+    def from_edges(
+        cls,
+        sources: np.ndarray,
+        targets: np.ndarray,
+        labels: np.ndarray,
+        nodes: np.ndarray,
+        start_nodes: set[int],
+        final_nodes: set[int],
+    ) -> "AdjacencyMatrixFA":
+        """
+        Builds the same automaton as ``AdjacencyMatrixFA(graph_to_nfa(...))``
+        directly from edge arrays: edges are grouped by label with NumPy and each
+        label matrix is assembled as CSR in one call.
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        extra = {int(n) for n in start_nodes or ()} | {
+            int(n) for n in final_nodes or ()
+        }
+        extra -= set(nodes.tolist())
+        if extra:
+            nodes = np.concatenate([nodes, np.fromiter(extra, dtype=np.int64)])
+
+        automaton = cls.__new__(cls)
+        automaton.size = len(nodes)
+        automaton.state_index = StateTable(nodes)
+        automaton.states = automaton.state_index.all_states
+        automaton.start_states = (
+            {State(int(n)) for n in start_nodes} if start_nodes else automaton.states
+        )
+        automaton.final_states = (
+            {State(int(n)) for n in final_nodes} if final_nodes else automaton.states
+        )
+
+        sorter = np.argsort(nodes, kind="stable")
+        rows = sorter[np.searchsorted(nodes, sources, sorter=sorter)]
+        cols = sorter[np.searchsorted(nodes, targets, sorter=sorter)]
+
+        label_values, label_ids = np.unique(labels, return_inverse=True)
+        order = np.argsort(label_ids, kind="stable")
+        bounds = np.searchsorted(label_ids[order], np.arange(len(label_values) + 1))
+        automaton.decomposed_adj_matrix = {}
+        for k, label in enumerate(label_values.tolist()):
+            edges = order[bounds[k] : bounds[k + 1]]
+            automaton.decomposed_adj_matrix[Symbol(label)] = bool_csr(
+                rows[edges], cols[edges], automaton.size
+            )
+        automaton.alphabet = set(automaton.decomposed_adj_matrix)
+        return automaton
+
+    @classmethod
+    def from_graph(
+        cls, graph: MultiDiGraph, start_nodes: set[int], final_nodes: set[int]
+    ) -> "AdjacencyMatrixFA":
+        sources, targets, labels = graph_edge_arrays(graph)
+        nodes = np.fromiter((int(node) for node in graph.nodes), dtype=np.int64)
+        return cls.from_edges(sources, targets, labels, nodes, start_nodes, final_nodes)
 
     def start_states_indices(self) -> set[int]:
-        return {self.state_index[s] for s in self.start_states}
+        return set(self.start_indices().tolist())
 
     def final_states_indices(self) -> set[int]:
-        return {self.state_index[s] for s in self.final_states}
+        return set(self.final_indices().tolist())
+
+    def start_indices(self) -> np.ndarray:
+        return state_indices(self.state_index, self.start_states)
+
+    def final_indices(self) -> np.ndarray:
+        return state_indices(self.state_index, self.final_states)
+
+    def final_mask(self) -> np.ndarray:
+        is_final = np.zeros(self.size, dtype=bool)
+        is_final[self.final_indices()] = True
+        return is_final
 
     def accepts(self, word: Iterable[Symbol]) -> bool:
         current_states = self.start_states_indices()
@@ -59,24 +142,85 @@ class AdjacencyMatrixFA:
             current_states = new_states
         return bool(current_states & self.final_states_indices())
 
-    def transitive_closure(self) -> dok_matrix:
-        size = self.size
-        reach_matr = dok_matrix((size, size), dtype=bool)
+    def accepts_batch(self, words: Iterable[Iterable[Symbol]]) -> np.ndarray:
+        """
+        Vectorized ``accepts`` for many words. Current state sets are the rows
+        of a words x states boolean matrix; at every position the words still
+        being read are grouped by their symbol and advanced with one sparse
+        product per symbol.
+        """
+        symbols = list(self.decomposed_adj_matrix)
+        symbol_ids = {symbol: k for k, symbol in enumerate(symbols)}
+        unknown = len(symbols)
+        tokens, lengths = [], []
+        for word in words:
+            ids = [symbol_ids.get(symbol, unknown) for symbol in word]
+            tokens.extend(ids)
+            lengths.append(len(ids))
+        tokens = np.asarray(tokens, dtype=np.int64)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+        words_num = len(lengths)
+        shape = (words_num, self.size)
+
+        starts = self.start_indices()
+        current = csr_matrix(
+            (
+                np.ones(words_num * len(starts), dtype=bool),
+                (
+                    np.repeat(np.arange(words_num), len(starts)),
+                    np.tile(starts, words_num),
+                ),
+            ),
+            shape=shape,
+        )
+        for position in range(int(lengths.max(initial=0))):
+            active = np.nonzero(lengths > position)[0]
+            position_tokens = tokens[offsets[active] + position]
+            # finished words keep their state sets
+            finished = current.tocoo()
+            kept = lengths[finished.row] <= position
+            rows, cols = [finished.row[kept]], [finished.col[kept]]
+            for symbol_id in np.unique(position_tokens).tolist():
+                if symbol_id == unknown:
+                    continue
+                group = active[position_tokens == symbol_id]
+                step = (
+                    current[group] @ self.decomposed_adj_matrix[symbols[symbol_id]]
+                ).tocoo()
+                rows.append(group[step.row])
+                cols.append(step.col)
+            rows, cols = np.concatenate(rows), np.concatenate(cols)
+            current = csr_matrix(
+                (np.ones(len(rows), dtype=bool), (rows, cols)), shape=shape
+            )
+            current.sum_duplicates()
+
+        is_final = self.final_mask()
+        reached = current.tocoo()
+        accepted = np.zeros(words_num, dtype=bool)
+        accepted[reached.row[is_final[reached.col]]] = True
+        return accepted
+
+    def adjacency_union(self) -> csr_matrix:
+        union = csr_matrix((self.size, self.size), dtype=bool)
         for matr in self.decomposed_adj_matrix.values():
-            reach_matr += matr
+            union += matr
+        return union
 
-        reach_matr += identity(size, dtype=bool)
+    def transitive_closure(self, backend: str = "bitset") -> dok_matrix | BitMatrix:
+        if backend not in CLOSURE_BACKENDS:
+            raise ValueError(
+                f"Unknown closure backend {backend!r}, "
+                f"expected one of {sorted(CLOSURE_BACKENDS)}"
+            )
+        return CLOSURE_BACKENDS[backend](self)
 
-        for k in range(size):
-            for i in range(size):
-                if reach_matr[i, k]:
-                    for j in range(size):
-                        if reach_matr[k, j]:
-                            reach_matr[i, j] = True
-        return reach_matr
+    def is_empty(self, closure_backend: str | None = None) -> bool:
+        if closure_backend is None:
+            return self._search_final(track_parents=False) is None
 
-    def is_empty(self) -> bool:
-        transitive_closure = self.transitive_closure()
+        transitive_closure = self.transitive_closure(closure_backend)
 
         for s_from in self.start_states_indices():
             for s_to in self.final_states_indices():
@@ -84,6 +228,165 @@ class AdjacencyMatrixFA:
                     return False
         return True
 
+    def shortest_witness(self) -> list[Symbol] | None:
+        """Shortest accepted word, or None if the language is empty."""
+        found = self._search_final(track_parents=True)
+        if found is None:
+            return None
+        state, parent, parent_symbol = found
+        symbols = list(self.decomposed_adj_matrix)
+        word = []
+        while parent[state] >= 0:
+            word.append(symbols[parent_symbol[state]])
+            state = parent[state]
+        return word[::-1]
+
+    def _search_final(
+        self, track_parents: bool
+    ) -> tuple[int, np.ndarray, np.ndarray] | None:
+        """
+        Level-synchronous BFS from the start states that stops at the first
+        level containing a final state. Returns that state with the BFS tree
+        (parent state and label position per state, -1 for unreached/roots).
+        """
+        is_final = self.final_mask()
+        visited = np.zeros(self.size, dtype=bool)
+        front = self.start_indices()
+        visited[front] = True
+        parent = np.full(self.size if track_parents else 0, -1, dtype=np.int64)
+        parent_symbol = parent.copy()
+
+        while len(front) > 0:
+            hits = front[is_final[front]]
+            if len(hits) > 0:
+                return int(hits[0]), parent, parent_symbol
+            next_fronts = []
+            for k, matr in enumerate(self.decomposed_adj_matrix.values()):
+                step = matr[front].tocoo()
+                new = ~visited[step.col]
+                targets, first = np.unique(step.col[new], return_index=True)
+                if len(targets) == 0:
+                    continue
+                visited[targets] = True
+                if track_parents:
+                    parent[targets] = front[step.row[new][first]]
+                    parent_symbol[targets] = k
+                next_fronts.append(targets)
+            front = (
+                np.concatenate(next_fronts)
+                if next_fronts
+                else np.empty(0, dtype=np.int64)
+            )
+        return None
+
+
+def bool_csr(rows, cols, size: int) -> csr_matrix:
+    matr = csr_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, cols)), shape=(size, size)
+    )
+    matr.sum_duplicates()
+    return matr
+
+
+def graph_edge_arrays(
+    graph: MultiDiGraph,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    edges = [
+        (u, v, "$" if label is None else label)
+        for u, v, label in graph.edges(data="label")
+    ]
+    if not edges:
+        return (
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=str),
+        )
+    sources, targets, labels = zip(*edges)
+    return (
+        np.asarray(sources).astype(np.int64),
+        np.asarray(targets).astype(np.int64),
+        np.asarray(labels, dtype=str),
+    )
+
+
+def dok_transitive_closure(automaton: AdjacencyMatrixFA) -> dok_matrix:
+    size = automaton.size
+    reach_matr = dok_matrix((size, size), dtype=bool)
+    for matr in automaton.decomposed_adj_matrix.values():
+        reach_matr += matr
+
+    reach_matr += identity(size, dtype=bool)
+
+    for k in range(size):
+        for i in range(size):
+            if reach_matr[i, k]:
+                for j in range(size):
+                    if reach_matr[k, j]:
+                        reach_matr[i, j] = True
+    return reach_matr
+
+
+# both backends compute the reflexive-transitive closure; "dok" is the reference
+# Floyd–Warshall kept for comparison, "bitset" scales to large product automata
+CLOSURE_BACKENDS: dict[str, Callable[[AdjacencyMatrixFA], dok_matrix | BitMatrix]] = {
+    "dok": dok_transitive_closure,
+    "bitset": lambda automaton: bitset_transitive_closure(automaton.adjacency_union()),
+}
+
+
+def restricted_closure(
+    automaton: AdjacencyMatrixFA, sources: Sequence[int]
+) -> csr_matrix:
+    """
+    Rows ``sources`` of the reflexive-transitive closure as a
+    ``len(sources) x size`` matrix. Evaluation is semi-naive: every iteration
+    only multiplies the facts found by the previous one.
+    """
+    union = automaton.adjacency_union()
+    k = len(sources)
+    reached = csr_matrix(
+        (np.ones(k, dtype=bool), (np.arange(k), np.asarray(sources, dtype=np.int64))),
+        shape=(k, automaton.size),
+    )
+    delta = reached
+    while delta.nnz > 0:
+        delta = (delta @ union) > reached
+        reached = reached + delta
+    return reached
+
+
+# products with more states plus edges than this are not materialized
+MAX_MATERIALIZED_PRODUCT = 10_000_000
+
+
+def closure_strategy(
+    automaton1: AdjacencyMatrixFA, automaton2: AdjacencyMatrixFA
+) -> str:
+    """
+    Rough cost model choosing how ``tensor_based_rpq`` evaluates the product
+    of two automata, estimated from the factors alone. A product too large to
+    materialize is explored lazily. Otherwise the restricted closure visits
+    at most every edge and state once per start state, and the all-pairs
+    bitset closure handles WORD_BITS rows per word operation, after which
+    every start state row is unpacked.
+    """
+    size = automaton1.size * automaton2.size
+    matrices1 = automaton1.decomposed_adj_matrix
+    matrices2 = automaton2.decomposed_adj_matrix
+    edges = sum(
+        matrices1[symbol].nnz * matrices2[symbol].nnz
+        for symbol in matrices1.keys() & matrices2.keys()
+    )
+    if edges + size > MAX_MATERIALIZED_PRODUCT:
+        return "lazy"
+    sources_num = len(automaton1.start_indices()) * len(automaton2.start_indices())
+    restricted = sources_num * (edges + size)
+    all_pairs = (edges + size) * size / WORD_BITS + sources_num * size
+    return "restricted" if restricted <= all_pairs else "all_pairs"
+
+
+CLOSURE_STRATEGIES = {"auto", "all_pairs", "lazy", "restricted"}
+
 
 def intersect_automata(
     automaton1: AdjacencyMatrixFA, automaton2: AdjacencyMatrixFA
@@ -91,53 +394,283 @@ def intersect_automata(
     new_automaton = AdjacencyMatrixFA.__new__(AdjacencyMatrixFA)
 
     new_automaton.alphabet = automaton1.alphabet & automaton2.alphabet
-    states = set()
-    state_index = {}
-    for i, s1 in enumerate(automaton1.states):
-        for j, s2 in enumerate(automaton2.states):
-            state = State((s1.value, s2.value))
-            states.add(state)
-            state_index[state] = i * automaton2.size + j
-    new_automaton.states = states
-    new_automaton.state_index = state_index
-    new_automaton.size = len(states)
-
-    new_automaton.start_states = {
-        State((s1.value, s2.value))
-        for s1 in automaton1.start_states
-        for s2 in automaton2.start_states
-    }
-    new_automaton.final_states = {
-        State((s1.value, s2.value))
-        for s1 in automaton1.final_states
-        for s2 in automaton2.final_states
-    }
+    # product states are State((s1.value, s2.value)) with index i * size2 + j,
+    # derived from the factors instead of being stored one by one
+    new_automaton.state_index = ProductStateTable(
+        automaton1.state_index, automaton2.state_index
+    )
+    new_automaton.states = new_automaton.state_index.all_states
+    new_automaton.size = automaton1.size * automaton2.size
+    new_automaton.start_states = ProductStateSet(
+        automaton1.start_states, automaton2.start_states
+    )
+    new_automaton.final_states = ProductStateSet(
+        automaton1.final_states, automaton2.final_states
+    )
 
     decomposed_adj_matrix = {}
 
     for symbol in new_automaton.alphabet:
         matr1 = automaton1.decomposed_adj_matrix[symbol]
         matr2 = automaton2.decomposed_adj_matrix[symbol]
-        decomposed_adj_matrix[symbol] = kron(matr1, matr2).todok()
+        decomposed_adj_matrix[symbol] = kron(matr1, matr2, format="csr")
 
     new_automaton.decomposed_adj_matrix = decomposed_adj_matrix
     return new_automaton
 
 
+class LazyProductFA:
+    """
+    Intersection of two automata that is never materialized.
+
+    A product state is a pair ``(i, j)`` of factor state indices, and a set of
+    product states is a sparse ``size1 x size2`` boolean matrix, so successors
+    of a whole set under ``a`` are ``A1[a].T @ set @ A2[a]`` and memory only
+    grows with the product states actually reached.
+    """
+
+    automaton1: AdjacencyMatrixFA
+    automaton2: AdjacencyMatrixFA
+    alphabet: Set[Symbol]
+    shape: tuple[int, int]
+
+    def __init__(self, automaton1: AdjacencyMatrixFA, automaton2: AdjacencyMatrixFA):
+        self.automaton1 = automaton1
+        self.automaton2 = automaton2
+        self.alphabet = automaton1.alphabet & automaton2.alphabet
+        self.shape = (automaton1.size, automaton2.size)
+        self._matrices1 = {
+            symbol: csr_matrix(automaton1.decomposed_adj_matrix[symbol])
+            for symbol in self.alphabet
+        }
+        self._transposed1 = {
+            symbol: matr.T.tocsr() for symbol, matr in self._matrices1.items()
+        }
+        self._matrices2 = {
+            symbol: csr_matrix(automaton2.decomposed_adj_matrix[symbol])
+            for symbol in self.alphabet
+        }
+
+    def successors(self, i: int, j: int, symbol: Symbol) -> list[tuple[int, int]]:
+        if symbol not in self.alphabet:
+            return []
+        targets1 = self._matrices1[symbol][i].indices
+        targets2 = self._matrices2[symbol][j].indices
+        return [(i2, j2) for i2 in targets1 for j2 in targets2]
+
+    def pairs_matrix(self, pairs: Iterable[tuple[int, int]]) -> csr_matrix:
+        rows, cols = zip(*pairs) if pairs else ((), ())
+        return csr_matrix(
+            (np.ones(len(rows), dtype=bool), (rows, cols)), shape=self.shape
+        )
+
+    def step(self, front: csr_matrix) -> csr_matrix:
+        new_front = csr_matrix(self.shape, dtype=bool)
+        for symbol in self.alphabet:
+            new_front += self._transposed1[symbol] @ front @ self._matrices2[symbol]
+        return new_front
+
+    def reachable(self, start_pairs: Iterable[tuple[int, int]]) -> csr_matrix:
+        front = self.pairs_matrix(list(start_pairs))
+        visited = front
+        while front.nnz > 0:
+            front = self.step(front) > visited
+            visited = visited + front
+        return visited
+
+    def reachable_from_each(
+        self, starts1: Sequence[int], starts2: Sequence[int]
+    ) -> csr_matrix:
+        """
+        States reachable from ``starts1 x {j}`` separately for every ``j`` in
+        ``starts2``, as a ``(k * size1) x size2`` matrix whose row block ``s``
+        holds the set of ``starts2[s]``. All k searches advance together, one
+        step being ``diag(A1[a].T, ..., A1[a].T) @ front @ A2[a]``.
+        """
+        size1, size2 = self.shape
+        k = len(starts2)
+        starts1 = np.asarray(starts1, dtype=np.int64)
+        rows = (np.arange(k)[:, None] * size1 + starts1[None, :]).ravel()
+        cols = np.repeat(np.asarray(starts2, dtype=np.int64), len(starts1))
+        front = csr_matrix(
+            (np.ones(len(rows), dtype=bool), (rows, cols)), shape=(k * size1, size2)
+        )
+        visited = front
+        block_transposed = {
+            symbol: kron(identity(k, dtype=bool, format="csr"), matr, format="csr")
+            for symbol, matr in self._transposed1.items()
+        }
+        while front.nnz > 0:
+            new_front = csr_matrix(front.shape, dtype=bool)
+            for symbol in self.alphabet:
+                new_front += (block_transposed[symbol] @ front) @ self._matrices2[
+                    symbol
+                ]
+            front = new_front > visited
+            visited = visited + front
+        return visited
+
+
+def lazy_product_rpq(
+    regex_adj_matr: AdjacencyMatrixFA, graph_adj_matr: AdjacencyMatrixFA
+) -> set[tuple[int, int]]:
+    product = LazyProductFA(regex_adj_matr, graph_adj_matr)
+    graph_starts = graph_adj_matr.start_indices()
+    visited = product.reachable_from_each(
+        regex_adj_matr.start_indices(), graph_starts
+    ).tocoo()
+    source_pos, regex_state = np.divmod(visited.row, regex_adj_matr.size)
+    accepted = (
+        regex_adj_matr.final_mask()[regex_state]
+        & graph_adj_matr.final_mask()[visited.col]
+    )
+    values_from = state_values(
+        graph_adj_matr.state_index, graph_starts[source_pos[accepted]]
+    )
+    values_to = state_values(graph_adj_matr.state_index, visited.col[accepted])
+    return set(zip(values_from, values_to))
+
+
+_REGEX_OPERATOR_SPACES = re.compile(r" *([|*().]) *")
+_REGEX_SPACES = re.compile(r" +")
+
+
+def normalize_regex(regex: str) -> str:
+    # spaces separate symbols, but around operators and brackets they are noise;
+    # pyformlang splits on " " only, other whitespace is part of a symbol
+    regex = _REGEX_OPERATOR_SPACES.sub(r"\1", regex.strip(" "))
+    return _REGEX_SPACES.sub(" ", regex)
+
+
+# part of the on-disk key of RegexCache, bump it when the pickled
+# AdjacencyMatrixFA layout changes so old entries are not loaded
+REGEX_CACHE_FORMAT = 1
+
+
+class RegexCache:
+    """
+    LRU cache of regex automata keyed by the normalized regex. With ``path``
+    set, compiled automata are also pickled there and survive restarts; an
+    entry that cannot be loaded counts as a miss and is compiled again.
+    Cached automata are shared between callers and must not be modified.
+    """
+
+    def __init__(self, maxsize: int = 256, path: Path | str | None = None):
+        self.maxsize = maxsize
+        self.path = Path(path) if path is not None else None
+        self._entries: OrderedDict[str, AdjacencyMatrixFA] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _disk_entry(self, key: str) -> Path:
+        digest = hashlib.sha256(f"{REGEX_CACHE_FORMAT}:{key}".encode()).hexdigest()
+        return self.path / (digest + ".pickle")
+
+    def _load(self, key: str) -> AdjacencyMatrixFA | None:
+        if self.path is None:
+            return None
+        try:
+            with open(self._disk_entry(key), "rb") as f:
+                return pickle.load(f)
+        except Exception:
+            # unreadable, truncated, or pickled by an incompatible version
+            return None
+
+    def _store(self, key: str, automaton: AdjacencyMatrixFA):
+        if self.path is None:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        entry = self._disk_entry(key)
+        tmp = entry.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(automaton, f)
+        os.replace(tmp, entry)
+
+    def get(self, regex: str) -> AdjacencyMatrixFA:
+        key = normalize_regex(regex)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        automaton = self._load(key)
+        if automaton is None:
+            automaton = AdjacencyMatrixFA(regex_to_dfa(key))
+            self._store(key, automaton)
+        self._entries[key] = automaton
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return automaton
+
+    def compile_all(self, regexes: Iterable[str]) -> list[AdjacencyMatrixFA]:
+        return [self.get(regex) for regex in regexes]
+
+    def clear(self):
+        self._entries.clear()
+
+
+REGEX_CACHE = RegexCache()
+
+
+def compile_regex(regex: str) -> AdjacencyMatrixFA:
+    return REGEX_CACHE.get(regex)
+
+
 def tensor_based_rpq(
-    regex: str, graph: MultiDiGraph, start_nodes: set[int], final_nodes: set[int]
+    regex: str,
+    graph: MultiDiGraph,
+    start_nodes: set[int],
+    final_nodes: set[int],
+    strategy: str = "auto",
+    closure_backend: str | None = None,
 ) -> set[tuple[int, int]]:
-    regex_adj_matr = AdjacencyMatrixFA(regex_to_dfa(regex))
-    graph_adj_matr = AdjacencyMatrixFA(graph_to_nfa(graph, start_nodes, final_nodes))
+    """
+    ``strategy`` is "lazy" (product explored from the start states without
+    being built), "restricted" or "all_pairs" (closure of the materialized
+    product), or "auto" to let ``closure_strategy`` pick one.
+    ``closure_backend`` selects the all-pairs closure, "bitset" by default.
+    """
+    if strategy not in CLOSURE_STRATEGIES:
+        raise ValueError(
+            f"Unknown closure strategy {strategy!r}, "
+            f"expected one of {sorted(CLOSURE_STRATEGIES)}"
+        )
+    if closure_backend is not None and strategy in ("lazy", "restricted"):
+        raise ValueError(
+            f"closure_backend only applies to the all-pairs closure, "
+            f"not the {strategy!r} strategy"
+        )
+    regex_adj_matr = compile_regex(regex)
+    graph_adj_matr = AdjacencyMatrixFA.from_graph(graph, start_nodes, final_nodes)
+    if strategy == "auto":
+        strategy = closure_strategy(regex_adj_matr, graph_adj_matr)
+    if strategy == "lazy":
+        return lazy_product_rpq(regex_adj_matr, graph_adj_matr)
+
     new_adj_matr = intersect_automata(regex_adj_matr, graph_adj_matr)
-    transitive_closure = new_adj_matr.transitive_closure()
-    state_pairs = set()
-    for s_from in new_adj_matr.start_states:
-        for s_to in new_adj_matr.final_states:
-            ind_from = new_adj_matr.state_index[s_from]
-            ind_to = new_adj_matr.state_index[s_to]
-            if transitive_closure[ind_from, ind_to]:
-                _, graph_state_from = s_from.value
-                _, graph_state_to = s_to.value
-                state_pairs.add((graph_state_from, graph_state_to))
-    return state_pairs
+    if strategy == "restricted":
+        return restricted_product_rpq(new_adj_matr)
+
+    sources = new_adj_matr.start_indices()
+    transitive_closure = new_adj_matr.transitive_closure(closure_backend or "bitset")
+    if isinstance(transitive_closure, BitMatrix):
+        reached = transitive_closure.rows(sources)
+    else:
+        reached = transitive_closure.tocsr()[sources]
+    return product_pairs(new_adj_matr, sources, reached)
+
+
+def restricted_product_rpq(product: AdjacencyMatrixFA) -> set[tuple[int, int]]:
+    sources = product.start_indices()
+    return product_pairs(product, sources, restricted_closure(product, sources))
+
+
+def product_pairs(
+    product: AdjacencyMatrixFA, sources: np.ndarray, reached: csr_matrix
+) -> set[tuple[int, int]]:
+    # row k of reached holds the closure of product state sources[k]; graph
+    # nodes are the second components of the accepted product states
+    reached = reached.tocoo()
+    accepted = product.final_mask()[reached.col]
+    values_from = state_values(product.state_index, sources[reached.row[accepted]])
+    values_to = state_values(product.state_index, reached.col[accepted])
+    return {(u[1], v[1]) for u, v in zip(values_from, values_to)}
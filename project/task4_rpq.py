@@ -1,57 +1,158 @@
+from typing import Any, Iterable, Mapping, Sequence
+
+import numpy as np
 from networkx import MultiDiGraph
-from scipy.sparse import vstack, csr_matrix
+from pyformlang.finite_automaton import Symbol
+from scipy.sparse import csr_matrix, identity, kron
 
-from project.task2_automata_conversions import graph_to_nfa, regex_to_dfa
-from project.task3_adjacency_matrix import AdjacencyMatrixFA
+from project.task3_adjacency_matrix import AdjacencyMatrixFA, compile_regex
 
 
-def ms_bfs_based_rpq(
-    regex: str, graph: MultiDiGraph, start_nodes: set[int], final_nodes: set[int]
-) -> set[tuple[int, int]]:
-    graph_am = AdjacencyMatrixFA(graph_to_nfa(graph, start_nodes, final_nodes))
-    regex_am = AdjacencyMatrixFA(regex_to_dfa(regex))
-    alphabet = regex_am.alphabet & graph_am.alphabet
-    m = graph_am.size
-    n = regex_am.size
-    ind_g = graph_am.state_index
-    ind_r = regex_am.state_index
-
-    blocks = []
-    for s in graph_am.start_states:
-        block = csr_matrix((m, n), dtype=bool)
-        for q in regex_am.start_states:
-            block[ind_g[s], ind_r[q]] = True
-        blocks.append(block)
-    front = vstack(blocks)
+class GraphIndex:
+    """
+    Query-independent decomposition of a graph: one sparse matrix per label
+    and the node <-> matrix index maps. Transposed label matrices are built on
+    first use and kept, so any number of queries can share one index.
+    """
+
+    automaton: AdjacencyMatrixFA
+    node_values: np.ndarray
+
+    def __init__(self, graph: MultiDiGraph, extra_nodes: Iterable[int] = ()):
+        # the automaton's own start/final states are not used by queries, passing
+        # extra_nodes as start nodes only adds the ones missing from the graph
+        self.automaton = AdjacencyMatrixFA.from_graph(graph, set(extra_nodes), set())
+        self.node_values = self.automaton.state_index.nodes
+        self._transposed: dict[Symbol, csr_matrix] = {}
+
+    @classmethod
+    def from_automaton(cls, automaton: AdjacencyMatrixFA) -> "GraphIndex":
+        """An index over a graph automaton built elsewhere, states being nodes."""
+        index = cls.__new__(cls)
+        index.automaton = automaton
+        index.node_values = automaton.state_index.nodes
+        index._transposed = {}
+        return index
+
+    @property
+    def size(self) -> int:
+        return self.automaton.size
+
+    @property
+    def alphabet(self) -> set[Symbol]:
+        return self.automaton.alphabet
+
+    def transposed(self, symbol: Symbol) -> csr_matrix:
+        if symbol not in self._transposed:
+            matr = self.automaton.decomposed_adj_matrix[symbol]
+            self._transposed[symbol] = matr.T.tocsr()
+        return self._transposed[symbol]
+
+    def indices(self, nodes: Iterable[int]) -> np.ndarray:
+        # as in graph_to_nfa, an empty node set stands for all nodes
+        if not nodes:
+            return np.arange(self.size)
+        found = self.automaton.state_index.lookup(list(nodes))
+        if (found < 0).any():
+            raise KeyError("not all nodes belong to the graph")
+        return found
+
+
+def ms_bfs_reachability(
+    graph_transposed: Mapping[Any, csr_matrix],
+    graph_size: int,
+    regex_matrices: Mapping[Any, csr_matrix],
+    regex_size: int,
+    regex_starts: Iterable[int],
+    regex_finals: Iterable[int],
+    sources: Sequence[int],
+    finals: Sequence[int],
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Multiple-source BFS over matrix indices. Label matrices of the graph
+    (transposed) and of the regex are matched by their keys. Returns the
+    positions in ``sources`` and the graph indices of the reached final nodes.
+    """
+    alphabet = graph_transposed.keys() & regex_matrices.keys()
+    m = graph_size
+    n = regex_size
+
+    # the front is an m x (k * n) matrix: column block i holds the regex states
+    # reached by the BFS started from the i-th start node, so one step for all
+    # k sources is G^T @ front @ diag(R, ..., R) for every symbol
+    k = len(sources)
+    regex_starts = np.fromiter(regex_starts, dtype=np.int64)
+    rows = np.repeat(np.asarray(sources, dtype=np.int64), len(regex_starts))
+    cols = (np.arange(k)[:, None] * n + regex_starts[None, :]).ravel()
+    front = csr_matrix((np.ones(len(rows), dtype=bool), (rows, cols)), shape=(m, k * n))
     visited = front
 
-    graph_matrices_transposed = {
-        symbol: graph_am.decomposed_adj_matrix[symbol].T.tocsr() for symbol in alphabet
-    }
-    regex_matrices = {
-        symbol: regex_am.decomposed_adj_matrix[symbol].tocsr() for symbol in alphabet
+    regex_block_matrices = {
+        symbol: kron(
+            identity(k, dtype=bool, format="csr"), regex_matrices[symbol], format="csr"
+        )
+        for symbol in alphabet
     }
-    num = len(graph_am.start_states)
 
     while front.nnz > 0:
-        new_front = {}
+        new_front = csr_matrix((m, k * n), dtype=bool)
         for symbol in alphabet:
-            new_front[symbol] = vstack(
-                [
-                    (graph_matrices_transposed[symbol] @ front[i * m : (i + 1) * m])
-                    for i in range(num)
-                ]
+            new_front += (graph_transposed[symbol] @ front) @ (
+                regex_block_matrices[symbol]
             )
-            new_front[symbol] = new_front[symbol] @ regex_matrices[symbol]
-        front = sum(new_front.values()) > visited
+        # sparse-safe "new and not visited"
+        front = new_front > visited
         visited = visited + front
 
-    state_pairs = set()
-    for i, s_from in enumerate(graph_am.start_states):
-        block = visited[i * m : (i + 1) * m]
-        for s_to in graph_am.final_states:
-            row = block.getrow(ind_g[s_to])
-            for q in regex_am.final_states:
-                if row[0, ind_r[q]]:
-                    state_pairs.add((s_from.value, s_to.value))
-    return state_pairs
+    is_final_graph = np.zeros(m, dtype=bool)
+    is_final_graph[np.asarray(finals, dtype=np.int64)] = True
+    is_final_regex = np.zeros(n, dtype=bool)
+    is_final_regex[np.fromiter(regex_finals, dtype=np.int64)] = True
+
+    reached = visited.tocoo()
+    source_pos, regex_state = np.divmod(reached.col, n)
+    accepted = is_final_graph[reached.row] & is_final_regex[regex_state]
+    return source_pos[accepted], reached.row[accepted]
+
+
+def ms_bfs(
+    index: GraphIndex,
+    regex_am: AdjacencyMatrixFA,
+    start_nodes: Iterable[int],
+    final_nodes: Iterable[int],
+) -> set[tuple[int, int]]:
+    alphabet = regex_am.alphabet & index.alphabet
+    sources = index.indices(start_nodes)
+    source_pos, targets = ms_bfs_reachability(
+        {symbol: index.transposed(symbol) for symbol in alphabet},
+        index.size,
+        regex_am.decomposed_adj_matrix,
+        regex_am.size,
+        regex_am.start_indices(),
+        regex_am.final_indices(),
+        sources,
+        index.indices(final_nodes),
+    )
+    values_from = index.node_values[sources[source_pos]].tolist()
+    values_to = index.node_values[targets].tolist()
+    return set(zip(values_from, values_to))
+
+
+def ms_bfs_based_rpq(
+    regex: str, graph: MultiDiGraph, start_nodes: set[int], final_nodes: set[int]
+) -> set[tuple[int, int]]:
+    index = GraphIndex(graph, set(start_nodes or ()) | set(final_nodes or ()))
+    return ms_bfs(index, compile_regex(regex), start_nodes, final_nodes)
+
+
+def batch_rpq(
+    index: GraphIndex, queries: Iterable[tuple[str, set[int], set[int]]]
+) -> list[set[tuple[int, int]]]:
+    """
+    Evaluates ``(regex, start_nodes, final_nodes)`` queries against one graph
+    index, sharing its label matrices and transposes and the compiled regexes.
+    """
+    return [
+        ms_bfs(index, compile_regex(regex), start_nodes, final_nodes)
+        for regex, start_nodes, final_nodes in queries
+    ]
@@ -1,3 +1,5 @@
+import hashlib
+from collections import OrderedDict
 from typing import Dict, Tuple
 from pyformlang.cfg import Production, Variable, Terminal, CFG, Epsilon
 import pyformlang.cfg as pcfg
@@ -36,6 +38,109 @@ def group_productions(cfg_wnf: pcfg.CFG):
     return term_prods, epsilon_prods, binary_prods
 
 
+class CompiledGrammar:
+    """
+    A grammar in weak Chomsky normal form with variables interned as integers
+    ``0..len(variables) - 1`` and productions indexed for CFPQ algorithms.
+    Instances are shared through ``compile_grammar`` and must not be modified.
+    """
+
+    variables: list[Variable]
+    var_index: dict[Variable, int]
+    start: int
+    term_prods: dict[str, list[int]]
+    epsilon_prods: list[int]
+    binary_prods: list[tuple[int, int, int]]
+    by_left: list[list[tuple[int, int]]]
+    by_right: list[list[tuple[int, int]]]
+    by_head: list[list[tuple[int, int]]]
+    labels_by_head: list[set[str]]
+
+    def __init__(self, cfg: pcfg.CFG):
+        cfg_wnf = cfg_to_weak_normal_form(cfg)
+        term_prods, epsilon_prods, binary_prods = group_productions(cfg_wnf)
+
+        self.variables = sorted(
+            cfg_wnf.variables | {cfg_wnf.start_symbol}, key=lambda var: str(var.value)
+        )
+        self.var_index = {var: i for i, var in enumerate(self.variables)}
+        index = self.var_index
+        self.start = index[cfg_wnf.start_symbol]
+        self.term_prods = {
+            label: sorted(index[A] for A in heads)
+            for label, heads in term_prods.items()
+        }
+        self.epsilon_prods = sorted(index[A] for A in epsilon_prods)
+        self.binary_prods = sorted(
+            (index[A], index[B], index[C]) for A, B, C in binary_prods
+        )
+
+        # A -> B C is looked up by B when a new B fact appears, and by C for C facts
+        self.by_left = [[] for _ in self.variables]
+        self.by_right = [[] for _ in self.variables]
+        self.by_head = [[] for _ in self.variables]
+        for A, B, C in self.binary_prods:
+            self.by_left[B].append((A, C))
+            self.by_right[C].append((A, B))
+            self.by_head[A].append((B, C))
+        self.labels_by_head = [set() for _ in self.variables]
+        for label, heads in self.term_prods.items():
+            for A in heads:
+                self.labels_by_head[A].add(label)
+
+    @property
+    def size(self) -> int:
+        return len(self.variables)
+
+
+def grammar_fingerprint(cfg: pcfg.CFG) -> str:
+    def symbol_key(symbol) -> str:
+        kind = "V" if isinstance(symbol, Variable) else "T"
+        return f"{kind}:{symbol.value!r}"
+
+    productions = sorted(
+        symbol_key(p.head) + " -> " + " ".join(symbol_key(s) for s in p.body)
+        for p in cfg.productions
+    )
+    text = "\n".join([symbol_key(cfg.start_symbol), *productions])
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class GrammarCache:
+    """
+    LRU cache of compiled grammars keyed by the content of the grammar, so
+    equal grammars built separately share one compilation.
+    """
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, CompiledGrammar] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, cfg: pcfg.CFG) -> CompiledGrammar:
+        key = grammar_fingerprint(cfg)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        compiled = CompiledGrammar(cfg)
+        self._entries[key] = compiled
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        self._entries.clear()
+
+
+GRAMMAR_CACHE = GrammarCache()
+
+
+def compile_grammar(cfg: pcfg.CFG) -> CompiledGrammar:
+    return GRAMMAR_CACHE.get(cfg)
+
+
 def hellings_initialize(
     graph: nx.DiGraph,
     term_prods: Dict[str, set[Variable]],
@@ -56,37 +161,147 @@ def hellings_initialize(
     return reached
 
 
+class FactIndex:
+    """Facts ``A(u, v)`` of every variable indexed by source and by target node."""
+
+    def __init__(self, size: int):
+        self.from_node: list[Dict[int, set[int]]] = [{} for _ in range(size)]
+        self.to_node: list[Dict[int, set[int]]] = [{} for _ in range(size)]
+        self.worklist: list[tuple[int, int, int]] = []
+
+    def add(self, A: int, u: int, v: int):
+        targets = self.from_node[A].setdefault(u, set())
+        if v not in targets:
+            targets.add(v)
+            self.to_node[A].setdefault(v, set()).add(u)
+            self.worklist.append((A, u, v))
+
+    def targets(self, A: int, u: int) -> list[int]:
+        return list(self.from_node[A].get(u, ()))
+
+    def sources(self, A: int, v: int) -> list[int]:
+        return list(self.to_node[A].get(v, ()))
+
+
+def hellings_closure(grammar: CompiledGrammar, graph: nx.DiGraph) -> FactIndex:
+    facts = FactIndex(grammar.size)
+    for u, v, label in graph.edges(data="label"):
+        label = label if label is not None else "$"
+        for A in grammar.term_prods.get(label, ()):
+            facts.add(A, int(u), int(v))
+    for A in grammar.epsilon_prods:
+        for v in graph.nodes():
+            facts.add(A, int(v), int(v))
+
+    while facts.worklist:
+        B, u, v = facts.worklist.pop()
+        # B(u, v) and C(v, w) give A(u, w)
+        for A, C in grammar.by_left[B]:
+            for w in facts.targets(C, v):
+                facts.add(A, u, w)
+        # D(t, u) and B(u, v) give A(t, v)
+        for A, D in grammar.by_right[B]:
+            for t in facts.sources(D, u):
+                facts.add(A, t, v)
+    return facts
+
+
+def demand_closure(
+    grammar: CompiledGrammar, graph: nx.DiGraph, sources: set[int]
+) -> FactIndex:
+    """
+    Hellings closure deriving only the facts needed for paths from
+    ``sources`` (magic sets). The start variable is demanded at every source;
+    ``A -> B C`` demanded at ``u`` demands ``B`` at ``u`` and ``C`` at every
+    ``v`` with ``B(u, v)``. Facts ``A(u, _)`` are derived only for demanded
+    ``A`` at ``u``.
+    """
+    successors: Dict[int, list[tuple[str, int]]] = {}
+    for u, v, label in graph.edges(data="label"):
+        label = label if label is not None else "$"
+        successors.setdefault(int(u), []).append((label, int(v)))
+    nullable = set(grammar.epsilon_prods)
+
+    facts = FactIndex(grammar.size)
+    demanded: list[set[int]] = [set() for _ in range(grammar.size)]
+    demands = []
+
+    def demand(A: int, u: int):
+        if u not in demanded[A]:
+            demanded[A].add(u)
+            demands.append((A, u))
+
+    nodes = {int(v) for v in graph.nodes()}
+    for u in sources:
+        if u in nodes:
+            demand(grammar.start, u)
+
+    while demands or facts.worklist:
+        if demands:
+            A, u = demands.pop()
+            labels = grammar.labels_by_head[A]
+            if labels:
+                for label, v in successors.get(u, ()):
+                    if label in labels:
+                        facts.add(A, u, v)
+            if A in nullable:
+                facts.add(A, u, u)
+            for B, C in grammar.by_head[A]:
+                demand(B, u)
+                for v in facts.targets(B, u):
+                    demand(C, v)
+                    for w in facts.targets(C, v):
+                        facts.add(A, u, w)
+            continue
+
+        B, u, v = facts.worklist.pop()
+        for A, C in grammar.by_left[B]:
+            if u in demanded[A]:
+                demand(C, v)
+                for w in facts.targets(C, v):
+                    facts.add(A, u, w)
+        for A, D in grammar.by_right[B]:
+            for t in facts.sources(D, u):
+                if t in demanded[A]:
+                    facts.add(A, t, v)
+    return facts
+
+
+HELLINGS_STRATEGIES = {"auto", "all_pairs", "demand"}
+
+
 def hellings_based_cfpq(
     cfg: pcfg.CFG,
     graph: nx.DiGraph,
     start_nodes: set[int] = None,
     final_nodes: set[int] = None,
+    strategy: str = "auto",
 ) -> set[tuple[int, int]]:
-    cfg_wnf = cfg_to_weak_normal_form(cfg)
-
-    term_prods, epsilon_prods, binary_prods = group_productions(cfg_wnf)
-    reached = hellings_initialize(graph, term_prods, epsilon_prods)
-
-    changed = True
-    while changed:
-        changed = False
-        for A, B, C in binary_prods:
-            if B in reached and C in reached:
-                b_pairs = list(reached[B])
-                c_pairs = list(reached[C])
-                for u, v1 in b_pairs:
-                    for v2, w in c_pairs:
-                        if v1 == v2 and (u, w) not in reached.setdefault(A, set()):
-                            reached[A].add((u, w))
-                            changed = True
+    """
+    ``strategy`` is ``"all_pairs"`` for the closure over all nodes or
+    ``"demand"`` for ``demand_closure`` from ``start_nodes``; ``"auto"``
+    uses the latter whenever start nodes are given.
+    """
+    if strategy not in HELLINGS_STRATEGIES:
+        raise ValueError(
+            f"Unknown Hellings strategy {strategy!r}, "
+            f"expected one of {sorted(HELLINGS_STRATEGIES)}"
+        )
+    grammar = compile_grammar(cfg)
+    if strategy == "auto":
+        strategy = "demand" if start_nodes else "all_pairs"
+    if strategy == "demand":
+        sources = start_nodes or {int(v) for v in graph.nodes()}
+        facts = demand_closure(grammar, graph, sources)
+    else:
+        facts = hellings_closure(grammar, graph)
 
     result = set()
-    start_symbol = cfg_wnf.start_symbol
-    if start_symbol in reached:
-        for u, v in reached[start_symbol]:
-            if (not start_nodes or u in start_nodes) and (
-                not final_nodes or v in final_nodes
-            ):
+    for u, targets in facts.from_node[grammar.start].items():
+        if start_nodes and u not in start_nodes:
+            continue
+        for v in targets:
+            if not final_nodes or v in final_nodes:
                 result.add((u, v))
 
     return result
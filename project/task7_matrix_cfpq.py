@@ -0,0 +1,73 @@
+import networkx as nx
+import numpy as np
+import pyformlang.cfg as pcfg
+from scipy.sparse import csr_matrix, identity
+
+from project.task3_adjacency_matrix import AdjacencyMatrixFA
+from project.task6_cfpq import CompiledGrammar, compile_grammar
+
+
+def matrix_closure(
+    grammar: CompiledGrammar, label_matrices: dict[str, csr_matrix], size: int
+) -> list[csr_matrix]:
+    """
+    One boolean matrix per grammar variable: ``T[A][u, v]`` iff ``A`` derives
+    a path from ``u`` to ``v``. Evaluation is semi-naive, for ``A -> B C``
+    a round only computes ``dB @ T[C] + T_old[B] @ dC`` from the facts
+    ``dB``, ``dC`` found in the previous round.
+    """
+    reached = [csr_matrix((size, size), dtype=bool) for _ in range(grammar.size)]
+    for label, heads in grammar.term_prods.items():
+        if label in label_matrices:
+            for A in heads:
+                reached[A] = reached[A] + label_matrices[label]
+    for A in grammar.epsilon_prods:
+        reached[A] = reached[A] + identity(size, dtype=bool, format="csr")
+    delta = list(reached)
+
+    while any(matr.nnz > 0 for matr in delta):
+        new_facts = [None] * grammar.size
+        for A, B, C in grammar.binary_prods:
+            if delta[B].nnz == 0 and delta[C].nnz == 0:
+                continue
+            # reached[B] already includes delta[B]
+            old_B = reached[B] > delta[B]
+            product = delta[B] @ reached[C] + old_B @ delta[C]
+            new_facts[A] = product if new_facts[A] is None else new_facts[A] + product
+        delta = [
+            csr_matrix((size, size), dtype=bool)
+            if facts is None
+            else facts > reached[A]
+            for A, facts in enumerate(new_facts)
+        ]
+        for A, matr in enumerate(delta):
+            if matr.nnz > 0:
+                reached[A] = reached[A] + matr
+    return reached
+
+
+def matrix_based_cfpq(
+    cfg: pcfg.CFG,
+    graph: nx.DiGraph,
+    start_nodes: set[int] = None,
+    final_nodes: set[int] = None,
+) -> set[tuple[int, int]]:
+    grammar = compile_grammar(cfg)
+    graph_am = AdjacencyMatrixFA.from_graph(graph, set(), set())
+    label_matrices = {
+        symbol.value: matr for symbol, matr in graph_am.decomposed_adj_matrix.items()
+    }
+    reached = matrix_closure(grammar, label_matrices, graph_am.size)[grammar.start]
+
+    nodes = graph_am.state_index.nodes
+    allowed = np.ones((2, graph_am.size), dtype=bool)
+    for row, selected in enumerate([start_nodes, final_nodes]):
+        if selected:
+            allowed[row] = np.isin(nodes, list(selected))
+    reached = reached.tocoo()
+    accepted = allowed[0][reached.row] & allowed[1][reached.col]
+    return set(
+        zip(
+            nodes[reached.row[accepted]].tolist(), nodes[reached.col[accepted]].tolist()
+        )
+    )
@@ -0,0 +1,156 @@
+import networkx as nx
+import numpy as np
+import pyformlang.cfg as pcfg
+from pyformlang.finite_automaton import (
+    Epsilon,
+    EpsilonNFA,
+    NondeterministicFiniteAutomaton,
+    State,
+    Symbol,
+)
+from pyformlang.rsa import Box, RecursiveAutomaton
+from scipy.sparse import csr_matrix, kron
+
+from project.task3_adjacency_matrix import AdjacencyMatrixFA
+
+
+def cfg_to_rsm(cfg: pcfg.CFG) -> RecursiveAutomaton:
+    """
+    One box per variable, its bodies as chains from a shared start state.
+    Boxes are built from the productions, not from ``cfg.to_text()``, which
+    prefixes lowercase variables and uppercase terminals.
+    """
+    enfas: dict[pcfg.Variable, EpsilonNFA] = {}
+    start, final = State("start"), State("final")
+    for n, production in enumerate(cfg.productions):
+        enfa = enfas.setdefault(production.head, EpsilonNFA())
+        enfa.add_start_state(start)
+        enfa.add_final_state(final)
+        symbols = [Symbol(symbol.value) for symbol in production.body] or [Epsilon()]
+        states = [start] + [State((n, k)) for k in range(1, len(symbols))] + [final]
+        for k, symbol in enumerate(symbols):
+            enfa.add_transition(states[k], symbol, states[k + 1])
+    boxes = {Box(enfa.minimize(), Symbol(head.value)) for head, enfa in enfas.items()}
+    return RecursiveAutomaton(
+        {box.label for box in boxes}, Symbol(cfg.start_symbol.value), boxes
+    )
+
+
+def ebnf_to_rsm(ebnf: str) -> RecursiveAutomaton:
+    return RecursiveAutomaton.from_text(ebnf)
+
+
+def rsm_to_adjacency(rsm: RecursiveAutomaton) -> AdjacencyMatrixFA:
+    """
+    All boxes of the RSM as one automaton with states ``(label, box state)``.
+    Start and final states are the union of the ones of the boxes.
+    """
+    nfa = NondeterministicFiniteAutomaton()
+    for label, box in rsm.boxes.items():
+        dfa = box.dfa
+
+        def state(s):
+            return State((label.value, s.value))
+
+        for s in dfa.start_states:
+            nfa.add_start_state(state(s))
+        for s in dfa.final_states:
+            nfa.add_final_state(state(s))
+        for s_from, symbol_targets in dfa.to_dict().items():
+            for symbol, targets in symbol_targets.items():
+                targets = targets if hasattr(targets, "__iter__") else [targets]
+                for s_to in targets:
+                    nfa.add_transition(state(s_from), symbol, state(s_to))
+    return AdjacencyMatrixFA(nfa)
+
+
+def tensor_based_cfpq(
+    rsm: RecursiveAutomaton,
+    graph: nx.DiGraph,
+    start_nodes: set[int] = None,
+    final_nodes: set[int] = None,
+) -> set[tuple[int, int]]:
+    """
+    Tensor CFPQ over the product of the RSM and the graph. Instead of
+    recomputing the Kronecker product and its closure each round, the product
+    is extended by ``R[N] (x) dG[N]`` for the nonterminal edges found in the
+    last round only, and the reachability rows of the box start states are
+    extended semi-naively from the new product edges.
+    """
+    rsm_am = rsm_to_adjacency(rsm)
+    graph_am = AdjacencyMatrixFA.from_graph(graph, set(), set())
+    n = graph_am.size
+    size = rsm_am.size * n
+
+    product = csr_matrix((size, size), dtype=bool)
+    for symbol, matr in rsm_am.decomposed_adj_matrix.items():
+        if symbol in graph_am.decomposed_adj_matrix and symbol not in rsm.boxes:
+            graph_matr = graph_am.decomposed_adj_matrix[symbol]
+            product = product + kron(matr, graph_matr, format="csr")
+
+    # row k * n + u of reached is the product state (box start k, node u)
+    box_starts = []
+    box_finals = np.zeros((len(rsm.boxes), rsm_am.size), dtype=bool)
+    labels = list(rsm.boxes)
+    for b, label in enumerate(labels):
+        dfa = rsm.boxes[label].dfa
+        box_starts.append(
+            rsm_am.state_index[State((label.value, dfa.start_state.value))]
+        )
+        for s in dfa.final_states:
+            box_finals[b, rsm_am.state_index[State((label.value, s.value))]] = True
+    start_rows = (
+        np.asarray(box_starts, dtype=np.int64)[:, None] * n + np.arange(n)
+    ).ravel()
+    reached = csr_matrix(
+        (
+            np.ones(len(start_rows), dtype=bool),
+            (np.arange(len(start_rows)), start_rows),
+        ),
+        shape=(len(start_rows), size),
+    )
+    # front: entries found by the last step, pending: entries found since
+    # nonterminal facts were last extracted
+    front = pending = reached
+    facts = {label: csr_matrix((n, n), dtype=bool) for label in labels}
+
+    while True:
+        while front.nnz > 0:
+            front = (front @ product) > reached
+            reached = reached + front
+            pending = pending + front
+        # new facts N(u, v): box N started at u reaches one of its finals at v
+        new_facts = {}
+        coo = pending.tocoo()
+        box, u = np.divmod(coo.row, n)
+        q, v = np.divmod(coo.col, n)
+        accepted = box_finals[box, q]
+        for b, label in enumerate(labels):
+            mask = accepted & (box == b)
+            matr = csr_matrix(
+                (np.ones(mask.sum(), dtype=bool), (u[mask], v[mask])), shape=(n, n)
+            )
+            delta = matr > facts[label]
+            if delta.nnz > 0:
+                new_facts[label] = delta
+                facts[label] = facts[label] + delta
+        if not new_facts:
+            break
+        extension = csr_matrix((size, size), dtype=bool)
+        for label, delta in new_facts.items():
+            if label in rsm_am.decomposed_adj_matrix:
+                extension = extension + kron(
+                    rsm_am.decomposed_adj_matrix[label], delta, format="csr"
+                )
+        product = product + extension
+        front = pending = (reached @ extension) > reached
+        reached = reached + front
+
+    nodes = graph_am.state_index.nodes
+    result = facts[rsm.initial_label].tocoo()
+    return {
+        (u, v)
+        for u, v in zip(nodes[result.row].tolist(), nodes[result.col].tolist())
+        if (not start_nodes or u in start_nodes)
+        and (not final_nodes or v in final_nodes)
+    }
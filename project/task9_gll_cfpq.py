@@ -0,0 +1,274 @@
+import time
+from dataclasses import dataclass
+
+import networkx as nx
+import numpy as np
+from pyformlang.finite_automaton import State
+from pyformlang.rsa import RecursiveAutomaton
+from scipy.sparse import csr_matrix
+
+from project.task3_adjacency_matrix import AdjacencyMatrixFA
+from project.task8_tensor_cfpq import rsm_to_adjacency
+
+
+@dataclass
+class GLLStats:
+    descriptors: int = 0
+    batches: int = 0
+    gss_edges: int = 0
+    seconds: float = 0.0
+
+    @property
+    def descriptors_per_second(self) -> float:
+        return self.descriptors / self.seconds if self.seconds else 0.0
+
+
+def _expand(matr: csr_matrix, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # (position in rows, target) for every csr entry of the given rows
+    starts = matr.indptr[rows]
+    lengths = matr.indptr[rows + 1] - starts
+    offsets = np.cumsum(lengths) - lengths
+    positions = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+    return np.repeat(np.arange(len(rows)), lengths), matr.indices[positions]
+
+
+def _groups(keys: np.ndarray):
+    # (key, positions of key) for every distinct key
+    order = np.argsort(keys, kind="stable")
+    values, starts = np.unique(keys[order], return_index=True)
+    return zip(values.tolist(), np.split(order, starts[1:]))
+
+
+def _int_array(values) -> np.ndarray:
+    return np.fromiter(values, dtype=np.int64, count=len(values))
+
+
+# pending descriptors of a state are deduplicated once they exceed this many
+# batches and twice the size left by the previous deduplication
+BACKLOG_BATCHES = 8
+
+
+class KeySet:
+    """
+    Set of int64 keys kept as sorted disjoint runs, 8 bytes per key. A run is
+    merged into the previous one while that one is at most twice as long, so
+    there are O(log size) runs and every key is merged O(log size) times.
+    """
+
+    def __init__(self):
+        self.runs: list[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return sum(len(run) for run in self.runs)
+
+    def missing(self, keys: np.ndarray) -> np.ndarray:
+        """Distinct keys not in the set, sorted."""
+        keys = np.unique(keys)
+        for run in self.runs:
+            if len(keys) == 0:
+                break
+            pos = np.minimum(np.searchsorted(run, keys), len(run) - 1)
+            keys = keys[run[pos] != keys]
+        return keys
+
+    def add_new(self, keys: np.ndarray) -> np.ndarray:
+        """Adds keys and returns the ones that were not in the set, sorted."""
+        keys = self.missing(keys)
+        if len(keys) > 0:
+            self.runs.append(keys)
+            while len(self.runs) > 1 and len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+                last = self.runs.pop()
+                self.runs[-1] = np.sort(np.concatenate([self.runs[-1], last]))
+        return keys
+
+
+class GLLSolver:
+    """
+    GLL over an RSM and a graph with integer encodings only.
+
+    A GSS node is ``box * n + u``: box ``box`` called at graph node ``u``. A
+    GSS edge to return state ``q`` and caller GSS node ``g`` is the int
+    ``q * gss_size + g``. A descriptor of RSM state ``q`` is the int
+    ``u * gss_size + g`` for graph node ``u`` and GSS node ``g``; pending
+    descriptors are kept per RSM state as key arrays and processed in
+    batches, visited ones in a KeySet per RSM state. Calls and pops of a
+    batch are grouped by GSS node, so every new pop/edge combination is
+    emitted by array operations.
+    """
+
+    def __init__(
+        self,
+        rsm: RecursiveAutomaton,
+        graph: nx.DiGraph | AdjacencyMatrixFA,
+        batch_size: int = 1 << 16,
+    ):
+        self.batch_size = batch_size
+        rsm_am = rsm_to_adjacency(rsm)
+        # a prebuilt graph automaton is used as is, its start states are ignored
+        if isinstance(graph, AdjacencyMatrixFA):
+            graph_am = graph
+        else:
+            graph_am = AdjacencyMatrixFA.from_graph(graph, set(), set())
+        self.nodes = graph_am.state_index.nodes
+        self.n = graph_am.size
+        self.labels = list(rsm.boxes)
+        box_ids = {label.value: b for b, label in enumerate(self.labels)}
+        self.gss_size = len(self.labels) * self.n
+        self.initial = box_ids[rsm.initial_label.value]
+        self.rsm_size = rsm_am.size
+
+        self.is_final = rsm_am.final_mask()
+        self.box_start = np.zeros(len(self.labels), dtype=np.int64)
+        for b, label in enumerate(self.labels):
+            start = rsm.boxes[label].dfa.start_state
+            self.box_start[b] = rsm_am.state_index[State((label.value, start.value))]
+
+        # terminal moves: (graph label matrix, target) and calls: (box, return state)
+        self.moves = [[] for _ in range(rsm_am.size)]
+        self.calls = [[] for _ in range(rsm_am.size)]
+        for symbol, matr in rsm_am.decomposed_adj_matrix.items():
+            coo = matr.tocoo()
+            for q, q_to in zip(coo.row.tolist(), coo.col.tolist()):
+                if symbol.value in box_ids:
+                    self.calls[q].append((box_ids[symbol.value], q_to))
+                elif symbol in graph_am.decomposed_adj_matrix:
+                    self.moves[q].append((graph_am.decomposed_adj_matrix[symbol], q_to))
+
+        self.gss_edges: dict[int, set[int]] = {}
+        self.popped: dict[int, set[int]] = {}
+        self.visited = [KeySet() for _ in range(rsm_am.size)]
+        self.pending: list[list[np.ndarray]] = [[] for _ in range(rsm_am.size)]
+        self.pending_size = [0] * rsm_am.size
+        self.backlog_limit = [BACKLOG_BATCHES * batch_size] * rsm_am.size
+
+    def add(self, q: int, u: np.ndarray, g: np.ndarray):
+        if len(u) == 0:
+            return
+        # graph csr indices are int32, packed keys need int64
+        self.pending[q].append(u.astype(np.int64) * self.gss_size + g)
+        self.pending_size[q] += len(u)
+        if self.pending_size[q] > self.backlog_limit[q]:
+            keys = self.visited[q].missing(np.concatenate(self.pending[q]))
+            self.pending[q] = [keys] if len(keys) > 0 else []
+            self.pending_size[q] = len(keys)
+            self.backlog_limit[q] = max(
+                BACKLOG_BATCHES * self.batch_size, 2 * len(keys)
+            )
+
+    def call(self, u: np.ndarray, g: np.ndarray, box: int, q_return: int):
+        called = []
+        for callee, positions in _groups(box * self.n + u):
+            edges = self.gss_edges.setdefault(callee, set())
+            if not edges:
+                # first call of box at this node
+                called.append(callee)
+            fresh = set((q_return * self.gss_size + g[positions]).tolist()) - edges
+            if not fresh:
+                continue
+            edges |= fresh
+            popped = self.popped.get(callee)
+            if popped:
+                v = _int_array(popped)
+                callers = _int_array(fresh) - q_return * self.gss_size
+                self.add(q_return, np.repeat(v, len(callers)), np.tile(callers, len(v)))
+        if called:
+            called = np.asarray(called, dtype=np.int64)
+            self.add(self.box_start[box], called - box * self.n, called)
+
+    def pop(self, u: np.ndarray, g: np.ndarray):
+        for node, positions in _groups(g):
+            popped = self.popped.setdefault(node, set())
+            fresh = set(u[positions].tolist()) - popped
+            if not fresh:
+                continue
+            popped |= fresh
+            edges = self.gss_edges.get(node)
+            if edges:
+                v = _int_array(fresh)
+                q_returns, callers = np.divmod(_int_array(edges), self.gss_size)
+                for q_return, edge_positions in _groups(q_returns):
+                    self.add(
+                        q_return,
+                        np.repeat(v, len(edge_positions)),
+                        np.tile(callers[edge_positions], len(v)),
+                    )
+
+    def has_pending(self, q: int) -> bool:
+        return bool(self.pending[q])
+
+    def step(self, q: int) -> int:
+        batch_size = self.batch_size
+        pending, chunks, taken = self.pending[q], [], 0
+        while pending and taken < batch_size:
+            chunk = pending.pop()
+            if taken + len(chunk) > batch_size:
+                pending.append(chunk[batch_size - taken :])
+                chunk = chunk[: batch_size - taken]
+            chunks.append(chunk)
+            taken += len(chunk)
+        self.pending_size[q] -= taken
+        fresh = self.visited[q].add_new(np.concatenate(chunks))
+        if len(fresh) == 0:
+            return 0
+        u, g = np.divmod(fresh, self.gss_size)
+
+        for matr, q_to in self.moves[q]:
+            owners, targets = _expand(matr, u)
+            self.add(q_to, targets, g[owners])
+        for box, q_return in self.calls[q]:
+            self.call(u, g, box, q_return)
+        if self.is_final[q]:
+            self.pop(u, g)
+        return len(fresh)
+
+    def run(self, start: np.ndarray, stats: GLLStats = None):
+        began = time.perf_counter()
+        roots = self.initial * self.n + start
+        for root in roots.tolist():
+            self.gss_edges.setdefault(root, set())
+        self.add(self.box_start[self.initial], start, roots)
+
+        descriptors = batches = 0
+        while True:
+            q = next((q for q in range(self.rsm_size) if self.has_pending(q)), None)
+            if q is None:
+                break
+            descriptors += self.step(q)
+            batches += 1
+        if stats is not None:
+            stats.descriptors += descriptors
+            stats.batches += batches
+            stats.gss_edges += sum(len(edges) for edges in self.gss_edges.values())
+            stats.seconds += time.perf_counter() - began
+
+
+def gll_based_cfpq(
+    rsm: RecursiveAutomaton,
+    graph: nx.DiGraph | AdjacencyMatrixFA,
+    start_nodes: set[int] = None,
+    final_nodes: set[int] = None,
+    batch_size: int = 1 << 16,
+    stats: GLLStats = None,
+) -> set[tuple[int, int]]:
+    """
+    GLL-based CFPQ. At most ``batch_size`` descriptors of one RSM state are
+    expanded at once, and pending descriptors of a state are deduplicated
+    against the visited ones when their backlog grows past
+    ``BACKLOG_BATCHES`` batches;
+    ``stats``, if given, receives descriptor throughput.
+    """
+    solver = GLLSolver(rsm, graph, batch_size)
+    if start_nodes:
+        start = np.flatnonzero(np.isin(solver.nodes, list(start_nodes)))
+    else:
+        start = np.arange(solver.n)
+    solver.run(start, stats)
+
+    # popped nodes of a GSS node (box, u) are the ends of paths derived from u
+    result = set()
+    for u in start.tolist():
+        for v in solver.popped.get(solver.initial * solver.n + u, ()):
+            u_value, v_value = int(solver.nodes[u]), int(solver.nodes[v])
+            if not final_nodes or v_value in final_nodes:
+                result.add((u_value, v_value))
+    return result
@@ -0,0 +1,297 @@
+import itertools
+from typing import Any, Hashable, Iterable
+
+import networkx as nx
+import numpy as np
+from pyformlang.finite_automaton import Symbol
+from scipy.sparse import coo_matrix, csr_matrix
+
+from project.state_table import StateTable
+from project.task3_adjacency_matrix import AdjacencyMatrixFA
+
+# pending updates of a block are merged into its CSR once there are more of
+# them than this and than the CSR entries divided by MERGE_RATIO
+MIN_PENDING = 64
+MERGE_RATIO = 8
+
+_version_ids = itertools.count()
+
+
+class NodeIndex:
+    """
+    Append-only ``node -> matrix index`` map shared by every version of a
+    graph, so the label blocks of all versions use the same indices.
+    """
+
+    def __init__(self):
+        self.index: dict[int, int] = {}
+        self._nodes = np.empty(16, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def add(self, node: int) -> int:
+        if node not in self.index:
+            i = len(self.index)
+            if i == len(self._nodes):
+                self._nodes = np.concatenate([self._nodes, np.empty_like(self._nodes)])
+            self._nodes[i] = node
+            self.index[node] = i
+        return self.index[node]
+
+    def nodes(self, size: int) -> np.ndarray:
+        """Nodes of the first ``size`` indices."""
+        return self._nodes[:size]
+
+
+def _resized(matr: csr_matrix, size: int) -> csr_matrix:
+    # indices never move, so a smaller matrix only needs empty rows appended
+    if matr.shape[0] == size:
+        return matr
+    indptr = np.concatenate(
+        [matr.indptr, np.full(size - matr.shape[0], matr.indptr[-1])]
+    )
+    return csr_matrix((matr.data, matr.indices, indptr), shape=(size, size))
+
+
+class LabelBlock:
+    """
+    Edges of one label: a CSR matrix of edge counts (parallel edges are
+    counted) and a linked chain of ``(u, v, ±1)`` updates not merged into it
+    yet. Blocks are immutable, an update returns a new block sharing the CSR.
+    """
+
+    __slots__ = ("counts", "pending", "pending_size", "_matrix")
+
+    def __init__(
+        self, counts: csr_matrix, pending: tuple = None, pending_size: int = 0
+    ):
+        self.counts = counts
+        # (u, v, delta, previous) or None
+        self.pending = pending
+        self.pending_size = pending_size
+        self._matrix = None
+
+    @classmethod
+    def empty(cls) -> "LabelBlock":
+        return cls(csr_matrix((0, 0), dtype=np.int32))
+
+    def count(self, u: int, v: int) -> int:
+        n = self.counts.shape[0]
+        total = int(self.counts[u, v]) if u < n and v < n else 0
+        link = self.pending
+        while link is not None:
+            pu, pv, delta, link = link
+            if pu == u and pv == v:
+                total += delta
+        return total
+
+    def updated(self, u: int, v: int, delta: int) -> "LabelBlock":
+        pending = (u, v, delta, self.pending)
+        block = LabelBlock(self.counts, pending, self.pending_size + 1)
+        if block.pending_size > max(MIN_PENDING, self.counts.nnz // MERGE_RATIO):
+            block = LabelBlock(block.merged_counts())
+        return block
+
+    def merged_counts(self) -> csr_matrix:
+        if self.pending is None:
+            return self.counts
+        rows, cols, deltas = [], [], []
+        link = self.pending
+        while link is not None:
+            u, v, delta, link = link
+            rows.append(u)
+            cols.append(v)
+            deltas.append(delta)
+        size = max(self.counts.shape[0], max(rows) + 1, max(cols) + 1)
+        counts = _resized(self.counts, size).tocoo()
+        merged = coo_matrix(
+            (
+                np.concatenate([counts.data, np.asarray(deltas, dtype=np.int32)]),
+                (
+                    np.concatenate([counts.row, rows]),
+                    np.concatenate([counts.col, cols]),
+                ),
+            ),
+            shape=(size, size),
+        ).tocsr()
+        merged.eliminate_zeros()
+        return merged
+
+    def without_node(self, i: int) -> "LabelBlock":
+        """The block without the edges at index ``i``; itself if it has none."""
+        counts = self.merged_counts()
+        if i >= counts.shape[0]:
+            return self
+        coo = counts.tocoo()
+        keep = (coo.row != i) & (coo.col != i)
+        if keep.all():
+            return self if counts is self.counts else LabelBlock(counts)
+        return LabelBlock(
+            coo_matrix(
+                (coo.data[keep], (coo.row[keep], coo.col[keep])), shape=counts.shape
+            ).tocsr()
+        )
+
+    def matrix(self, size: int) -> csr_matrix:
+        """Boolean adjacency matrix of the label over ``size`` indices."""
+        if self._matrix is None or self._matrix.shape[0] != size:
+            self._matrix = _resized(self.merged_counts() > 0, size)
+        return self._matrix
+
+
+class GraphVersion:
+    """
+    Immutable labeled multigraph over int nodes. Every mutation returns a new
+    version that shares the node index and the label blocks it does not
+    touch, so taking a snapshot costs O(labels) and any number of versions
+    stay valid side by side.
+
+    A version holds the indices below ``size`` minus ``removed``; indices
+    are never reused, a removed node keeps its index without edges.
+    """
+
+    __slots__ = ("index", "size", "removed", "blocks", "id", "_automaton")
+
+    def __init__(
+        self,
+        index: NodeIndex,
+        size: int,
+        removed: frozenset[int],
+        blocks: dict[Any, LabelBlock],
+    ):
+        self.index = index
+        self.size = size
+        self.removed = removed
+        self.blocks = blocks
+        self.id = next(_version_ids)
+        self._automaton = None
+
+    @classmethod
+    def empty(cls) -> "GraphVersion":
+        return cls(NodeIndex(), 0, frozenset(), {})
+
+    @classmethod
+    def from_graph(cls, graph: nx.MultiDiGraph) -> "GraphVersion":
+        version = cls.empty().add_vertices(graph.nodes)
+        return version.add_edges(graph.edges(data="label"))
+
+    def _index_of(self, node: int) -> int | None:
+        i = self.index.index.get(node)
+        if i is None or i >= self.size or i in self.removed:
+            return None
+        return i
+
+    def __contains__(self, node: int) -> bool:
+        return self._index_of(node) is not None
+
+    def __len__(self) -> int:
+        return self.size - len(self.removed)
+
+    def nodes(self) -> np.ndarray:
+        nodes = self.index.nodes(self.size)
+        if not self.removed:
+            return nodes
+        alive = np.ones(self.size, dtype=bool)
+        alive[list(self.removed)] = False
+        return nodes[alive]
+
+    def _with_nodes(self, nodes: Iterable[int]) -> tuple[int, frozenset, list[int]]:
+        # (size, removed, indices) after adding nodes; indices another version
+        # allocated after this one was made are not part of it
+        size, removed, indices = self.size, set(self.removed), []
+        for node in nodes:
+            i = self.index.add(node)
+            if i >= size:
+                removed.update(range(size, i))
+                size = i + 1
+            removed.discard(i)
+            indices.append(i)
+        return size, frozenset(removed), indices
+
+    def add_vertices(self, nodes: Iterable[int]) -> "GraphVersion":
+        size, removed, _ = self._with_nodes(nodes)
+        if size == self.size and removed == self.removed:
+            return self
+        return GraphVersion(self.index, size, removed, self.blocks)
+
+    def add_edges(self, edges: Iterable[tuple[int, int, Any]]) -> "GraphVersion":
+        edges = list(edges)
+        size, removed, indices = self._with_nodes(
+            node for u, v, _ in edges for node in (u, v)
+        )
+        blocks = dict(self.blocks)
+        for (_, _, label), u, v in zip(edges, indices[::2], indices[1::2]):
+            block = blocks.get(label) or LabelBlock.empty()
+            blocks[label] = block.updated(u, v, 1)
+        return GraphVersion(self.index, size, removed, blocks)
+
+    def remove_edges(self, edges: Iterable[tuple[int, int, Any]]) -> "GraphVersion":
+        """Removes one copy of every edge, missing edges are ignored."""
+        blocks = dict(self.blocks)
+        for u, v, label in edges:
+            i, j, block = self._index_of(u), self._index_of(v), blocks.get(label)
+            if i is not None and j is not None and block and block.count(i, j) > 0:
+                blocks[label] = block.updated(i, j, -1)
+        if all(blocks[label] is self.blocks.get(label) for label in blocks):
+            return self
+        return GraphVersion(self.index, self.size, self.removed, blocks)
+
+    def remove_vertices(self, nodes: Iterable[int]) -> "GraphVersion":
+        """Removes nodes with their edges, missing nodes are ignored."""
+        indices = {self._index_of(node) for node in nodes} - {None}
+        if not indices:
+            return self
+        blocks = dict(self.blocks)
+        for label, block in blocks.items():
+            for i in indices:
+                block = block.without_node(i)
+            blocks[label] = block
+        return GraphVersion(self.index, self.size, self.removed | indices, blocks)
+
+    def add_vertex(self, node: int) -> "GraphVersion":
+        return self.add_vertices([node])
+
+    def add_edge(self, u: int, label: Hashable, v: int) -> "GraphVersion":
+        return self.add_edges([(u, v, label)])
+
+    def remove_edge(self, u: int, label: Hashable, v: int) -> "GraphVersion":
+        return self.remove_edges([(u, v, label)])
+
+    def remove_vertex(self, node: int) -> "GraphVersion":
+        return self.remove_vertices([node])
+
+    def automaton(self) -> AdjacencyMatrixFA:
+        """
+        The graph as ``AdjacencyMatrixFA.from_graph`` builds it, with every
+        node a start and final state. States are all indices of the version,
+        removed nodes included as isolated states. Label matrices are cached
+        by the blocks, so versions share the ones of unchanged labels.
+        """
+        if self._automaton is None:
+            automaton = AdjacencyMatrixFA.__new__(AdjacencyMatrixFA)
+            automaton.size = self.size
+            automaton.state_index = StateTable(self.index.nodes(self.size))
+            automaton.states = automaton.state_index.all_states
+            automaton.start_states = automaton.states
+            automaton.final_states = automaton.states
+            automaton.decomposed_adj_matrix = {
+                Symbol(label): block.matrix(self.size)
+                for label, block in self.blocks.items()
+            }
+            automaton.alphabet = set(automaton.decomposed_adj_matrix)
+            self._automaton = automaton
+        return self._automaton
+
+    def to_networkx(self) -> nx.MultiDiGraph:
+        graph = nx.MultiDiGraph()
+        graph.add_nodes_from(self.nodes().tolist())
+        nodes = self.index.nodes(self.size)
+        for label, block in self.blocks.items():
+            coo = block.merged_counts().tocoo()
+            for u, v, count in zip(
+                coo.row.tolist(), coo.col.tolist(), coo.data.tolist()
+            ):
+                for _ in range(count):
+                    graph.add_edge(int(nodes[u]), int(nodes[v]), label=label)
+        return graph
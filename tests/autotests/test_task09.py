@@ -15,10 +15,10 @@ from cfpq_concrete_cases import CaseCFPQ, CASES_CFPQ
 
 # Fix import statements in try block to run tests
 try:
-    from project.task6 import hellings_based_cfpq
-    from project.task7 import matrix_based_cfpq
-    from project.task8 import tensor_based_cfpq, cfg_to_rsm, ebnf_to_rsm
-    from project.task9 import gll_based_cfpq
+    from project.task6_cfpq import hellings_based_cfpq
+    from project.task7_matrix_cfpq import matrix_based_cfpq
+    from project.task8_tensor_cfpq import tensor_based_cfpq, cfg_to_rsm, ebnf_to_rsm
+    from project.task9_gll_cfpq import gll_based_cfpq
 except ImportError:
     pytestmark = pytest.mark.skip("Task 9 is not ready to test!")
 
@@ -0,0 +1,67 @@
+import csv
+import json
+
+import pytest
+
+from benchmarks.cfpq import compare_with_baseline
+from benchmarks.cfpq import main as cfpq_main
+from benchmarks.common import measure, write_records
+from benchmarks.rpq import main as rpq_main
+
+
+def test_measure_reports_result_size_in_child_process():
+    measurement = measure(lambda n: list(range(n)), 1000)
+    assert measurement.result_size == 1000
+    assert measurement.peak_rss_mib > 0
+    assert measurement.rss_growth_mib >= 0
+
+
+def test_rpq_benchmark_writes_records(tmp_path):
+    csv_path, json_path = tmp_path / "rpq.csv", tmp_path / "rpq.json"
+    records = rpq_main(
+        ["--synthetic", "100", "300", "3", "--start-sizes", "1", "10"]
+        + ["--repeats", "1", "--csv", str(csv_path), "--json", str(json_path)]
+    )
+    assert len(records) == 2 * 4 * 2
+    sizes = {}
+    for record in records:
+        sizes.setdefault((record.query, record.start_size), set()).add(
+            record.result_size
+        )
+    assert all(len(found) == 1 for found in sizes.values())
+
+    with open(csv_path) as file:
+        rows = list(csv.DictReader(file))
+    assert len(rows) == len(records)
+    assert rows[0]["algorithm"] == records[0].algorithm
+    with open(json_path) as file:
+        assert json.load(file)[0]["query"] == records[0].query
+
+
+def test_cfpq_benchmark_engines_agree_on_equivalent_grammars(tmp_path):
+    records = cfpq_main(
+        ["--synthetic", "60", "150", "2", "--grammars", "dyck", "regular"]
+        + ["--repeats", "1", "--csv", str(tmp_path / "cfpq.csv")]
+    )
+    sizes = {}
+    for record in records:
+        sizes.setdefault(record.grammar, set()).add(record.result_size)
+    assert all(len(found) == 1 for found in sizes.values())
+    assert {record.phase for record in records} == {"cold", "warm"}
+
+
+def test_cfpq_baseline_comparison_reports_slowdowns(tmp_path):
+    records = cfpq_main(
+        ["--synthetic", "30", "60", "2", "--grammars", "same_generation"]
+        + ["--engines", "hellings", "matrix", "--repeats", "1"]
+    )
+    baseline = tmp_path / "baseline.csv"
+    write_records(records, str(baseline))
+    assert compare_with_baseline(records, str(baseline), 0.2) == []
+
+    for record in records:
+        record.seconds *= 2 if record.engine == "matrix" else 1
+    regressions = compare_with_baseline(records, str(baseline), 0.2)
+    assert regressions
+    assert all(regression.key[1] == "matrix" for regression in regressions)
+    assert all(regression.slowdown == pytest.approx(2) for regression in regressions)
@@ -0,0 +1,74 @@
+import random
+from networkx import MultiDiGraph
+from project.incremental_rpq import MaintainedRPQ
+from project.task4_rpq import ms_bfs_based_rpq
+from utilities import random_graph
+
+
+def test_maintained_rpq_matches_recomputation_after_insertions():
+    rnd = random.Random(5)
+    for regex, start_nodes, final_nodes in [
+        ("(a | b)* c", set(range(0, 30, 4)), set()),
+        ("a b* | c", set(), set(range(15))),
+        ("(a b)*", {1, 2, 3}, {1, 2, 3, 4, 5}),
+    ]:
+        graph = random_graph(30, 30, 6)
+        maintained = MaintainedRPQ(regex, graph, start_nodes, final_nodes)
+        assert maintained.result() == ms_bfs_based_rpq(
+            regex, graph, start_nodes, final_nodes
+        )
+        for _ in range(6):
+            # new nodes 30..34 appear as edge endpoints
+            edges = [
+                (rnd.randrange(35), rnd.randrange(35), rnd.choice("abcd"))
+                for _ in range(8)
+            ]
+            before = maintained.result()
+            added = maintained.add_edges(edges)
+            graph.add_edges_from((u, v, {"label": label}) for u, v, label in edges)
+            expected = ms_bfs_based_rpq(regex, graph, start_nodes, final_nodes)
+            assert maintained.result() == expected
+            assert added == expected - before
+
+
+def remove_labeled_edge(graph: MultiDiGraph, u: int, v: int, label: str):
+    for key, data in graph.get_edge_data(u, v, default={}).items():
+        if data["label"] == label:
+            graph.remove_edge(u, v, key)
+            return
+
+
+def test_maintained_rpq_matches_recomputation_after_deletions():
+    rnd = random.Random(7)
+    for regex, start_nodes, final_nodes in [
+        ("(a | b)* c", set(range(0, 25, 4)), set()),
+        ("a* b*", set(), set(range(12))),
+        ("(a b)* | c", {1, 2, 3}, {1, 2, 3, 4, 5}),
+    ]:
+        graph = random_graph(25, 70, 8)
+        maintained = MaintainedRPQ(regex, graph, start_nodes, final_nodes)
+        for step in range(12):
+            before = maintained.result()
+            edges = [(u, v, label) for u, v, label in graph.edges(data="label")]
+            if step % 4 == 3:
+                nodes = rnd.sample(sorted(graph.nodes), 2)
+                lost = maintained.remove_nodes(nodes)
+                graph.remove_nodes_from(nodes)
+            elif step % 4 == 2:
+                # parallel copies are removed one at a time
+                added = [(0, 1, "a"), (0, 1, "a"), (1, 2, "c")]
+                maintained.add_edges(added)
+                graph.add_edges_from((u, v, {"label": lb}) for u, v, lb in added)
+                before = maintained.result()
+                removed = [(0, 1, "a"), (1, 2, "c")]
+                lost = maintained.remove_edges(removed)
+                for u, v, label in removed:
+                    remove_labeled_edge(graph, u, v, label)
+            else:
+                removed = rnd.sample(edges, 6)
+                lost = maintained.remove_edges(removed)
+                for u, v, label in removed:
+                    remove_labeled_edge(graph, u, v, label)
+            expected = ms_bfs_based_rpq(regex, graph, start_nodes, final_nodes)
+            assert maintained.result() == expected
+            assert lost == before - expected
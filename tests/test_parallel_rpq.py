@@ -0,0 +1,15 @@
+from project.parallel_rpq import parallel_ms_bfs_based_rpq
+from project.task4_rpq import ms_bfs_based_rpq
+from utilities import random_graph
+
+
+def test_parallel_rpq_matches_ms_bfs():
+    graph = random_graph(40, 120, 4)
+    for regex, start_nodes, final_nodes in [
+        ("(a | b)* c", set(range(0, 40, 3)), set()),
+        ("a b*", set(), set(range(20))),
+        ("d", {1, 2}, set()),
+    ]:
+        assert parallel_ms_bfs_based_rpq(
+            regex, graph, start_nodes, final_nodes, workers=2, shards=5
+        ) == ms_bfs_based_rpq(regex, graph, start_nodes, final_nodes)
@@ -0,0 +1,186 @@
+import random
+
+import pytest
+from networkx import MultiDiGraph
+from pyformlang.cfg import CFG
+from project.query_language import Concat, QuerySyntaxError, Union, parse_program
+from project.task4_rpq import GraphIndex, compile_regex, ms_bfs, ms_bfs_based_rpq
+from project.task7_matrix_cfpq import matrix_based_cfpq
+from project.task12_interpreter import (
+    QueryTypeError,
+    Runtime,
+    Type,
+    compile_program,
+    exec_program,
+    infer_types,
+)
+from project.versioned_graph import GraphVersion
+from utilities import random_graph
+
+
+def graph_program(graph: MultiDiGraph, name: str = "g") -> str:
+    lines = [f"let {name} is graph"]
+    lines += [f"add vertex {v} to {name}" for v in graph.nodes]
+    lines += [
+        f'add edge ({u}, "{label}", {v}) to {name}'
+        for u, v, label in graph.edges(data="label")
+    ]
+    return "\n".join(lines)
+
+
+def test_parser_precedence():
+    (bind,) = parse_program('let q = "a" . "b" | "c" ^ [1..]').statements
+    assert isinstance(bind.expr, Union) and isinstance(bind.expr.left, Concat)
+    with pytest.raises(QuerySyntaxError, match="line 2"):
+        parse_program("let g is graph\nadd edge (1, 2) to g")
+
+
+@pytest.mark.parametrize(
+    "program, message",
+    [
+        ('let p = "a" . p | "b"\nlet q = "c" . q | "d"\nlet r = p & q', "two RSMs"),
+        ("let g is graph\nadd vertex [1] to g", "expects int"),
+        ('let g = 1\nadd edge (1, "a", 2) to g', "g is not a graph"),
+        ("let s = [1, x]", "x is not defined"),
+        (
+            'let g is graph\nlet r = return w where u reachable from v in g by "a"',
+            "returned w",
+        ),
+        ('let q = "a" . p\nlet p = 1', "never bound to an automaton"),
+    ],
+)
+def test_type_errors(program, message):
+    with pytest.raises(QueryTypeError, match=message):
+        compile_program(parse_program(program))
+
+
+def test_infer_types():
+    types = infer_types(
+        parse_program(
+            """
+            let g is graph
+            let p = "a" . p . "b" | "c"
+            let f = "a" ^ [0..]
+            let i = f & p
+            let r = return u, v where u reachable from v in g by f
+            let s = return u where u reachable from v in g by i
+            """
+        )
+    )
+    assert types == {
+        "g": Type.GRAPH,
+        "p": Type.RSM,
+        "f": Type.FA,
+        "i": Type.RSM,
+        "r": Type.SET_PAIR,
+        "s": Type.SET_INT,
+    }
+
+
+@pytest.mark.parametrize(
+    "query, grammar",
+    [
+        ("s", "S -> a S b | c"),
+        ('s & "a" ^ [0..1] . "c" . "b" ^ [0..]', "S -> c | a c b"),
+        ('"a" . (s & ("a" | "c") ^ [0..] . "b") . "b" | "c"', "S -> a a c b b | c"),
+    ],
+)
+def test_exec_context_free(query, grammar):
+    graph = random_graph(15, 45, len(query))
+    program = f"""
+    {graph_program(graph)}
+    let s = "a" . s . "b" | "c"
+    let p = {query}
+    let r = for v in [0, 1, 2, 3] return u, v where u reachable from v in g by p
+    """
+    result = exec_program(program)["r"]
+    assert result == matrix_based_cfpq(CFG.from_text(grammar), graph, {0, 1, 2, 3})
+
+
+def test_exec_sees_graph_and_binding_changes():
+    graph = random_graph(15, 45, 3)
+    program = f"""
+    {graph_program(graph)}
+    let q = ("a" | "b") ^ [1..]
+    let r1 = for v in [0] return u where u reachable from v in g by q
+    let q = "a"
+    add edge (0, "c", 15) to g
+    remove vertex 1 from g
+    let r2 = for v in [0] for u in [2, 3, 4, 15] return u, v where u reachable from v in g by q . "c" ^ [0..1]
+    """
+    results = exec_program(program)
+    assert results["r1"] == {
+        v for _, v in ms_bfs_based_rpq("(a | b)(a | b)*", graph, {0}, set())
+    }
+
+    graph.add_edge(0, 15, label="c")
+    graph.remove_node(1)
+    assert results["r2"] == ms_bfs_based_rpq("a (c | $)", graph, {0}, {2, 3, 4, 15})
+
+
+def test_repeated_select_is_cached(monkeypatch):
+    evaluations = []
+    evaluate = Runtime._evaluate
+
+    def counting(self, *args):
+        evaluations.append(args)
+        return evaluate(self, *args)
+
+    monkeypatch.setattr(Runtime, "_evaluate", counting)
+    program = f"""
+    {graph_program(random_graph(10, 30, 5))}
+    let p = "a" . p . "b" | "c"
+    let r1 = for v in [1, 2] return u, v where u reachable from v in g by p
+    let r2 = for v in [2, 1] return u where u reachable from v in g by p
+    add vertex 10 to g
+    let r3 = for v in [1, 2] return u, v where u reachable from v in g by p
+    """
+    results = exec_program(program)
+    assert len(evaluations) == 2
+    assert results["r1"] == results["r3"]
+    assert results["r2"] == {u for _, u in results["r1"]}
+
+
+def edge_multiset(graph: MultiDiGraph) -> tuple[set, list]:
+    return set(graph.nodes), sorted(graph.edges(data="label"))
+
+
+def test_graph_versions_are_persistent():
+    rnd = random.Random(7)
+    graph = random_graph(20, 60, 7)
+    version = GraphVersion.from_graph(graph)
+    history = [(version, graph.copy())]
+    for step in range(300):
+        u, v, label = rnd.randrange(25), rnd.randrange(25), rnd.choice("abc")
+        action = rnd.random()
+        if action < 0.5:
+            graph.add_edge(u, v, label=label)
+            version = version.add_edge(u, label, v)
+        elif action < 0.9:
+            for key, data in graph.get_edge_data(u, v, default={}).items():
+                if data["label"] == label:
+                    graph.remove_edge(u, v, key)
+                    break
+            version = version.remove_edge(u, label, v)
+        elif u in graph:
+            graph.remove_node(u)
+            version = version.remove_vertex(u)
+        if step % 30 == 0:
+            history.append((version, graph.copy()))
+
+    history.append((version, graph))
+    for version, expected in history:
+        assert edge_multiset(version.to_networkx()) == edge_multiset(expected)
+        index = GraphIndex.from_automaton(version.automaton())
+        assert ms_bfs(
+            index, compile_regex("a b* c"), version.nodes().tolist(), ()
+        ) == ms_bfs_based_rpq("a b* c", expected, set(expected.nodes), set())
+
+
+def test_graph_version_shares_unchanged_labels():
+    base = GraphVersion.from_graph(random_graph(10, 30, 1))
+    changed = base.add_edge(0, "a", 1).remove_edge(2, "b", 3)
+    assert changed.blocks["c"] is base.blocks["c"]
+    assert changed.blocks["a"] is not base.blocks["a"]
+    assert base.add_edge(0, "a", 1).blocks["a"].counts is base.blocks["a"].counts
+    assert base.remove_edge(0, "z", 1) is base
@@ -1,6 +1,16 @@
+import itertools
+from collections import Counter
 import pytest
+import cfpq_data
+import networkx as nx
+from project.graph_store import GRAPH_CACHE_ENV, GraphStore, file_hash
 from project.task1_graph_utilities import (
+    get_graph_by_name,
     get_graph_info_by_name,
+    get_graph_info_from_graph,
+    get_graph_statistics_by_name,
+    get_graph_statistics_from_csv,
+    GraphStatistics,
     build_graph_from_two_cycles,
     save_graph_from_two_cycles_to_dot_file,
 )
@@ -49,3 +59,92 @@ def test_build_graph_with_out_of_range_indices_in_cycles(
     path = tmp_path / "graph.dot"
     with pytest.raises(IndexError):
         save_graph_from_two_cycles_to_dot_file(node_num1, node_num2, labels, path)
+
+
+@pytest.fixture
+def local_dataset(tmp_path, monkeypatch):
+    graph = build_graph_from_two_cycles(3, 4, ("a", "b"))
+    graph.add_edge(0, 5, label="c")
+    csv_path = cfpq_data.graph_to_csv(graph, tmp_path / "local.csv")
+    monkeypatch.setenv(GRAPH_CACHE_ENV, str(tmp_path / "cache"))
+    downloads = []
+
+    def download(name):
+        if name != "local":
+            raise FileNotFoundError(name)
+        downloads.append(name)
+        return csv_path
+
+    monkeypatch.setattr(cfpq_data, "download", download)
+    return cfpq_data.graph_from_csv(csv_path), downloads
+
+
+def test_graph_store_serves_repeated_loads(local_dataset):
+    expected, downloads = local_dataset
+    first = get_graph_by_name("local")
+    second = get_graph_by_name("local")
+    assert downloads == ["local"]
+    for actual in (first, second):
+        assert list(actual.nodes) == list(expected.nodes)
+        assert list(actual.edges(data="label")) == list(expected.edges(data="label"))
+
+
+def test_graph_store_info_matches_graph(local_dataset, monkeypatch):
+    expected, _ = local_dataset
+    get_graph_by_name("local")
+
+    def offline(name):
+        raise ConnectionError(name)
+
+    monkeypatch.setattr(cfpq_data, "download", offline)
+    assert get_graph_info_by_name("local") == get_graph_info_from_graph(expected)
+
+
+def test_graph_store_keys_entries_by_content_hash(local_dataset, tmp_path):
+    get_graph_by_name("local")
+    stored = GraphStore(tmp_path / "cache").load("local")
+    assert stored.content_hash == file_hash(tmp_path / "local.csv")
+    assert (tmp_path / "cache" / "local" / stored.content_hash / "meta.json").is_file()
+
+
+def expected_statistics(graph):
+    info = get_graph_info_from_graph(graph)
+    cooccurrence = {}
+    for node in graph.nodes:
+        labels_in = {label for _, _, label in graph.in_edges(node, data="label")}
+        labels_out = {label for _, _, label in graph.out_edges(node, data="label")}
+        for pair in itertools.product(labels_in, labels_out):
+            cooccurrence[pair] = cooccurrence.get(pair, 0) + 1
+    return GraphStatistics(
+        nodes_num=info.nodes_num,
+        edges_num=info.edges_num,
+        edge_labels=info.edge_labels,
+        label_frequencies=dict(cfpq_data.get_labels_frequency(graph)),
+        out_degree_distribution=dict(Counter(d for _, d in graph.out_degree())),
+        in_degree_distribution=dict(Counter(d for _, d in graph.in_degree())),
+        label_cooccurrence=cooccurrence,
+    )
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1000])
+def test_streaming_statistics_match_graph(tmp_path, chunk_size):
+    graph = cfpq_data.labeled_scale_free_graph(60, labels=["a", "b", "c", "d"])
+    csv_path = cfpq_data.graph_to_csv(graph, tmp_path / "graph.csv")
+    expected = expected_statistics(cfpq_data.graph_from_csv(csv_path))
+    assert get_graph_statistics_from_csv(csv_path, chunk_size) == expected
+
+
+def test_streaming_statistics_of_sparse_node_ids(tmp_path):
+    graph = cfpq_data.labeled_scale_free_graph(40, labels=["a", "b", "c"])
+    graph = nx.relabel_nodes(graph, {v: v * 10**12 - 5 * 10**12 for v in graph.nodes})
+    csv_path = cfpq_data.graph_to_csv(graph, tmp_path / "graph.csv")
+    expected = expected_statistics(cfpq_data.graph_from_csv(csv_path))
+    assert get_graph_statistics_from_csv(csv_path, chunk_size=9) == expected
+
+
+def test_streaming_statistics_from_graph_store(local_dataset):
+    graph, _ = local_dataset
+    get_graph_by_name("local")
+    assert get_graph_statistics_by_name("local", chunk_size=3) == expected_statistics(
+        graph
+    )
@@ -1,11 +1,22 @@
+import random
+import numpy as np
+import pytest
 from pyformlang.finite_automaton import NondeterministicFiniteAutomaton, State, Symbol
 from project.task3_adjacency_matrix import (
     AdjacencyMatrixFA,
+    LazyProductFA,
+    RegexCache,
+    closure_strategy,
     intersect_automata,
+    normalize_regex,
+    restricted_closure,
     tensor_based_rpq,
 )
-from project.task2_automata_conversions import regex_to_dfa
+from project.task2_automata_conversions import regex_to_dfa, graph_to_nfa
+import project.task3_adjacency_matrix as task3
+from project.state_table import StateTable, state_values
 from networkx import MultiDiGraph
+from scipy.sparse.csgraph import shortest_path
 
 
 def test_accepts_epsilon_only():
@@ -71,3 +82,274 @@ def test_tensor_rpq_unreachable():
     graph.add_edge(0, 1, label="b")
     result = tensor_based_rpq("a", graph, {0}, {1})
     assert result == set()
+
+
+def random_nfa(states_num: int, transitions_num: int, seed: int):
+    rnd = random.Random(seed)
+    nfa = NondeterministicFiniteAutomaton()
+    for _ in range(transitions_num):
+        nfa.add_transition(
+            State(rnd.randrange(states_num)),
+            Symbol(rnd.choice("ab")),
+            State(rnd.randrange(states_num)),
+        )
+    nfa.add_start_state(State(0))
+    nfa.add_final_state(State(states_num - 1))
+    return nfa
+
+
+@pytest.mark.parametrize(
+    "states_num, transitions_num, seed",
+    [(1, 1, 0), (5, 3, 1), (10, 25, 2), (40, 60, 3)],
+)
+def test_closure_backends_agree(states_num, transitions_num, seed):
+    am = AdjacencyMatrixFA(random_nfa(states_num, transitions_num, seed))
+    expected = am.transitive_closure(backend="dok")
+    actual = am.transitive_closure(backend="bitset")
+    assert (actual.tocsr() != expected.tocsr()).nnz == 0
+
+
+@pytest.mark.parametrize(
+    "states_num, transitions_num, seed", [(130, 400, 4), (700, 1000, 5)]
+)
+def test_bitset_closure_matches_bfs(states_num, transitions_num, seed):
+    am = AdjacencyMatrixFA(random_nfa(states_num, transitions_num, seed))
+    # finite unweighted distances are the reflexive-transitive closure
+    expected = np.isfinite(shortest_path(am.adjacency_union(), unweighted=True))
+    actual = am.transitive_closure(backend="bitset").tocsr().toarray()
+    assert (actual == expected).all()
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_is_empty_search_matches_closure(seed):
+    am = AdjacencyMatrixFA(random_nfa(12, 10 + 3 * seed, seed))
+    assert am.is_empty() == am.is_empty(closure_backend="dok")
+    witness = am.shortest_witness()
+    assert (witness is None) == am.is_empty()
+    if witness is not None:
+        assert am.accepts(witness)
+        # no shorter word over the alphabet is accepted
+        shorter = [[]]
+        for _ in range(len(witness) - 1):
+            shorter = [w + [a] for w in shorter for a in am.alphabet]
+            assert not any(am.accepts(w) for w in shorter)
+
+
+def test_shortest_witness_of_chain():
+    am = AdjacencyMatrixFA(regex_to_dfa("a b (c | d d)"))
+    assert am.shortest_witness() == [Symbol("a"), Symbol("b"), Symbol("c")]
+    assert AdjacencyMatrixFA(regex_to_dfa("a*")).shortest_witness() == []
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_accepts_batch_matches_accepts(seed):
+    am = AdjacencyMatrixFA(random_nfa(10, 30, seed))
+    rnd = random.Random(seed)
+    words = [
+        "".join(rnd.choice("abc") for _ in range(rnd.randrange(7))) for _ in range(200)
+    ]
+    words.append([Symbol("a"), Symbol("b")])
+    expected = [am.accepts(word) for word in words]
+    assert am.accepts_batch(words).tolist() == expected
+
+
+def test_accepts_batch_no_words():
+    am = AdjacencyMatrixFA(regex_to_dfa("a*"))
+    assert am.accepts_batch([]).shape == (0,)
+
+
+def test_unknown_closure_backend():
+    am = AdjacencyMatrixFA(random_nfa(3, 3, 0))
+    with pytest.raises(ValueError):
+        am.transitive_closure(backend="floyd")
+
+
+def test_lazy_product_successors_match_intersection():
+    am1 = AdjacencyMatrixFA(random_nfa(6, 15, 5))
+    am2 = AdjacencyMatrixFA(random_nfa(7, 20, 6))
+    product = LazyProductFA(am1, am2)
+    inter = intersect_automata(am1, am2)
+    for symbol in product.alphabet:
+        matr = inter.decomposed_adj_matrix[symbol]
+        for i in range(am1.size):
+            for j in range(am2.size):
+                expected = {
+                    divmod(int(t), am2.size)
+                    for t in matr.getrow(i * am2.size + j).indices
+                }
+                assert set(product.successors(i, j, symbol)) == expected
+
+
+def test_lazy_product_reachable_from_each_matches_single_searches():
+    am1 = AdjacencyMatrixFA(random_nfa(6, 15, 7))
+    am2 = AdjacencyMatrixFA(random_nfa(9, 25, 8))
+    product = LazyProductFA(am1, am2)
+    starts1, starts2 = [0, 2], [1, 4, 8]
+    stacked = product.reachable_from_each(starts1, starts2).toarray()
+    for s, j in enumerate(starts2):
+        single = product.reachable((i, j) for i in starts1).toarray()
+        assert (stacked[s * am1.size : (s + 1) * am1.size] == single).all()
+
+
+@pytest.mark.parametrize("regex", ["a", "a*", "(a | b)* b", "a b* a", "b b b"])
+def test_lazy_and_materialized_product_rpq_agree(regex):
+    graph = MultiDiGraph()
+    rnd = random.Random(len(regex))
+    for _ in range(40):
+        graph.add_edge(rnd.randrange(15), rnd.randrange(15), label=rnd.choice("ab"))
+    start_nodes, final_nodes = {0, 1, 2, 3}, set(range(5, 15))
+    lazy = tensor_based_rpq(regex, graph, start_nodes, final_nodes, strategy="lazy")
+    for strategy in ["auto", "all_pairs", "restricted"]:
+        materialized = tensor_based_rpq(
+            regex, graph, start_nodes, final_nodes, strategy=strategy
+        )
+        assert lazy == materialized
+
+
+def test_unknown_closure_strategy():
+    with pytest.raises(ValueError):
+        tensor_based_rpq("a", MultiDiGraph(), set(), set(), strategy="magic")
+    with pytest.raises(ValueError, match="closure_backend"):
+        tensor_based_rpq(
+            "a", MultiDiGraph(), set(), set(), strategy="lazy", closure_backend="dok"
+        )
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_restricted_closure_matches_closure_rows(seed):
+    am = AdjacencyMatrixFA(random_nfa(40, 60, seed))
+    sources = random.Random(seed).sample(range(am.size), 5)
+    closure = am.transitive_closure().tocsr()
+    assert (restricted_closure(am, sources) != closure[sources]).nnz == 0
+
+
+def test_closure_strategy_cost_model(monkeypatch):
+    graph = MultiDiGraph()
+    for i in range(200):
+        graph.add_edge(i, (i + 1) % 200, label="a")
+    regex_am = AdjacencyMatrixFA(regex_to_dfa("a*"))
+
+    def strategy(start_nodes, final_nodes):
+        graph_am = AdjacencyMatrixFA.from_graph(graph, start_nodes, final_nodes)
+        return closure_strategy(regex_am, graph_am)
+
+    assert strategy({0}, set()) == "restricted"
+    assert strategy(set(), {0}) == "all_pairs"
+    monkeypatch.setattr(task3, "MAX_MATERIALIZED_PRODUCT", 100)
+    assert strategy({0}, set()) == "lazy"
+
+
+def test_state_table_lookup():
+    table = StateTable([40, 7, 19, -3])
+    assert table[State(19)] == 2
+    assert State(40) in table and State(8) not in table
+    assert State("19") not in table
+    assert table.lookup([7, 8, -3]).tolist() == [1, -1, 3]
+    assert table.indices(table.keys()).tolist() == [0, 1, 2, 3]
+    with pytest.raises(KeyError):
+        table.indices({State(5)})
+    assert dict(table.items()) == {State(v): i for i, v in enumerate([40, 7, 19, -3])}
+
+
+def test_product_state_table_matches_enumeration():
+    graph = MultiDiGraph()
+    graph.add_edges_from([(5, 9, {"label": "a"}), (9, 2, {"label": "b"})])
+    regex_am = AdjacencyMatrixFA(regex_to_dfa("a b*"))
+    graph_am = AdjacencyMatrixFA.from_graph(graph, {5}, set())
+    product = intersect_automata(regex_am, graph_am)
+    expected = {
+        State((s1.value, s2.value)): i * graph_am.size + j
+        for s1, i in regex_am.state_index.items()
+        for s2, j in graph_am.state_index.items()
+    }
+    assert dict(product.state_index.items()) == expected
+    assert product.states == set(expected)
+    assert all(product.state_index[state] == i for state, i in expected.items())
+    assert state_values(product.state_index, list(expected.values())) == [
+        state.value for state in expected
+    ]
+    assert sorted(product.start_indices().tolist()) == sorted(
+        expected[state] for state in product.start_states
+    )
+
+
+def assert_same_automaton(actual: AdjacencyMatrixFA, expected: AdjacencyMatrixFA):
+    assert actual.states == expected.states
+    assert actual.start_states == expected.start_states
+    assert actual.final_states == expected.final_states
+    assert actual.alphabet == expected.alphabet
+    order = [actual.state_index[s] for s in expected.states]
+    for symbol, matr in expected.decomposed_adj_matrix.items():
+        permuted = actual.decomposed_adj_matrix[symbol][order][:, order]
+        assert (permuted != matr).nnz == 0
+
+
+@pytest.mark.parametrize(
+    "start_nodes, final_nodes", [(set(), set()), ({0, 3}, {1, 2, 3}), ({0}, {100})]
+)
+def test_from_graph_matches_nfa_construction(start_nodes, final_nodes):
+    graph = MultiDiGraph()
+    rnd = random.Random(7)
+    graph.add_nodes_from(range(12))
+    for _ in range(50):
+        graph.add_edge(rnd.randrange(10), rnd.randrange(10), label=rnd.choice("abc"))
+    graph.add_edge(3, 4)
+    expected = AdjacencyMatrixFA(graph_to_nfa(graph, start_nodes, final_nodes))
+    actual = AdjacencyMatrixFA.from_graph(graph, start_nodes, final_nodes)
+    assert_same_automaton(actual, expected)
+
+
+def test_from_graph_empty_graph():
+    am = AdjacencyMatrixFA.from_graph(MultiDiGraph(), set(), set())
+    assert am.size == 0
+    assert am.is_empty()
+
+
+@pytest.mark.parametrize(
+    "regex1, regex2",
+    [("( a | b ) *", "(a|b)*"), ("a  b", "a b"), (" a* b ", "a*b"), ("a . b", "a.b")],
+)
+def test_normalize_regex(regex1, regex2):
+    assert normalize_regex(regex1) == normalize_regex(regex2)
+
+
+def test_normalize_regex_keeps_symbol_boundaries():
+    assert normalize_regex("a b") != normalize_regex("ab")
+
+
+@pytest.mark.parametrize("regex", ["a\tb", "a\nb", "a|\tb", "a\xa0b", " a\t"])
+def test_normalize_regex_keeps_other_whitespace(regex):
+    assert regex_to_dfa(normalize_regex(regex)).is_equivalent_to(regex_to_dfa(regex))
+
+
+def test_regex_cache_reuses_and_evicts():
+    cache = RegexCache(maxsize=2)
+    first = cache.get("(a | b)*")
+    assert cache.get("(a|b)*") is first
+    assert first.accepts("abba")
+    cache.get("a")
+    cache.get("b")
+    assert len(cache) == 2
+    assert cache.get("(a|b)*") is not first
+
+
+def test_regex_cache_disk_store(tmp_path, monkeypatch):
+    RegexCache(path=tmp_path).get("a b* c")
+
+    def fail(regex):
+        raise AssertionError(f"{regex} was compiled again")
+
+    monkeypatch.setattr(task3, "regex_to_dfa", fail)
+    restored = RegexCache(path=tmp_path).get("a b*c")
+    assert restored.accepts("abbc")
+    assert not restored.accepts("ab")
+
+
+def test_regex_cache_recompiles_stale_entries(tmp_path):
+    cache = RegexCache(path=tmp_path)
+    entry = cache._disk_entry(normalize_regex("a b"))
+    entry.parent.mkdir(parents=True, exist_ok=True)
+    # a pickle of a class that no longer exists
+    entry.write_bytes(b"cproject.task3_adjacency_matrix\nRemovedClass\n.")
+    assert cache.get("a b").accepts("ab")
+    assert RegexCache(path=tmp_path).get("a b").accepts("ab")
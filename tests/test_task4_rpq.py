@@ -0,0 +1,30 @@
+import random
+from project.task4_rpq import GraphIndex, batch_rpq, ms_bfs_based_rpq
+from utilities import random_graph
+
+
+def test_batch_rpq_matches_single_queries():
+    graph = random_graph(30, 80, 0)
+    rnd = random.Random(1)
+    queries = [
+        (
+            regex,
+            set(rnd.sample(range(30), rnd.randint(1, 30))),
+            set(rnd.sample(range(30), rnd.randint(1, 30))),
+        )
+        for regex in ["a*", "(a | b) c*", "a b c", "(a b)* | c", "c", "a*", "d"]
+    ]
+    queries.append(("b*", set(), set()))
+    expected = [ms_bfs_based_rpq(r, graph, s, f) for r, s, f in queries]
+    assert batch_rpq(GraphIndex(graph), queries) == expected
+
+
+def test_graph_index_reuses_transposes():
+    index = GraphIndex(random_graph(10, 20, 2))
+    symbol = next(iter(index.alphabet))
+    assert index.transposed(symbol) is index.transposed(symbol)
+
+
+def test_start_node_outside_graph():
+    graph = random_graph(3, 3, 3)
+    assert ms_bfs_based_rpq("a*", graph, {7}, {7}) == {(7, 7)}
@@ -0,0 +1,83 @@
+import random
+
+import pytest
+from networkx import MultiDiGraph
+from pyformlang.cfg import CFG, Variable
+from project.task6_cfpq import (
+    GrammarCache,
+    compile_grammar,
+    demand_closure,
+    grammar_fingerprint,
+    hellings_based_cfpq,
+)
+from utilities import GRAMMARS, random_graph
+
+
+def test_equal_grammars_share_compilation():
+    cfg1 = CFG.from_text("S -> a S b | $")
+    cfg2 = CFG.from_text("S -> $ | a S b")
+    assert grammar_fingerprint(cfg1) == grammar_fingerprint(cfg2)
+    assert compile_grammar(cfg1) is compile_grammar(cfg2)
+
+
+def test_terminals_and_variables_with_same_name_differ():
+    assert grammar_fingerprint(CFG.from_text("S -> A\nA -> a")) != grammar_fingerprint(
+        CFG.from_text("S -> a")
+    )
+
+
+def test_grammar_cache_evicts_least_recently_used():
+    cache = GrammarCache(maxsize=2)
+    grammars = [CFG.from_text(f"S -> {label}") for label in "abc"]
+    first = cache.get(grammars[0])
+    second = cache.get(grammars[1])
+    assert cache.get(grammars[0]) is first
+    cache.get(grammars[2])
+    assert len(cache) == 2
+    assert cache.get(grammars[0]) is first
+    assert cache.get(grammars[1]) is not second
+
+
+def test_compiled_grammar_indexes_productions():
+    grammar = compile_grammar(CFG.from_text("S -> A B | $\nA -> a\nB -> b"))
+    assert grammar.variables[grammar.start] == Variable("S")
+    assert grammar.start in grammar.epsilon_prods
+    for A, B, C in grammar.binary_prods:
+        assert (A, C) in grammar.by_left[B]
+        assert (A, B) in grammar.by_right[C]
+    heads = {grammar.variables[A] for A in grammar.term_prods["a"]}
+    assert Variable("A") in heads
+
+
+@pytest.mark.parametrize("grammar", GRAMMARS)
+@pytest.mark.parametrize("seed", range(3))
+def test_demand_driven_hellings_matches_all_pairs(grammar, seed):
+    cfg = CFG.from_text(grammar)
+    graph = random_graph(20, 50, seed)
+    rnd = random.Random(seed)
+    for start_nodes, final_nodes in [
+        (set(rnd.sample(range(20), 1)), None),
+        (set(rnd.sample(range(20), 5)), set(rnd.sample(range(20), 8))),
+        (None, None),
+    ]:
+        assert hellings_based_cfpq(
+            cfg, graph, start_nodes, final_nodes, strategy="demand"
+        ) == hellings_based_cfpq(
+            cfg, graph, start_nodes, final_nodes, strategy="all_pairs"
+        )
+
+
+def test_demand_closure_derives_only_facts_reachable_from_sources():
+    graph = MultiDiGraph()
+    graph.add_edges_from([(0, 1, {"label": "a"}), (1, 2, {"label": "b"})])
+    graph.add_edges_from([(3, 4, {"label": "a"}), (4, 5, {"label": "b"})])
+    grammar = compile_grammar(CFG.from_text("S -> a S b | a b"))
+    facts = demand_closure(grammar, graph, {0})
+    assert facts.from_node[grammar.start] == {0: {2}}
+    derived = {u for from_node in facts.from_node for u in from_node}
+    assert derived <= {0, 1, 2}
+
+
+def test_hellings_rejects_unknown_strategy():
+    with pytest.raises(ValueError):
+        hellings_based_cfpq(CFG.from_text("S -> a"), MultiDiGraph(), strategy="magic")
@@ -0,0 +1,27 @@
+import random
+
+import pytest
+from networkx import MultiDiGraph
+from pyformlang.cfg import CFG
+from project.task6_cfpq import hellings_based_cfpq
+from project.task7_matrix_cfpq import matrix_based_cfpq
+from utilities import GRAMMARS, random_graph
+
+
+@pytest.mark.parametrize("grammar", GRAMMARS)
+@pytest.mark.parametrize("seed", range(3))
+def test_matrix_cfpq_matches_hellings(grammar, seed):
+    cfg = CFG.from_text(grammar)
+    graph = random_graph(20, 50, seed)
+    rnd = random.Random(seed)
+    for start_nodes, final_nodes in [
+        (None, None),
+        (set(rnd.sample(range(20), 5)), set(rnd.sample(range(20), 8))),
+    ]:
+        assert matrix_based_cfpq(
+            cfg, graph, start_nodes, final_nodes
+        ) == hellings_based_cfpq(cfg, graph, start_nodes, final_nodes)
+
+
+def test_matrix_cfpq_empty_graph():
+    assert matrix_based_cfpq(CFG.from_text("S -> $"), MultiDiGraph()) == set()
@@ -0,0 +1,50 @@
+import random
+
+import networkx as nx
+import pytest
+from pyformlang.cfg import CFG, Production, Terminal, Variable
+from project.task6_cfpq import hellings_based_cfpq
+from project.task8_tensor_cfpq import cfg_to_rsm, ebnf_to_rsm, tensor_based_cfpq
+from project.task9_gll_cfpq import gll_based_cfpq
+from utilities import GRAMMARS, random_graph
+
+
+@pytest.mark.parametrize("grammar", GRAMMARS)
+@pytest.mark.parametrize("seed", range(3))
+def test_tensor_cfpq_matches_hellings(grammar, seed):
+    cfg = CFG.from_text(grammar)
+    graph = random_graph(20, 50, seed)
+    rnd = random.Random(seed)
+    for start_nodes, final_nodes in [
+        (None, None),
+        (set(rnd.sample(range(20), 5)), set(rnd.sample(range(20), 8))),
+    ]:
+        assert tensor_based_cfpq(
+            cfg_to_rsm(cfg), graph, start_nodes, final_nodes
+        ) == hellings_based_cfpq(cfg, graph, start_nodes, final_nodes)
+
+
+def test_cfg_to_rsm_keeps_start_symbol():
+    cfg = CFG.from_text("A -> a A | B\nB -> b", start_symbol=Variable("A"))
+    assert cfg_to_rsm(cfg).initial_label.value == "A"
+
+
+def test_cfg_to_rsm_mixed_case_symbols():
+    # a lowercase variable and an uppercase terminal
+    s, a = Variable("s"), Terminal("A")
+    cfg = CFG(start_symbol=s, productions={Production(s, [a, s]), Production(s, [a])})
+    graph = nx.MultiDiGraph()
+    graph.add_edge(0, 1, label="A")
+    graph.add_edge(1, 2, label="A")
+    expected = hellings_based_cfpq(cfg, graph)
+    assert expected == {(0, 1), (0, 2), (1, 2)}
+    assert tensor_based_cfpq(cfg_to_rsm(cfg), graph) == expected
+    assert gll_based_cfpq(cfg_to_rsm(cfg), graph) == expected
+
+
+def test_ebnf_and_cfg_agree():
+    graph = random_graph(15, 40, 4)
+    cfg = CFG.from_text("S -> a S | b S | c")
+    assert tensor_based_cfpq(ebnf_to_rsm("S -> (a | b)* c"), graph) == (
+        tensor_based_cfpq(cfg_to_rsm(cfg), graph)
+    )
@@ -0,0 +1,44 @@
+import random
+
+import numpy as np
+import pytest
+from pyformlang.cfg import CFG
+from project.task6_cfpq import hellings_based_cfpq
+from project.task8_tensor_cfpq import cfg_to_rsm
+from project.task9_gll_cfpq import GLLStats, KeySet, gll_based_cfpq
+from utilities import GRAMMARS, random_graph
+
+
+@pytest.mark.parametrize("grammar", GRAMMARS)
+@pytest.mark.parametrize("batch_size", [3, 1 << 16])
+def test_gll_cfpq_matches_hellings(grammar, batch_size):
+    cfg = CFG.from_text(grammar)
+    graph = random_graph(20, 50, len(grammar))
+    rnd = random.Random(batch_size)
+    for start_nodes, final_nodes in [
+        (None, None),
+        (set(rnd.sample(range(20), 5)), set(rnd.sample(range(20), 8))),
+    ]:
+        assert gll_based_cfpq(
+            cfg_to_rsm(cfg), graph, start_nodes, final_nodes, batch_size=batch_size
+        ) == hellings_based_cfpq(cfg, graph, start_nodes, final_nodes)
+
+
+def test_gll_stats():
+    stats = GLLStats()
+    graph = random_graph(30, 80, 1)
+    gll_based_cfpq(cfg_to_rsm(CFG.from_text("S -> a S b | $")), graph, stats=stats)
+    assert stats.descriptors > 0 and stats.batches > 0 and stats.gss_edges > 0
+    assert stats.descriptors_per_second > 0
+
+
+def test_key_set_returns_only_new_keys():
+    keys, expected = KeySet(), set()
+    rnd = np.random.default_rng(0)
+    for _ in range(50):
+        batch = rnd.integers(0, 1000, size=40)
+        fresh = keys.add_new(batch)
+        assert set(fresh.tolist()) == set(batch.tolist()) - expected
+        expected |= set(batch.tolist())
+    assert len(keys) == len(expected)
+    assert len(keys.runs) <= 12
@@ -1,5 +1,7 @@
 import json
+import random
 from pathlib import Path
+from networkx import MultiDiGraph
 from project.task1_graph_utilities import GraphInfo
 
 
@@ -19,3 +21,23 @@ def get_graph_info_from_json(path: str) -> GraphInfo:
         edges_num=data["edges_num"],
         edge_labels=data["edge_labels"],
     )
+
+
+GRAMMARS = [
+    "S -> a S b | a b",
+    "S -> a S b S | $",
+    "S -> S S | a | $",
+    "S -> A B\nA -> a A | $\nB -> b B | c",
+    "S -> B\nB -> C\nC -> a C b | c",
+]
+
+
+def random_graph(nodes_num: int, edges_num: int, seed: int) -> MultiDiGraph:
+    rnd = random.Random(seed)
+    graph = MultiDiGraph()
+    graph.add_nodes_from(range(nodes_num))
+    for _ in range(edges_num):
+        graph.add_edge(
+            rnd.randrange(nodes_num), rnd.randrange(nodes_num), label=rnd.choice("abc")
+        )
+    return graph